@@ -0,0 +1,226 @@
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
+from contextlib import redirect_stdout
+import argparse
+import csv
+import os
+import sys
+
+from CluVRPBudget import Budget, saved_distance, write_atomic
+from CluVRPScheduler import ORDERS
+from CluVRPConstruct import CONSTRUCTIONS
+from CluVRPSolve import VARIANTS, variant_program, load_instance, solve
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module solves many instances in one run: every job (instance, variant, time limit,
+# seed) is run by a pool of worker processes, the best solution of every job is written to its
+# own solution file, and the results of all the jobs are gathered in one table
+
+# The jobs are given by either:
+#   a directory - every .gvrp file in it, with every variant given on the command line
+#   a manifest  - a text file with one job per line: instance [variant [time limit [seed]]]
+#                 (paths relative to the manifest, "-" for a default, # starts a comment)
+
+# The workers are started once for the whole batch and keep the last WARM_INSTANCES instances
+# they read together with their distances, so the jobs of an instance that run one after the
+# other on a worker read it only once. The jobs are handed out from the longest time limit to the
+# shortest (grouped by instance), so the long jobs do not end up last on an otherwise idle pool
+
+# Every job runs in one process with its own time limit. The solution files have the format of
+# write_solution (the distance, then the clusters and the customers of every vehicle) and are
+# named after the instance and the variant, as the solution_file of the programs is only named
+# after the instance. Like write_solution, a solution file is only replaced by a better one
+
+# The table (results.csv in the output directory) has one row per job, a job that failed has
+# its error instead of a distance, and the batch goes on with the other jobs
+
+# Example: python CluVRPBatch.py instances --variants strong weak --time-limit 60 --workers 8 --output results
+#          python CluVRPBatch.py nightly.txt --workers 8
+
+
+#Number of instances every worker keeps read
+WARM_INSTANCES = 4
+
+#The columns of the table of results
+COLUMNS = ["instance", "variant", "seed", "time_limit", "total_distance", "seconds", "solution", "error"]
+
+
+# -------------------------------------- Jobs ----------------------------------------- #
+
+#Method that returns a job as a dictionary
+def make_job(instance: str, variant: str, seconds: float = None, seed: int = None):
+    variant_program(variant)
+    return {"instance": instance, "variant": variant, "time_limit": seconds, "seed": seed}
+
+#Method that returns the jobs of every .gvrp file of a directory with every variant
+def directory_jobs(directory: str, variants: list, seconds: float = None, seed: int = None):
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".gvrp"))
+    return [make_job(os.path.join(directory, name), variant, seconds, seed) for name in names for variant in variants]
+
+#Method that reads the jobs of a manifest, the variant, time limit and seed of a line default to the given ones
+def manifest_jobs(manifest: str, variant: str = "strong", seconds: float = None, seed: int = None):
+    directory = os.path.dirname(manifest)
+    jobs = []
+    with open(manifest, "r") as file:
+        for number, line in enumerate(file, 1):
+            fields = line.split("#")[0].split()
+            if not fields:
+                continue
+            if len(fields) > 4:
+                raise ValueError(f"{manifest}, line {number}: expected 'instance [variant [time limit [seed]]]', found {line.strip()!r}")
+            fields += ["-"] * (4 - len(fields))
+            try:
+                jobs.append(make_job(os.path.join(directory, fields[0]),
+                                     variant if fields[1] == "-" else fields[1],
+                                     seconds if fields[2] == "-" else float(fields[2]),
+                                     seed if fields[3] == "-" else int(fields[3])))
+            except ValueError as error:
+                raise ValueError(f"{manifest}, line {number}: {error}") from None
+
+    return jobs
+
+#Method that returns the indices of the jobs in the order they are handed out: from the longest time limit to the shortest, by instance
+def schedule(jobs: list[dict]):
+    return sorted(range(len(jobs)), key=lambda i: (-(jobs[i]["time_limit"] or 0), jobs[i]["instance"]))
+
+#Method that returns the name of the solution file of a job
+def job_solution_file(output: str, job: dict):
+    name = os.path.splitext(os.path.basename(job["instance"]))[0]
+    return os.path.join(output, f"{name}_{job['variant']}_solution.txt")
+
+
+# ------------------------------------ Workers ---------------------------------------- #
+
+#The instances read by the worker process with their distances, from the least to the most recently used
+worker_instances = OrderedDict()
+
+#Method that returns an instance with its distances, from the instances the worker has kept if it read it before
+def warm_instance(path: str, cache: bool = True, cache_distances: bool = False):
+    key = os.path.abspath(path)
+    if key in worker_instances:
+        worker_instances.move_to_end(key)
+        return worker_instances[key]
+
+    worker_instances[key] = load_instance(path, cache, cache_distances)
+    if len(worker_instances) > WARM_INSTANCES:
+        worker_instances.popitem(last=False)
+    return worker_instances[key]
+
+#Method that runs a job in a worker process, writes its solution file and returns its row of the table,
+#settings holds the arguments of solve that are the same for every job
+def run_job(job: dict, output: str, iterations: int = None, cache: bool = True, settings: dict = None, cache_distances: bool = False):
+    row = dict(job, total_distance=None, seconds=None, solution=None, error=None)
+    started = perf_counter()
+    try:
+        #The messages of reading the instances would mix the jobs, so they are left out
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            instance, distances = warm_instance(job["instance"], cache, cache_distances)
+            #Without a number of iterations a job with a time limit runs until it
+            if iterations is None and job["time_limit"] is not None:
+                iterations = sys.maxsize
+            result = solve(instance, job["variant"], Budget(job["time_limit"]), job["seed"], 1, iterations, distances=distances, **(settings or {}))
+    except Exception as error:
+        row["error"] = f"{type(error).__name__}: {error}"
+        row["seconds"] = round(perf_counter() - started, 2)
+        return row
+
+    program = variant_program(job["variant"])
+    path = job_solution_file(output, job)
+    orders = result["customer_orders"] if result["customer_orders"] is not None else result["vehicle_tours"]
+    past_distance = saved_distance(path)
+    if past_distance is None or result["total_distance"] < past_distance:
+        write_atomic(path, program.solution_lines(result["total_distance"], result["cluster_orders"], orders))
+    row["total_distance"] = result["total_distance"]
+    row["seconds"] = round(perf_counter() - started, 2)
+    row["solution"] = path
+    return row
+
+
+# ------------------------------------- Batch ----------------------------------------- #
+
+#Method that runs the jobs on a pool of workers, prints a line for every job as it ends and returns the rows of the table
+#in the order of the jobs, settings holds the arguments of solve that are the same for every job (strategy, order, ...)
+def run_batch(jobs: list[dict], output: str, workers: int = None, iterations: int = None, cache: bool = True, settings: dict = None, cache_distances: bool = False):
+    os.makedirs(output, exist_ok=True)
+    rows = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, jobs[i], output, iterations, cache, settings, cache_distances): i for i in schedule(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            rows[i] = row = future.result()
+            done = sum(row is not None for row in rows)
+            if row["error"] is None:
+                print(f"[{done}/{len(jobs)}] {row['variant']} {row['instance']}: {row['total_distance']} in {row['seconds']:.2f} seconds")
+            else:
+                print(f"[{done}/{len(jobs)}] {row['variant']} {row['instance']}: failed, {row['error']}", file=sys.stderr)
+
+    return rows
+
+#Method that writes the table of results to a CSV file
+def write_table(path: str, rows: list[dict]):
+    temporary = path + ".tmp"
+    with open(temporary, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row[column] for column in COLUMNS})
+    os.replace(temporary, path)
+
+#Method that prints the table of results to the screen
+def print_table(rows: list[dict]):
+    width = max([len(os.path.basename(row["instance"])) for row in rows] + [8])
+    print()
+    print(f"{'instance':<{width}}  {'variant':<10}  {'distance':>10}  {'seconds':>9}")
+    for row in rows:
+        distance = row["total_distance"] if row["error"] is None else "failed"
+        print(f"{os.path.basename(row['instance']):<{width}}  {row['variant']:<10}  {distance:>10}  {row['seconds']:>9.2f}")
+    failed = sum(row["error"] is not None for row in rows)
+    print()
+    print(f"{len(rows) - failed} jobs solved, {failed} failed, {sum(row['seconds'] for row in rows):.2f} seconds of solving")
+
+
+# ------------------------------- Command line interface ------------------------------ #
+
+#Method that runs a batch from the command line, it exits with 1 when a job failed
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Solve many Clustered Vehicle Routing instances (.gvrp files) on a pool of workers")
+    parser.add_argument("jobs", help="a directory of .gvrp files, or a manifest with one job per line: instance [variant [time limit [seed]]]")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=["strong"], help="the variants every instance of a directory is solved with, the first one is the default of a manifest (default strong)")
+    parser.add_argument("--time-limit", type=float, default=None, help="the time limit of every job in seconds, unless the manifest gives one")
+    parser.add_argument("--iterations", type=int, default=None, help="the number of iterations of every job (default until the time limit, else depends on the variant)")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of every job, unless the manifest gives one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="the number of worker processes (default the number of CPUs)")
+    parser.add_argument("--output", default="batch", help="the directory of the solution files and of results.csv (default batch)")
+    parser.add_argument("--strategy", choices=["best", "first"], default="best", help="best or first improvement (default best)")
+    parser.add_argument("--neighbours", type=int, default=None, help="the size of the candidate lists (default full neighbourhoods)")
+    parser.add_argument("--order", choices=ORDERS, default="fixed", help="the order of the moves (default fixed)")
+    parser.add_argument("--construction", choices=CONSTRUCTIONS, default="random", help="the construction of the starting solutions (default random)")
+    parser.add_argument("--no-cache", action="store_true", help="read the .gvrp files without their binary copies")
+    parser.add_argument("--cache-distances", action="store_true", help="also keep the distance matrices in the binary copies (n^2 numbers per instance)")
+    args = parser.parse_args(argv)
+
+    try:
+        if os.path.isdir(args.jobs):
+            jobs = directory_jobs(args.jobs, args.variants, args.time_limit, args.seed)
+        else:
+            jobs = manifest_jobs(args.jobs, args.variants[0], args.time_limit, args.seed)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if not jobs:
+        parser.error(f"no jobs found in {args.jobs}")
+    if args.iterations is None and any(job["time_limit"] is None for job in jobs):
+        print("Jobs without a time limit run the default number of iterations of their variant", file=sys.stderr)
+
+    settings = {"strategy": args.strategy, "neighbours": args.neighbours, "order": args.order, "construction": args.construction}
+    started = perf_counter()
+    rows = run_batch(jobs, args.output, args.workers, args.iterations, not args.no_cache, settings, args.cache_distances)
+    write_table(os.path.join(args.output, "results.csv"), rows)
+    print_table(rows)
+    print(f"The batch took {perf_counter() - started:.2f} seconds, the results are in {os.path.join(args.output, 'results.csv')}")
+    if any(row["error"] is not None for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+from time import perf_counter
+from contextlib import redirect_stdout
+import argparse
+import json
+import os.path
+import platform
+import sys
+
+from CluVRPBudget import Budget
+from CluVRPSolution import Solution
+from CluVRPEvents import print_event
+from CluVRPStats import MoveStats
+from CluVRPScheduler import ORDERS
+from CluVRPConstruct import CONSTRUCTIONS
+from CluVRPSolve import VARIANTS, load_instance, solve
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module benchmarks the variants of the solvers on a fixed set of instances with fixed
+# seeds and writes the measurements as JSON, so that two versions can be compared
+
+# For every run (instance, variant, seed) it records:
+#   total_distance       - the best distance found
+#   restarts_per_second  - iterations of the Multi-Start/Iterative VNS per second
+#   moves_per_second     - calls of the moves of the local search per second
+#   move_stats           - the report of the moves of the search (see CluVRPStats)
+#   time_to_target       - seconds until the best distance reached the target (None if never)
+#   curve                - the best distance over time, as [seconds, distance] pairs
+
+# The target of an instance is its score in best_we_found_strong.txt/best_we_found_weak.txt
+# (written by update_best_solution), increased by the allowed gap
+
+# Runs are done one after the other in this process with one worker, so that the timings
+# are not disturbed by other runs
+
+# Example: python CluVRPBenchmark.py --dir instances --time-limit 10 --output bench.json
+#          python CluVRPBenchmark.py --dir instances --time-limit 10 --baseline bench.json
+
+
+# ----------------------------------- Settings ---------------------------------------- #
+
+#The instances of the benchmark, like update_best_solution keeps them
+INSTANCES = "ABCDEFGHIJK"
+
+#The seeds every variant is run with
+SEEDS = [1, 2, 3]
+
+#The file holding the best known score of every instance, per variant
+BEST_FILES = {
+    "strong": "best_we_found_strong.txt",
+    "strong-vns": "best_we_found_strong.txt",
+    "weak": "best_we_found_weak.txt",
+    "weak-v2": "best_we_found_weak.txt",
+}
+
+#Fraction by which a throughput may drop, or the mean distance rise, before --baseline reports a regression
+#(runs with a time limit differ from one run to the next)
+TOLERANCE = 0.10
+
+
+# -------------------------------- Measurements --------------------------------------- #
+
+#Class that takes the place of a checkpoint and records the best distance of a search over time
+class Recorder:
+
+    def __init__(self, target: int = None):
+        self.target = target
+        self.start = perf_counter()
+        self.curve = []
+        self.time_to_target = None
+
+    #Method that is offered the best solution after every iteration, like Checkpoint.update
+    def update(self, solution: Solution):
+        self.record(solution.total_distance)
+
+    #Method that records a best distance, if it is better than the last one
+    def record(self, best_total_distance: int):
+        if self.curve and best_total_distance >= self.curve[-1][1]:
+            return
+        elapsed = perf_counter() - self.start
+        self.curve.append([round(elapsed, 4), best_total_distance])
+        if self.time_to_target is None and self.target is not None and best_total_distance <= self.target:
+            self.time_to_target = round(elapsed, 4)
+
+    def flush(self):
+        pass
+
+#Method that reads the best known scores of the instances, the default score 10000 of update_best_solution means unknown
+def best_known(directory: str, variant: str):
+    path = os.path.join(directory, BEST_FILES[variant])
+    scores = {}
+    if not os.path.isfile(path):
+        return scores
+
+    with open(path, "r") as file:
+        for line in file:
+            line = line.split()
+            if len(line) == 2 and int(line[1]) != 10000:
+                scores[line[0]] = int(line[1])
+
+    return scores
+
+#Method that runs one variant on one instance with one seed and returns its measurements
+def run(name: str, instance: tuple, distances: list[list], variant: str, seed: int, seconds: float = None, iterations: int = None,
+        target: int = None, strategy: str = "best", neighbours: int = None, order: str = "fixed", construction: str = "random"):
+    budget = Budget(seconds, iterations)
+    recorder = Recorder(target)
+    #Without a fixed number of iterations the search runs until the time limit
+    n_iter = iterations if iterations is not None else sys.maxsize
+    #The progress the solvers print goes to stderr, so the report can be written to stdout
+    with redirect_stdout(sys.stderr):
+        result = solve(instance, variant, budget, seed, 1, n_iter, strategy, neighbours, distances, recorder, stats=MoveStats(), order=order, construction=construction, events=print_event)
+    recorder.record(result["total_distance"])
+    moves = sum(move["calls"] for move in result["move_stats"]["moves"].values())
+
+    return {
+        "instance": name,
+        "variant": variant,
+        "seed": seed,
+        "total_distance": result["total_distance"],
+        "target": target,
+        "time_to_target": recorder.time_to_target,
+        "seconds": round(result["seconds"], 4),
+        "restarts": budget.spent,
+        "restarts_per_second": round(budget.spent / result["seconds"], 4),
+        "moves": moves,
+        "moves_per_second": round(moves / result["seconds"], 2),
+        "move_stats": result["move_stats"]["moves"],
+        "curve": recorder.curve,
+    }
+
+#Method that averages the measurements of the runs of every variant on every instance
+def summarize(runs: list[dict]):
+    groups = {}
+    for result in runs:
+        groups.setdefault(f"{result['variant']}/{result['instance']}", []).append(result)
+
+    summary = {}
+    for key, results in groups.items():
+        reached = [result["time_to_target"] for result in results if result["time_to_target"] is not None]
+        summary[key] = {
+            "runs": len(results),
+            "best_distance": min(result["total_distance"] for result in results),
+            "mean_distance": sum(result["total_distance"] for result in results) / len(results),
+            "reached_target": len(reached),
+            "mean_time_to_target": sum(reached) / len(reached) if reached else None,
+            "restarts_per_second": sum(result["restarts_per_second"] for result in results) / len(results),
+            "moves_per_second": sum(result["moves_per_second"] for result in results) / len(results),
+        }
+
+    return summary
+
+#Method that runs the whole benchmark and returns the report
+def benchmark(directory: str, instances: str = INSTANCES, variants: list = None, seeds: list = None, seconds: float = None,
+              iterations: int = None, gap: float = 0.0, strategy: str = "best", neighbours: int = None, order: str = "fixed", construction: str = "random"):
+    variants = list(VARIANTS) if variants is None else variants
+    seeds = SEEDS if seeds is None else seeds
+    runs = []
+    for name in instances:
+        path = os.path.join(directory, name + ".gvrp")
+        if not os.path.isfile(path):
+            print(f"Instance {path} not found, skipped", file=sys.stderr)
+            continue
+        with redirect_stdout(sys.stderr):
+            instance, distances = load_instance(path)
+        for variant in variants:
+            best = best_known(directory, variant).get(name)
+            target = None if best is None else int(best * (1 + gap))
+            for seed in seeds:
+                result = run(name, instance, distances, variant, seed, seconds, iterations, target, strategy, neighbours, order, construction)
+                print(f"{variant} {name} seed {seed}: {result['total_distance']} in {result['seconds']:.2f} seconds, "
+                      f"{result['restarts_per_second']:.2f} restarts/s, {result['moves_per_second']:.0f} moves/s", file=sys.stderr)
+                runs.append(result)
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time_limit": seconds,
+        "iterations": iterations,
+        "gap": gap,
+        "strategy": strategy,
+        "neighbours": neighbours,
+        "order": order,
+        "construction": construction,
+        "seeds": seeds,
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+
+#Method that compares the summary of a report with that of an earlier one and returns the regressions found
+def regressions(report: dict, baseline: dict, tolerance: float = TOLERANCE):
+    found = []
+    for key, summary in report["summary"].items():
+        old = baseline["summary"].get(key)
+        if old is None:
+            continue
+        for metric in ["restarts_per_second", "moves_per_second"]:
+            if old[metric] > 0 and summary[metric] < old[metric] * (1 - tolerance):
+                found.append(f"{key}: {metric} dropped from {old[metric]:.2f} to {summary[metric]:.2f}")
+        if summary["mean_distance"] > old["mean_distance"] * (1 + tolerance):
+            found.append(f"{key}: mean distance rose from {old['mean_distance']:.1f} to {summary['mean_distance']:.1f}")
+
+    return found
+
+
+# ------------------------------- Command line interface ------------------------------ #
+
+#Method that runs the benchmark from the command line, it exits with 1 when a regression against the baseline is found
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Clustered Vehicle Routing solvers")
+    parser.add_argument("--dir", default=".", help="the directory with the .gvrp files and best_we_found files (default .)")
+    parser.add_argument("--instances", default=INSTANCES, help=f"the letters of the instances (default {INSTANCES})")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS), help="the variants to run (default all)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=SEEDS, help=f"the seeds of the runs (default {' '.join(map(str, SEEDS))})")
+    parser.add_argument("--time-limit", type=float, default=None, help="the time limit of every run in seconds")
+    parser.add_argument("--iterations", type=int, default=None, help="the number of iterations of every run")
+    parser.add_argument("--gap", type=float, default=0.0, help="the fraction above the best known score that counts as reaching the target (default 0)")
+    parser.add_argument("--strategy", choices=["best", "first"], default="best", help="best or first improvement (default best)")
+    parser.add_argument("--neighbours", type=int, default=None, help="the size of the candidate lists (default full neighbourhoods)")
+    parser.add_argument("--order", choices=ORDERS, default="fixed", help="the order of the moves (default fixed)")
+    parser.add_argument("--construction", choices=CONSTRUCTIONS, default="random", help="the construction of the starting solutions (default random)")
+    parser.add_argument("--output", default=None, help="the JSON file of the report (default the screen)")
+    parser.add_argument("--baseline", default=None, help="an earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help=f"the allowed drop of the throughputs and rise of the mean distance (default {TOLERANCE})")
+    args = parser.parse_args(argv)
+    if args.time_limit is None and args.iterations is None:
+        parser.error("give a --time-limit and/or a number of --iterations")
+
+    report = benchmark(args.dir, args.instances, args.variants, args.seeds, args.time_limit, args.iterations, args.gap, args.strategy, args.neighbours, args.order, args.construction)
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            found = regressions(report, json.load(file), args.tolerance)
+        for line in found:
+            print(line, file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
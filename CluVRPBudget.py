@@ -0,0 +1,207 @@
+import os
+import pickle
+import signal
+import sys
+from time import time
+
+from CluVRPSolution import Solution
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module bounds the searches of the Strong and Weak programs by wall-clock time and/or
+# by a number of iterations, and keeps the best solution found so far on disk while they run
+
+# A checkpoint is written in the format of the solution file of the program, and like
+# write_solution it only replaces the file when it holds a better solution
+
+# A snapshot holds the state of a search at the start of an iteration (counters, best solution
+# and random state), so a search that was stopped can be resumed exactly where it left off
+
+# Files are replaced atomically, so a run that is killed or runs out of time always leaves
+# the last checkpointed solution and search state behind and never a half written file
+
+
+# ------------------------------------ Budgets ---------------------------------------- #
+
+#Class that bounds a search by a number of seconds and/or a number of iterations (None means no bound)
+class Budget:
+
+    def __init__(self, seconds: float = None, iterations: int = None):
+        self.seconds = seconds
+        self.iterations = iterations
+        #The deadline is kept in wall-clock time so that it means the same in the worker processes
+        self.deadline = None if seconds is None else time() + seconds
+        self.spent = 0
+        self.parent = None
+
+    #Method that counts finished iterations of the search, also in the budget this one was shared from
+    def spend(self, iterations: int = 1):
+        self.spent += iterations
+        if self.parent is not None:
+            self.parent.spend(iterations)
+
+    #Method that returns the seconds left before the deadline (None if there is no time bound)
+    def remaining_seconds(self):
+        if self.deadline is None:
+            return None
+
+        return max(self.deadline - time(), 0)
+
+    #Method that returns the iterations left (None if there is no iteration bound)
+    def remaining_iterations(self):
+        if self.iterations is None:
+            return None
+
+        return max(self.iterations - self.spent, 0)
+
+    #Method that checks if the deadline has passed, also that of the budget this one was shared from (which may be stopped
+    #earlier, see CluVRPService), the local search uses it to stop between two moves
+    def expired(self):
+        if self.deadline is not None and time() >= self.deadline:
+            return True
+
+        return self.parent is not None and self.parent.expired()
+
+    #Method that checks if the search has to stop before starting a new iteration
+    def exhausted(self):
+        if self.expired():
+            return True
+        if self.iterations is not None and self.spent >= self.iterations:
+            return True
+
+        return self.parent is not None and self.parent.exhausted()
+
+    #Method that returns a budget with a fraction of what is left of this one, for one phase of a search
+    def share(self, fraction: float):
+        seconds = self.remaining_seconds()
+        iterations = self.remaining_iterations()
+        budget = Budget(None if seconds is None else seconds * fraction, None if iterations is None else int(iterations * fraction))
+        budget.parent = self
+        return budget
+
+
+# ---------------------------------- Checkpoints -------------------------------------- #
+
+#Default number of seconds between two checkpoints of the best solution (0 writes every improvement)
+CHECKPOINT_INTERVAL = 10
+
+#Method that reads the distance of the solution saved in a solution file, or None if there is no such file
+def saved_distance(path: str):
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "r") as file:
+        line = file.readline().strip()
+
+    return int(line) if line else None
+
+#Method that writes lines to a file through a temporary file, so the file is replaced at once
+def write_atomic(path: str, lines: list):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        for line in lines:
+            file.write(line+"\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+#Method that pickles an object to a file through a temporary file, so the file is replaced at once
+def dump_atomic(path: str, data):
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+#Class that writes the best solution of a search to its solution file at most once every interval seconds,
+#solution_lines is the method of the program that turns a Solution (see CluVRPSolution) into the lines of that file
+class Checkpoint:
+
+    def __init__(self, path: str, solution_lines, interval: float = CHECKPOINT_INTERVAL):
+        self.path = path
+        self.solution_lines = solution_lines
+        self.interval = interval
+        self.saved = saved_distance(path)
+        self.pending = None
+        self.last_time = time()
+
+    #Method that offers the best solution of the search, kept as a Solution
+    def update(self, solution: Solution):
+        if self.saved is not None and solution.total_distance >= self.saved:
+            return
+        if self.pending is None or solution.total_distance < self.pending.total_distance:
+            self.pending = solution
+        if time() - self.last_time >= self.interval:
+            self.flush()
+
+    #Method that writes the pending solution, if there is one
+    def flush(self):
+        if self.pending is None:
+            return
+
+        write_atomic(self.path, self.solution_lines(self.pending))
+        self.saved = self.pending.total_distance
+        self.pending = None
+        self.last_time = time()
+
+
+# ---------------------------------- Search states ------------------------------------ #
+
+#Default number of seconds between two saves of the search state
+SNAPSHOT_INTERVAL = 60
+
+#Class that saves the state of the phases of a search (one state per phase, e.g. "MS_VNS" and "ITER_VNS")
+#at most once every interval seconds, so that a stopped search can be resumed
+class Snapshot:
+
+    def __init__(self, path: str, interval: float = SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.states = {}
+        if os.path.isfile(path):
+            with open(path, "rb") as file:
+                self.states = pickle.load(file)
+        self.pending = False
+        self.last_time = time()
+
+    #Method that returns the saved state of a phase, or None if that phase has not been started yet
+    def load(self, phase: str, clusters: list[list], demands: list):
+        state = self.states.get(phase)
+        if state is not None and (state["clusters"] != clusters or state["demands"] != demands):
+            raise ValueError(f"The search state in {self.path} belongs to a different instance")
+
+        return state
+
+    #Method that offers the state of a phase, the lists in it must not be changed afterwards
+    def update(self, state: dict):
+        self.states[state["phase"]] = state
+        self.pending = True
+        if time() - self.last_time >= self.interval:
+            self.flush()
+
+    #Method that writes the states, if one of them changed since the last write
+    def flush(self):
+        if not self.pending:
+            return
+
+        dump_atomic(self.path, self.states)
+        self.pending = False
+        self.last_time = time()
+
+    #Method that removes the saved states once the search has finished, so the next run starts a new search
+    def clear(self):
+        self.states = {}
+        self.pending = False
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+#Method that makes SIGTERM and SIGINT write what is pending in the checkpoints/snapshots before the program exits
+def flush_on_signals(*files):
+    def stop(signum, frame):
+        for file in files:
+            if file is not None:
+                file.flush()
+        sys.exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
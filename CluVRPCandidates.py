@@ -0,0 +1,138 @@
+from heapq import nsmallest
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module builds the candidate lists used by the granular neighbourhoods of the VNS
+# and enumerates the candidates of the moves, and is shared by the Strong and Weak programs
+
+# Without candidate lists (near is None) every generator yields the candidates in the exact
+# order of the original nested loops, so best-improvement scans are unchanged
+
+# With candidate lists, a position/cluster is only paired with the ones holding its nearest
+# customers/clusters, which are computed once from the distance matrix
+
+
+# ----------------------------- Candidate lists --------------------------------------- #
+
+#Method that returns for every customer its nearest customers (closest first), among all customers or only those of its own cluster
+def nearest_customers(distances: list[list], clusters: list[list], size: int, same_cluster: bool = False):
+    near = {}
+    customers = [customer for cluster in clusters for customer in cluster]
+    for cluster in clusters:
+        pool = cluster if same_cluster else customers
+        for customer in cluster:
+            row = distances[customer]
+            near[customer] = nsmallest(size, (other for other in pool if other != customer), key=row.__getitem__)
+
+    return near
+
+#Method that computes the distance between two clusters as the distance between their two closest customers
+def cluster_distance(distances: list[list], cluster1: list, cluster2: list):
+    return min(min(distances[customer][other] for other in cluster2) for customer in cluster1)
+
+#Method that returns for every cluster its nearest clusters (closest first)
+def nearest_clusters(distances: list[list], clusters: list[list], size: int):
+    gaps = [[0] * len(clusters) for _ in range(len(clusters))]
+    for i in range(len(clusters)):
+        for j in range(i+1, len(clusters)):
+            gaps[i][j] = gaps[j][i] = cluster_distance(distances, clusters[i], clusters[j])
+
+    near = {}
+    for i in range(len(clusters)):
+        near[i] = nsmallest(size, (j for j in range(len(clusters)) if j != i), key=gaps[i].__getitem__)
+
+    return near
+
+#Method that builds all the candidate lists of the granular neighbourhoods for a given list size
+def candidate_lists(distances: list[list], clusters: list[list], size: int):
+    return {
+        "customers": nearest_customers(distances, clusters, size),
+        "cluster_customers": nearest_customers(distances, clusters, size, True),
+        "clusters": nearest_clusters(distances, clusters, size),
+    }
+
+
+# ----------------------------- Candidate enumeration --------------------------------- #
+
+#Method that returns the position of every item of a list
+def list_positions(items: list):
+    positions = {}
+    for position in range(len(items)):
+        positions[items[position]] = position
+
+    return positions
+
+#Method that returns the positions j that are paired with position i of a list
+def partner_positions(items: list, i: int, near: dict, positions: dict):
+    if near is None:
+        return range(len(items))
+
+    return [positions[item] for item in near[items[i]] if item in positions]
+
+#Method that yields the (i, j) pairs of swap_in_list(items, i, j)
+def swap_candidates(items: list, near: dict = None):
+    positions = None if near is None else list_positions(items)
+    for i in range(len(items)):
+        for j in partner_positions(items, i, near, positions):
+            yield i, j
+
+#Method that yields the (i, j, k) triples of move_in_list(items, i, j, k), with the segment of length k starting at i
+def segment_candidates(items: list, near: dict = None):
+    positions = None if near is None else list_positions(items)
+    for i in range(len(items)):
+        for j in partner_positions(items, i, near, positions):
+            for k in range(1, len(items)+1):
+                if max(i + k, j + k) <= len(items):
+                    yield i, j, k
+
+#Method that yields the (vehicle, position, other vehicle, other position) cluster pairs of two different vehicles,
+#grouped by the first vehicle and position
+def relocate_candidates(cluster_orders: list[list], near: dict = None, positions: dict = None):
+    for i in range(len(cluster_orders)):
+        for j in range(len(cluster_orders[i])):
+            if near is None:
+                for k in range(len(cluster_orders)):
+                    if k != i:
+                        for l in range(len(cluster_orders[k])):
+                            yield i, j, k, l
+            else:
+                for cluster in near[cluster_orders[i][j]]:
+                    k, l = positions[cluster]
+                    if k != i:
+                        yield i, j, k, l
+
+#Method that yields the (vehicle1, vehicle2, position1, position2) cluster pairs exchanged between two vehicles,
+#grouped by the pair of vehicles
+def exchange_candidates(cluster_orders: list[list], near: dict = None, positions: dict = None):
+    if near is None:
+        for i in range(len(cluster_orders)):
+            for j in range(len(cluster_orders)):
+                if i != j:
+                    for k in range(len(cluster_orders[i])):
+                        for l in range(len(cluster_orders[j])):
+                            yield i, j, k, l
+    else:
+        for i in range(len(cluster_orders)):
+            for k in range(len(cluster_orders[i])):
+                for cluster in near[cluster_orders[i][k]]:
+                    j, l = positions[cluster]
+                    if j != i:
+                        yield i, j, k, l
+
+#Method that yields the (vehicle, target vehicle, position) triples where a block of clusters starting at position
+#of vehicle may be moved to the target vehicle: all other vehicles, or those serving one of the nearest clusters
+def target_candidates(cluster_orders: list[list], near: dict = None, positions: dict = None):
+    for i in range(len(cluster_orders)):
+        for j in range(len(cluster_orders)):
+            if i != j:
+                for k in range(len(cluster_orders[i])):
+                    if near is None or any(positions[cluster][0] == j for cluster in near[cluster_orders[i][k]]):
+                        yield i, j, k
+
+#Method that returns for every cluster the vehicle it belongs to and its position in that vehicle's route
+def cluster_positions(cluster_orders: list[list]):
+    positions = {}
+    for vehicle in range(len(cluster_orders)):
+        for position in range(len(cluster_orders[vehicle])):
+            positions[cluster_orders[vehicle][position]] = (vehicle, position)
+
+    return positions
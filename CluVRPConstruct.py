@@ -0,0 +1,140 @@
+from bisect import bisect_left, insort
+import random
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module builds the starting solutions of the Strong and Weak programs: it packs the
+# clusters into exactly k vehicles without exceeding the capacity, and can put the clusters
+# and customers of every vehicle in a greedy order
+
+# The clusters are packed by best fit: the first k clusters of the order each get their own
+# vehicle (so no vehicle stays empty) and every other cluster goes to the vehicle with the least
+# free capacity that still fits it. A cluster that fits nowhere goes to the vehicle with the most
+# free capacity, and the overloaded vehicles are repaired afterwards by moving their clusters to
+# vehicles with room, or by exchanging them with smaller clusters of other vehicles
+
+# Every move or exchange of the repair lowers the overload by at least one, so it ends after at
+# most as many steps as the overload. The clusters are first packed in a random order, which
+# gives the restarts different starting solutions, and if that cannot be repaired again from
+# the largest demand down (best fit decreasing); only if that fails as well an error is raised
+
+# The constructions of the starting solutions:
+#   "random" - the clusters of a vehicle and the customers of a cluster in a random order
+#   "greedy" - every vehicle goes on to the nearest cluster (Strong) or customer (Weak) it has left
+
+# Example: python CluVRPSolve.py D.gvrp --variant strong --construction greedy
+
+
+#The constructions of the starting solutions
+CONSTRUCTIONS = ["random", "greedy"]
+
+#Method that checks the name of a construction of the starting solutions
+def check_construction(construction: str):
+    if construction not in CONSTRUCTIONS:
+        raise ValueError(f"Unknown construction {construction!r}, expected 'random' or 'greedy'")
+
+#Method that packs the clusters in the given order into k vehicles by best fit and returns the vehicles and their loads,
+#a cluster that fits in no vehicle goes to the one with the most free capacity, which is then overloaded
+def best_fit(k: int, Q: int, demands: list, order: list):
+    vehicles = [[cluster] for cluster in order[:k]]
+    loads = [demands[cluster] for cluster in order[:k]]
+    #The free capacity of every vehicle as (free, vehicle), from the least to the most
+    free = sorted((Q - loads[vehicle], vehicle) for vehicle in range(k))
+
+    for cluster in order[k:]:
+        demand = demands[cluster]
+        index = bisect_left(free, (demand, -1))
+        if index == len(free):
+            index = len(free) - 1
+        vehicle = free.pop(index)[1]
+        vehicles[vehicle].append(cluster)
+        loads[vehicle] += demand
+        insort(free, (Q - loads[vehicle], vehicle))
+
+    return vehicles, loads
+
+#Method that lowers the overload of a vehicle by moving one of its clusters to a vehicle with room for it, or else by exchanging
+#one of its clusters with a smaller one of another vehicle, and returns False if neither is possible
+def unload(Q: int, demands: list, vehicles: list[list], loads: list, vehicle: int):
+    #Move the largest cluster that fits somewhere to the fullest vehicle it fits in
+    for cluster in sorted(vehicles[vehicle], key=lambda cluster: -demands[cluster]):
+        targets = [other for other in range(len(vehicles)) if other != vehicle and loads[other] + demands[cluster] <= Q]
+        if targets:
+            target = max(targets, key=lambda other: loads[other])
+            vehicles[vehicle].remove(cluster)
+            vehicles[target].append(cluster)
+            loads[vehicle] -= demands[cluster]
+            loads[target] += demands[cluster]
+            return True
+
+    for cluster in vehicles[vehicle]:
+        for other in range(len(vehicles)):
+            if other == vehicle:
+                continue
+            for other_cluster in vehicles[other]:
+                difference = demands[cluster] - demands[other_cluster]
+                if difference > 0 and loads[other] + difference <= Q:
+                    vehicles[vehicle][vehicles[vehicle].index(cluster)] = other_cluster
+                    vehicles[other][vehicles[other].index(other_cluster)] = cluster
+                    loads[vehicle] -= difference
+                    loads[other] += difference
+                    return True
+
+    return False
+
+#Method that repairs the overloaded vehicles of a packing and returns False if it cannot
+def repair(Q: int, demands: list, vehicles: list[list], loads: list):
+    for vehicle in range(len(vehicles)):
+        while loads[vehicle] > Q:
+            if not unload(Q, demands, vehicles, loads, vehicle):
+                return False
+
+    return True
+
+#Method that packs the clusters into exactly k vehicles of capacity Q and returns the clusters of every vehicle
+def pack_clusters(k: int, Q: int, demands: list, rng: random.Random = random):
+    if not 1 <= k <= len(demands):
+        raise ValueError(f"Cannot pack {len(demands)} clusters into {k} vehicles")
+    if max(demands) > Q:
+        raise ValueError(f"A cluster with demand {max(demands)} does not fit in a vehicle of capacity {Q}")
+
+    order = list(range(len(demands)))
+    rng.shuffle(order)
+    vehicles, loads = best_fit(k, Q, demands, order)
+    if repair(Q, demands, vehicles, loads):
+        return vehicles
+
+    order.sort(key=lambda cluster: -demands[cluster])
+    vehicles, loads = best_fit(k, Q, demands, order)
+    if repair(Q, demands, vehicles, loads):
+        return vehicles
+
+    raise ValueError(f"Could not pack the clusters into {k} vehicles of capacity {Q}")
+
+#Method that returns the customers in the order of a walk from start that always goes on to the nearest customer left
+def nearest_path(distances: list[list], start: int, customers: list):
+    left = list(customers)
+    path = []
+    position = start
+    while left:
+        row = distances[position]
+        position = min(left, key=row.__getitem__)
+        left.remove(position)
+        path.append(position)
+
+    return path
+
+#Method that puts the clusters of a vehicle route of the Strong programs in the order of a walk from the depot that always goes
+#on to the cluster with the nearest customer, and the customers of every cluster in the order of the nearest customer
+def greedy_route(distances: list[list], clusters: list[list], vehicle_route: list, customer_orders: dict):
+    left = list(vehicle_route)
+    route = []
+    position = 0
+    while left:
+        row = distances[position]
+        cluster = min(left, key=lambda cluster: min(row[customer] for customer in clusters[cluster]))
+        left.remove(cluster)
+        route.append(cluster)
+        customer_orders[cluster] = nearest_path(distances, position, clusters[cluster])
+        position = customer_orders[cluster][-1]
+
+    vehicle_route[:] = route
@@ -0,0 +1,216 @@
+from math import sqrt
+from collections import OrderedDict
+from array import array
+import mmap
+import os
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module computes the rounded euclidean distances between the points of an instance
+# and is shared by the Strong and Weak programs
+
+# All the distance stores below are indexed as distances[i][j], which is the only access
+# pattern the moves of the VNS use
+
+# Instances with many points can use LazyDistances, which only keeps the most recently used
+# rows in memory instead of the full n x n matrix
+
+# NumPy is optional: without it the distances are computed with the original double loop
+
+# The worker processes of the parallel searches get large matrices through a file mapped in
+# memory (see SharedDistances), so that every worker reads the same copy of the matrix
+
+
+# ----------------------------- Full distance matrix ---------------------------------- #
+
+#From this number of points on, the matrix is kept packed in a compact integer array instead of Python lists
+PACKED_FROM = 2000
+
+#Number of matrix entries computed at once by the vectorized construction (bounds the temporary arrays)
+BLOCK_ENTRIES = 1 << 22
+
+#Class that holds a packed distance matrix as a list of row views, so that distances[i][j] reads the array directly
+class DistanceMatrix(list):
+
+    def __init__(self, matrix):
+        super().__init__(memoryview(row) for row in matrix)
+        self.matrix = matrix
+
+    #The row views can not be pickled, so worker processes rebuild them from the array
+    def __reduce__(self):
+        return (DistanceMatrix, (self.matrix,))
+
+#Method that returns the smallest integer type that can hold every distance between the points
+def distance_dtype(points: list[tuple]):
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    bound = round(sqrt((max(xs) - min(xs)) **2 + (max(ys) - min(ys)) **2))
+    if bound <= np.iinfo(np.int16).max:
+        return np.int16
+    if bound <= np.iinfo(np.int32).max:
+        return np.int32
+
+    return np.int64
+
+#Method that computes the distances between the points as a numpy array, a block of rows at a time
+def distance_array(n: int, points: list[tuple]):
+    coordinates = np.array(points[:n], dtype=np.int64)
+    matrix = np.empty((n, n), dtype=distance_dtype(points[:n]))
+    rows = max(1, BLOCK_ENTRIES // max(n, 1))
+    for start in range(0, n, rows):
+        block = coordinates[start:start+rows]
+        dx = block[:, 0, None] - coordinates[None, :, 0]
+        dy = block[:, 1, None] - coordinates[None, :, 1]
+        #np.rint rounds halves to even, exactly like round() on the result of sqrt
+        matrix[start:start+rows] = np.rint(np.sqrt(dx * dx + dy * dy))
+
+    return matrix
+
+#Method that computes the distances between the points and returns them in adjancencency matrix form:
+def distance_matrix(n: int, points: list[tuple], packed: bool = None):
+    if np is None:
+        distance_matrix = [[0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(n):
+                distance_matrix[i][j] = round(sqrt((points[i][0] - points[j][0]) **2 + (points[i][1] - points[j][1]) **2))
+        return distance_matrix
+
+    if packed is None:
+        packed = n >= PACKED_FROM
+    matrix = distance_array(n, points)
+    if packed:
+        return DistanceMatrix(matrix)
+
+    #Python lists are the fastest to index, so small instances keep them
+    return matrix.tolist()
+
+
+# ----------------------------- On-demand distances ----------------------------------- #
+
+#From this number of points on, distance_provider computes the rows on demand instead of building the full matrix
+LAZY_FROM = 20000
+
+#Default number of rows kept by LazyDistances
+CACHE_ROWS = 2048
+
+#Class that computes the rows of the distance matrix when they are first used and keeps the most recent ones in an LRU cache
+class LazyDistances:
+
+    def __init__(self, n: int, points: list[tuple], cache_rows: int = CACHE_ROWS):
+        self.n = n
+        self.points = points[:n]
+        self.cache_rows = max(cache_rows, 1)
+        self.rows = OrderedDict()
+        if np is not None:
+            self.coordinates = np.array(self.points, dtype=np.int64)
+            self.dtype = distance_dtype(self.points)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i: int):
+        rows = self.rows
+        row = rows.get(i)
+        if row is not None:
+            rows.move_to_end(i)
+            return row
+
+        row = self.compute_row(i)
+        rows[i] = row
+        if len(rows) > self.cache_rows:
+            rows.popitem(last=False)
+        return row
+
+    #Method that computes the distances from point i to every point
+    def compute_row(self, i: int):
+        if np is None:
+            x, y = self.points[i]
+            return [round(sqrt((x - point[0]) **2 + (y - point[1]) **2)) for point in self.points]
+
+        dx = self.coordinates[:, 0] - self.coordinates[i, 0]
+        dy = self.coordinates[:, 1] - self.coordinates[i, 1]
+        return memoryview(np.rint(np.sqrt(dx * dx + dy * dy)).astype(self.dtype))
+
+    #Only the points are sent to worker processes, every worker fills its own cache
+    def __reduce__(self):
+        return (LazyDistances, (self.n, self.points, self.cache_rows))
+
+#Method that returns the full distance matrix, or on-demand distances for instances of at least LAZY_FROM points
+def distance_provider(n: int, points: list[tuple], lazy: bool = None, cache_rows: int = CACHE_ROWS):
+    if lazy is None:
+        lazy = n >= LAZY_FROM
+    if lazy:
+        return LazyDistances(n, points, cache_rows)
+
+    return distance_matrix(n, points)
+
+
+# ----------------------------- Shared distances -------------------------------------- #
+
+# A matrix sent to the worker processes as it is, is pickled and rebuilt in every worker, so the
+# memory grows with the number of workers. A matrix mapped from a file is sent as the name of the
+# file: every worker maps the same pages of memory, and nothing is computed or copied again
+
+#Directory of the temporary files of the shared matrices where there is one, it is kept in memory and never written to disk
+SHARED_DIR = "/dev/shm"
+
+#Class that holds a distance matrix mapped from a file (at offset, row by row) as a list of row views, so that distances[i][j] reads the mapped memory
+class MappedDistances(list):
+
+    def __init__(self, path: str, offset: int, n: int, typecode: str):
+        with open(path, "rb") as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mapped)[offset:offset + n * n * array(typecode).itemsize].cast(typecode)
+        super().__init__(view[i*n:(i+1)*n] for i in range(n))
+        self.path = path
+        self.offset = offset
+        self.typecode = typecode
+
+    #The row views can not be pickled, so worker processes map the same file again
+    def __reduce__(self):
+        return (MappedDistances, (self.path, self.offset, len(self), self.typecode))
+
+#Method that returns the type code of the smallest integer array type that can hold the numbers from 0 to bound
+def array_typecode(bound: int):
+    if bound < 1 << 15:
+        return "h"
+    if bound < 1 << 31:
+        return "i"
+
+    return "q"
+
+#Method that writes the rows of a distance matrix to a binary file, one after the other in the array type of typecode
+def write_distances(file, distances: list[list], typecode: str):
+    for row in distances:
+        array(typecode, row).tofile(file)
+
+#Class that shares a distance matrix with worker processes for the time of a with block, as MappedDistances of a temporary
+#file that is removed at the end of the block. Distances that are already cheap to send are used as they are: mapped from a
+#file, computed on demand, or small enough to be kept in Python lists (below PACKED_FROM points, like distance_matrix)
+class SharedDistances:
+
+    def __init__(self, distances: list[list]):
+        self.distances = distances
+        self.path = None
+
+    def __enter__(self):
+        distances = self.distances
+        if not (type(distances) is list or isinstance(distances, DistanceMatrix)) or len(distances) < PACKED_FROM:
+            return distances
+
+        typecode = array_typecode(max(map(max, distances)))
+        descriptor, self.path = tempfile.mkstemp(suffix=".distances", dir=SHARED_DIR if os.path.isdir(SHARED_DIR) else None)
+        with os.fdopen(descriptor, "wb") as file:
+            write_distances(file, distances, typecode)
+        return MappedDistances(self.path, 0, len(distances), typecode)
+
+    #The workers have ended by the end of the block, the processes that still map the file keep their pages until they unmap them
+    def __exit__(self, *exception):
+        if self.path is not None:
+            os.remove(self.path)
+            self.path = None
@@ -0,0 +1,255 @@
+from time import perf_counter, time
+import json
+
+from CluVRPBudget import write_atomic
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module reports the progress of the searches as events: every phase of a search
+# (MS_VNS, ITER_VNS, VNS) follows its progress with a Progress, which passes every event to
+# a callback, so the progress can be printed, written down or exported to a dashboard
+
+# An event is a dictionary:
+#   {"event": ..., "phase": ..., "time": seconds since the epoch, "seconds": seconds since the phase started,
+#    "iteration": iterations done in the phase, "best_distance": best distance of the phase so far, ...}
+# and the events are:
+#   improvement - a new best distance
+#   restart     - an iteration ended (a restart of the Multi-Start, a perturbation of the Iterative VNS),
+#                 with the "total_distance" it found
+#   status      - once every "every" iterations, with the fields given by the status method of the
+#                 phase (if there is one), e.g. the "elites" and "diversity" of the pool of elites
+#   milestone   - the phase has run for "milestone" seconds, one of MILESTONES
+#   stagnation  - the phase stops after "without_improvement" iterations without a new best distance
+#   budget      - the phase stops because its budget is used up
+#   finished    - the phase ended
+
+# A search only makes events when it is given a callback. The milestones are followed even
+# without one (the Multi-Start only stops on stagnation after 10 seconds), with one reading of
+# the clock per iteration that is compared with the next milestone only
+
+# The callbacks are:
+#   print_event        - prints the progress to the screen, as the programs always did
+#   JsonLines          - writes every event to a file as a line of JSON
+#   ConvergenceMetrics - counts the events and keeps the convergence of every phase, and writes
+#                        them to a file in the text format of Prometheus (e.g. for the textfile
+#                        collector of the node exporter) at most once every interval seconds
+# and broadcast() passes the events on to several callbacks, labelled() to one with the phases
+# of a search that runs inside another one under a label (e.g. "strong-start/MS_VNS" for the
+# Strong start of the weak-v2 variant)
+
+
+#The seconds of the phase after which the best distance is reported
+MILESTONES = (1, 10, 30, 60, 300, 1800)
+
+#How every milestone is printed
+MILESTONE_NAMES = {1: "1 second", 10: "10 seconds", 30: "30 seconds", 60: "60 seconds", 300: "300 seconds(5 minutes)", 1800: "1800 seconds(30 minutes)"}
+
+#Default number of seconds between two writes of the metrics
+METRICS_INTERVAL = 10
+
+
+# ------------------------------------- Progress -------------------------------------- #
+
+#Class that follows the progress of a phase of a search and passes its events to the callback (if there is one),
+#reached, elapsed and iteration are the milestones passed, the seconds run and the iterations done before a phase is resumed,
+#and status returns the fields added to the status events
+class Progress:
+
+    def __init__(self, phase: str, callback = None, every: int = 1, reached: int = 0, elapsed: float = 0, iteration: int = 0, status = None):
+        self.phase = phase
+        self.callback = callback
+        self.every = max(every, 1)
+        self.status = status
+        #The search states saved by older versions keep a flag per milestone
+        if isinstance(reached, tuple):
+            reached = sum(reached)
+        self.reached = reached
+        self.start = perf_counter() - elapsed
+        self.iteration = iteration
+
+    #Method that returns the seconds since the phase started
+    def seconds(self):
+        return perf_counter() - self.start
+
+    #Method that checks if the phase has passed the milestone of the given seconds
+    def passed(self, seconds: int):
+        return self.reached > MILESTONES.index(seconds)
+
+    #Method that passes an event to the callback
+    def emit(self, event: str, iteration: int, best_total_distance: int, seconds: float = None, **fields):
+        if self.callback is None:
+            return
+
+        if seconds is None:
+            seconds = self.seconds()
+        self.callback(dict({"event": event, "phase": self.phase, "time": time(), "seconds": round(seconds, 4),
+                            "iteration": iteration, "best_distance": best_total_distance}, **fields))
+
+    #Method that reports a new best distance
+    def improvement(self, iteration: int, best_total_distance: int):
+        self.emit("improvement", iteration, best_total_distance)
+
+    #Method that is called at the end of every iteration with the distance it found, it returns the milestones passed since the last call
+    def restart(self, iteration: int, total_distance: int, best_total_distance: int):
+        seconds = self.seconds()
+        self.iteration = iteration
+        self.emit("restart", iteration, best_total_distance, seconds, total_distance=total_distance)
+        passed = []
+        while self.reached < len(MILESTONES) and seconds > MILESTONES[self.reached]:
+            passed.append(MILESTONES[self.reached])
+            self.reached += 1
+            self.emit("milestone", iteration, best_total_distance, seconds, milestone=passed[-1])
+        if iteration % self.every == 0 and self.callback is not None:
+            self.emit("status", iteration, best_total_distance, seconds, **(self.status() if self.status is not None else {}))
+
+        return passed
+
+    #Method that reports that the phase stops for lack of improvement
+    def stagnation(self, iteration: int, best_total_distance: int, without_improvement: int):
+        self.emit("stagnation", iteration, best_total_distance, without_improvement=without_improvement)
+
+    #Method that reports that the phase stops because its budget is used up
+    def budget(self, iteration: int, best_total_distance: int):
+        self.emit("budget", iteration, best_total_distance)
+
+    #Method that reports the end of the phase
+    def finished(self, best_total_distance: int):
+        self.emit("finished", self.iteration, best_total_distance)
+
+
+# ------------------------------------ Callbacks -------------------------------------- #
+
+#Method that returns a callback passing the events on to all the given callbacks (None when there is none)
+def broadcast(*callbacks):
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if len(callbacks) <= 1:
+        return callbacks[0] if callbacks else None
+
+    def callback(event: dict):
+        for each in callbacks:
+            each(event)
+
+    return callback
+
+#Method that returns a callback passing the events on with their phase under the given label (None when there is no callback)
+def labelled(callback, label: str):
+    if callback is None:
+        return None
+
+    def labelled_callback(event: dict):
+        callback(dict(event, phase=f"{label}/{event['phase']}"))
+
+    return labelled_callback
+
+#Method that prints an event to the screen: the milestones, the new best distances after 30 seconds,
+#the status after 60 seconds and the reason a phase stops
+def print_event(event: dict):
+    kind = event["event"]
+    if kind == "milestone":
+        if event["milestone"] >= 300:
+            print()
+        print(f"After {MILESTONE_NAMES[event['milestone']]}, {event['iteration']} iterations, best solution found has total distance:")
+        print(event["best_distance"])
+        if event["milestone"] >= 60:
+            print()
+    elif kind == "improvement" and event["seconds"] > 30:
+        print(f"After {event['iteration']} iterations, {event['seconds']:.2f} seconds, the NEW best solution found has total distance: {event['best_distance']}")
+    elif kind == "status" and event["seconds"] > 60:
+        print(f"After {event['iteration']} iterations, {event['seconds']:.2f} seconds, the best solution found has total distance: {event['best_distance']}")
+    elif kind == "stagnation":
+        print(f"No improvement after {event['without_improvement']} iterations")
+        print(f"After {event['iteration']} iterations, {event['seconds']:.2f} seconds, the best solution found has total distance: {event['best_distance']}")
+        print()
+    elif kind == "budget":
+        print(f"Budget used up after {event['iteration']} iterations, {event['seconds']:.2f} seconds, the best solution found has total distance: {event['best_distance']}")
+        print()
+
+#Class that writes every event to a file as a line of JSON, with the given fields added (e.g. the instance and the variant),
+#the file is appended to so that a resumed search goes on with the same file
+class JsonLines:
+
+    def __init__(self, path: str, fields: dict = None):
+        self.file = open(path, "a", buffering=1)
+        self.fields = fields or {}
+
+    def __call__(self, event: dict):
+        self.file.write(json.dumps(dict(self.fields, **event)) + "\n")
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+#Method that returns the labels of a metric in the text format of Prometheus, the labels without a value are left out
+def metric_labels(labels: dict):
+    labels = {name: str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for name, value in labels.items() if value is not None}
+    return "{" + ",".join(f"{name}=\"{value}\"" for name, value in labels.items()) + "}"
+
+#Class that keeps counters of the events and the convergence of every phase, and writes them to a file in the text format of Prometheus
+#at most once every interval seconds and at the end of every phase, with the given labels added (e.g. the instance and the variant)
+class ConvergenceMetrics:
+
+    def __init__(self, path: str, interval: float = METRICS_INTERVAL, labels: dict = None):
+        self.path = path
+        self.interval = interval
+        self.labels = labels or {}
+        self.events = {}
+        self.phases = {}
+        self.last_time = time()
+
+    def __call__(self, event: dict):
+        key = (event["phase"], event["event"])
+        self.events[key] = self.events.get(key, 0) + 1
+        phase = self.phases.get(event["phase"])
+        if phase is None:
+            phase = self.phases[event["phase"]] = {"first_distance": event["best_distance"], "best_seconds": 0, "best_iteration": 0, "milestones": {}}
+        phase["best_distance"] = event["best_distance"]
+        phase["iteration"] = event["iteration"]
+        phase["seconds"] = event["seconds"]
+        if event["event"] == "improvement":
+            phase["best_seconds"] = event["seconds"]
+            phase["best_iteration"] = event["iteration"]
+        elif event["event"] == "milestone":
+            phase["milestones"][event["milestone"]] = event["best_distance"]
+        elif event["event"] == "status" and "diversity" in event:
+            phase["pool"] = (event["elites"], event["diversity"])
+
+        if event["event"] == "finished" or time() - self.last_time >= self.interval:
+            self.write()
+
+    #Method that returns the lines of the file of the metrics
+    def lines(self):
+        gauges = [
+            ("cluvrp_best_distance", "Best distance found by the phase", lambda phase: phase["best_distance"]),
+            ("cluvrp_first_distance", "Distance the phase started from", lambda phase: phase["first_distance"]),
+            ("cluvrp_iterations", "Iterations done by the phase", lambda phase: phase["iteration"]),
+            ("cluvrp_seconds", "Seconds the phase has run", lambda phase: phase["seconds"]),
+            ("cluvrp_iterations_per_second", "Iterations per second of the phase", lambda phase: phase["iteration"] / phase["seconds"] if phase["seconds"] > 0 else 0),
+            ("cluvrp_best_seconds", "Seconds of the phase when the best distance was found", lambda phase: phase["best_seconds"]),
+            ("cluvrp_iterations_without_improvement", "Iterations since the best distance was found", lambda phase: phase["iteration"] - phase["best_iteration"]),
+        ]
+        lines = ["# HELP cluvrp_events_total Events of the searches", "# TYPE cluvrp_events_total counter"]
+        for (phase, event), count in sorted(self.events.items()):
+            lines.append(f"cluvrp_events_total{metric_labels(dict(self.labels, phase=phase, event=event))} {count}")
+        for name, description, value in gauges:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            for phase in sorted(self.phases):
+                lines.append(f"{name}{metric_labels(dict(self.labels, phase=phase))} {value(self.phases[phase])}")
+        lines += ["# HELP cluvrp_elites Elite solutions in the pool", "# TYPE cluvrp_elites gauge"]
+        lines += [f"cluvrp_elites{metric_labels(dict(self.labels, phase=phase))} {self.phases[phase]['pool'][0]}" for phase in sorted(self.phases) if "pool" in self.phases[phase]]
+        lines += ["# HELP cluvrp_pool_diversity Mean distance between the elite solutions of the pool", "# TYPE cluvrp_pool_diversity gauge"]
+        lines += [f"cluvrp_pool_diversity{metric_labels(dict(self.labels, phase=phase))} {self.phases[phase]['pool'][1]}" for phase in sorted(self.phases) if "pool" in self.phases[phase]]
+        lines += ["# HELP cluvrp_milestone_distance Best distance of the phase after the seconds of every milestone", "# TYPE cluvrp_milestone_distance gauge"]
+        for phase in sorted(self.phases):
+            for seconds, distance in sorted(self.phases[phase]["milestones"].items()):
+                lines.append(f"cluvrp_milestone_distance{metric_labels(dict(self.labels, phase=phase, seconds=seconds))} {distance}")
+
+        return lines
+
+    #Method that writes the metrics to their file
+    def write(self):
+        write_atomic(self.path, self.lines())
+        self.last_time = time()
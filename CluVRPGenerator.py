@@ -0,0 +1,245 @@
+from math import ceil, sqrt
+from collections import Counter
+import argparse
+import os.path
+import random
+
+from CluVRPBudget import write_atomic
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module generates synthetic instances in the .gvrp format read by read_input, so the
+# solvers can be tried on instances of any size (from a hundred to tens of thousands of customers)
+
+# The depot is point 1 and every other point is a customer that belongs to exactly one cluster
+
+# The customers are placed with one of the distributions:
+#   "uniform"   - spread evenly over the square
+#   "clustered" - around a number of centres, like towns on a map
+#   "mixed"     - half of them uniform and half of them clustered
+
+# The clusters are made by cutting the customers, in the order of a Hilbert curve through the
+# square, into consecutive groups: neighbouring customers end up in the same cluster. The
+# compactness (between 0 and 1) is the fraction of customers that keep that place, the others
+# are exchanged with a customer at random, so 0 gives clusters spread all over the square
+
+# The capacity is the total demand divided by the number of vehicles plus some slack. Unless the
+# number of vehicles is given it is set to the number of vehicles first fit in a random order
+# needs most often, so the solvers are given about as many vehicles as the clusters need
+
+# Example: python CluVRPGenerator.py --customers 100 1000 10000 50000 --distribution mixed --seed 1
+
+
+# ----------------------------------- Settings ---------------------------------------- #
+
+#Distributions of the customers over the square
+DISTRIBUTIONS = ["uniform", "clustered", "mixed"]
+
+#Default number of customers per cluster and of clusters per vehicle
+CLUSTER_SIZE = 5
+CLUSTERS_PER_VEHICLE = 4
+
+#Default largest demand of a cluster (demands are drawn between 1 and this)
+MAX_DEMAND = 10
+
+#Default fraction of capacity above the average load of a vehicle
+SLACK = 0.1
+
+#Number of random first fits used to choose the number of vehicles
+FIT_SAMPLES = 5
+
+
+# ------------------------------------ Placement -------------------------------------- #
+
+#Method that returns the length of the side of the square for a number of customers,
+#so that the customers are about as dense as in the shipped instances
+def square_size(customers: int):
+    return max(100, round(10 * sqrt(customers)))
+
+#Method that draws a point around a centre, kept inside the square
+def around(centre: tuple, spread: float, size: int, rng: random.Random):
+    x = min(max(round(rng.gauss(centre[0], spread)), 0), size)
+    y = min(max(round(rng.gauss(centre[1], spread)), 0), size)
+    return x, y
+
+#Method that places the customers over the square
+def place_customers(customers: int, size: int, distribution: str, centres: int, rng: random.Random):
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution!r}, expected one of {', '.join(DISTRIBUTIONS)}")
+
+    uniform = customers if distribution == "uniform" else customers // 2 if distribution == "mixed" else 0
+    points = [(rng.randint(0, size), rng.randint(0, size)) for _ in range(uniform)]
+    if uniform < customers:
+        towns = [(rng.randint(0, size), rng.randint(0, size)) for _ in range(centres)]
+        spread = size / (4 * sqrt(centres))
+        points += [around(rng.choice(towns), spread, size, rng) for _ in range(customers - uniform)]
+        rng.shuffle(points)
+
+    return points
+
+#Method that returns the position of a point of a side x side grid on the Hilbert curve (side a power of 2)
+def hilbert_index(side: int, x: int, y: int):
+    index = 0
+    s = side // 2
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        index += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = side - 1 - x
+                y = side - 1 - y
+            x, y = y, x
+        s //= 2
+
+    return index
+
+
+# ------------------------------------- Clusters -------------------------------------- #
+
+#Method that splits the customers into r clusters of (almost) equal size, where compactness is the fraction
+#of customers that stay with their neighbours on the Hilbert curve
+def make_clusters(points: list[tuple], r: int, size: int, compactness: float, rng: random.Random):
+    side = 1
+    while side <= size:
+        side *= 2
+    #The depot is point 0, the customers are the points 1 to n-1
+    order = sorted(range(1, len(points)), key=lambda customer: hilbert_index(side, points[customer][0], points[customer][1]))
+    for i in range(len(order)):
+        if rng.random() >= compactness:
+            j = rng.randrange(len(order))
+            order[i], order[j] = order[j], order[i]
+
+    clusters = []
+    start = 0
+    for cluster in range(r):
+        end = start + len(order) // r + (1 if cluster < len(order) % r else 0)
+        clusters.append(order[start:end])
+        start = end
+
+    return clusters
+
+
+# ------------------------------------- Vehicles -------------------------------------- #
+
+#Method that returns the number of vehicles first fit fills with the demands in a random order, like the
+#constructors of the solvers do, using a tree of the largest free capacity so it also scales to many clusters
+def first_fit_vehicles(Q: int, demands: list, rng: random.Random):
+    copy_demands = demands.copy()
+    rng.shuffle(copy_demands)
+    leaves = 1
+    while leaves < len(demands):
+        leaves *= 2
+    free = [Q] * (2 * leaves)
+    used = 0
+
+    for demand in copy_demands:
+        #Go down to the first vehicle with enough free capacity
+        node = 1
+        while node < leaves:
+            node = 2 * node if free[2 * node] >= demand else 2 * node + 1
+        free[node] -= demand
+        used = max(used, node - leaves + 1)
+        node //= 2
+        while node >= 1:
+            free[node] = max(free[2 * node], free[2 * node + 1])
+            node //= 2
+
+    return used
+
+#Method that returns the number of vehicles first fit needs most often (the smallest one on a tie)
+def typical_vehicles(Q: int, demands: list, rng: random.Random, samples: int = FIT_SAMPLES):
+    counts = Counter(first_fit_vehicles(Q, demands, rng) for _ in range(samples))
+    return min(counts, key=lambda vehicles: (-counts[vehicles], vehicles))
+
+
+# ------------------------------------- Instances ------------------------------------- #
+
+#Method that generates an instance and returns it like read_input does: n, k, r, Q, points, clusters, demands,
+#with n the number of points (the depot and the customers)
+def generate_instance(customers: int, r: int = None, k: int = None, Q: int = None, distribution: str = "uniform", compactness: float = 1.0,
+                      seed: int = None, size: int = None, centres: int = None, max_demand: int = MAX_DEMAND, slack: float = SLACK, depot: str = "centre"):
+    rng = random.Random(seed)
+    if r is None:
+        r = max(1, customers // CLUSTER_SIZE)
+    if not 1 <= r <= customers:
+        raise ValueError(f"The number of clusters must be between 1 and the number of customers ({customers}), not {r}")
+    if k is not None and not 1 <= k <= r:
+        raise ValueError(f"The number of vehicles must be between 1 and the number of clusters ({r}), not {k}")
+    if not 0 <= compactness <= 1:
+        raise ValueError(f"The compactness must be between 0 and 1, not {compactness}")
+    if size is None:
+        size = square_size(customers)
+    if centres is None:
+        centres = max(1, round(sqrt(r)))
+
+    depot_point = (size // 2, size // 2) if depot == "centre" else (rng.randint(0, size), rng.randint(0, size))
+    points = [depot_point] + place_customers(customers, size, distribution, centres, rng)
+    clusters = make_clusters(points, r, size, compactness, rng)
+    demands = [rng.randint(1, max_demand) for _ in range(r)]
+    if Q is None:
+        vehicles = k if k is not None else max(1, r // CLUSTERS_PER_VEHICLE)
+        Q = max(ceil(sum(demands) / vehicles * (1 + slack)), max(demands))
+    if Q < max(demands):
+        raise ValueError(f"The capacity must be at least the largest demand ({max(demands)}), not {Q}")
+    if k is None:
+        k = typical_vehicles(Q, demands, rng)
+
+    return len(points), k, r, Q, points, clusters, demands
+
+#Method that returns the lines of the .gvrp file of an instance, in the format read by read_input
+def instance_lines(name: str, n: int, k: int, r: int, Q: int, points: list[tuple], clusters: list[list], demands: list, comment: str = "generated"):
+    lines = [f"NAME : {name}", f"COMMENT : {comment}", f"DIMENSION : {n}", f"VEHICLES : {k}", f"GVRP_SETS : {r}", f"CAPACITY : {Q}",
+             "EDGE_WEIGHT_TYPE : EUC_2D", "NODE_COORD_SECTION"]
+    for i in range(n):
+        lines.append(f"{i+1} {points[i][0]} {points[i][1]}")
+    lines.append("GVRP_SET_SECTION")
+    for i in range(r):
+        #Add 1 to the customers because the file counts from 1
+        lines.append(f"{i+1} " + " ".join(str(customer+1) for customer in clusters[i]) + " -1")
+    lines.append("DEMAND_SECTION")
+    for i in range(r):
+        lines.append(f"{i+1} {demands[i]}")
+    lines.append("EOF")
+    return lines
+
+#Method that writes an instance to a .gvrp file
+def write_instance(path: str, instance: tuple, comment: str = "generated"):
+    name = os.path.splitext(os.path.basename(path))[0]
+    write_atomic(path, instance_lines(name, *instance, comment))
+
+
+# ------------------------------- Command line interface ------------------------------ #
+
+#Method that generates one instance per number of customers from the command line
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Clustered Vehicle Routing instances (.gvrp files)")
+    parser.add_argument("--customers", nargs="+", type=int, required=True, help="the numbers of customers, one instance for each")
+    parser.add_argument("--clusters", type=int, default=None, help=f"the number of clusters r (default customers/{CLUSTER_SIZE})")
+    parser.add_argument("--vehicles", type=int, default=None, help="the number of vehicles k (default the number first fit needs most often)")
+    parser.add_argument("--capacity", type=int, default=None, help=f"the capacity Q of the vehicles (default total demand/(clusters/{CLUSTERS_PER_VEHICLE}) plus the slack)")
+    parser.add_argument("--slack", type=float, default=SLACK, help=f"the fraction of capacity above the average load (default {SLACK})")
+    parser.add_argument("--max-demand", type=int, default=MAX_DEMAND, help=f"the largest demand of a cluster (default {MAX_DEMAND})")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform", help="how the customers are placed (default uniform)")
+    parser.add_argument("--centres", type=int, default=None, help="the number of centres of the clustered distribution (default sqrt(clusters))")
+    parser.add_argument("--compactness", type=float, default=1.0, help="the fraction of customers clustered with their neighbours, 0 to 1 (default 1)")
+    parser.add_argument("--size", type=int, default=None, help="the side of the square (default 10*sqrt(customers), at least 100)")
+    parser.add_argument("--depot", choices=["centre", "random"], default="centre", help="where the depot is (default centre)")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random number generator")
+    parser.add_argument("--dir", default=".", help="the directory of the files (default .)")
+    parser.add_argument("--prefix", default="synthetic", help="the start of the file names (default synthetic)")
+    args = parser.parse_args(argv)
+
+    for customers in args.customers:
+        try:
+            instance = generate_instance(customers, args.clusters, args.vehicles, args.capacity, args.distribution, args.compactness, args.seed,
+                                         args.size, args.centres, args.max_demand, args.slack, args.depot)
+        except ValueError as error:
+            parser.error(str(error))
+        n, k, r, Q = instance[:4]
+        path = os.path.join(args.dir, f"{args.prefix}-n{customers}-r{r}-k{k}.gvrp")
+        write_instance(path, instance, f"{args.distribution} customers, compactness {args.compactness}, seed {args.seed}")
+        print(f"Written {path}: {customers} customers, {r} clusters, {k} vehicles, capacity {Q}")
+
+
+if __name__ == "__main__":
+    main()
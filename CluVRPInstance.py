@@ -0,0 +1,308 @@
+from array import array
+from itertools import chain
+from math import sqrt
+import mmap
+import os
+import struct
+
+from CluVRPDistances import PACKED_FROM, LAZY_FROM, distance_provider, MappedDistances, array_typecode, write_distances
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module reads the instances (.gvrp files) of the Strong and Weak programs and keeps a
+# binary copy of every instance it reads next to its file, so that the next runs on the same
+# instance do not parse the text again, and when asked for (--cache-distances) do not compute
+# the distances again either
+
+# The file is read line by line: the header lines ("KEY : value", with any spaces around the
+# colon) may come in any order, the numbers of a line may be separated by any whitespace, empty
+# lines are skipped, and the customers of a set may go on over several lines up to its -1.
+# The counts are checked against the header while reading:
+#   NODE_COORD_SECTION - the n points, numbered 1 to n, each once
+#   GVRP_SET_SECTION   - the r sets, numbered 1 to r, every customer (2 to n) in exactly one set
+#   DEMAND_SECTION     - the demand of every set, numbered 1 to r
+# and a file that does not match raises a ValueError with the line where it went wrong
+
+# The binary copy (the .gvrp file name + ".cache") holds a header followed by arrays of integers:
+#   points  - x and y of every point
+#   starts  - where the customers of every cluster start in customers (and one past the end)
+#   customers, demands
+#   the distance matrix, row by row in the smallest integer type that holds it (only when it
+#   is asked for and the full matrix is used, see distance_provider)
+# It is memory-mapped when read, so the distances are read from the file by the operating
+# system as they are used and are shared by every process that maps the same copy. The matrix
+# holds n^2 numbers (hundreds of MB near LAZY_FROM points), so by default it is left out and
+# the distances are computed when the copy is read
+
+# The copy records the size and modification time of the .gvrp file and is written again when
+# they change. It is written for the machine it is made on (byte order and sizes of the integers);
+# a copy that does not match is ignored and replaced
+
+# Example: python CluVRPSolve.py D.gvrp --cache-distances
+#          python CluVRPSolve.py D.gvrp --no-cache
+
+
+#Marks the start of a binary copy, and its version
+MAGIC = b"GVRC"
+VERSION = 1
+
+#The header: magic, version, size and modification time of the .gvrp file, n, k, r, Q, number of customers in the sets,
+#type code of the distances (0 when they are not in the copy)
+HEADER = struct.Struct("=4siqqiiiiii")
+
+#Method that returns the name of the binary copy of an instance
+def cache_file(filename: str):
+    return filename + ".cache"
+
+
+# ------------------------------------ Parsing ---------------------------------------- #
+
+#Method that returns the numbered lines of a file that are not empty, as (line number, tokens)
+def numbered_lines(file):
+    for number, line in enumerate(file, 1):
+        tokens = line.split()
+        if tokens:
+            yield number, tokens
+
+#Method that returns the next line of a section, or raises an error if the file ends before it
+def next_line(lines, filename: str, section: str):
+    line = next(lines, None)
+    if line is None:
+        raise ValueError(f"{filename}: the file ends in the middle of the {section}")
+
+    return line
+
+#Method that converts a token to an integer, or raises an error naming the line
+def to_int(token: str, filename: str, number: int, what: str):
+    try:
+        return int(token)
+    except ValueError:
+        raise ValueError(f"{filename}, line {number}: the {what} {token!r} is not an integer") from None
+
+#Method that reads the n points of the NODE_COORD_SECTION
+def read_points(lines, filename: str, n: int):
+    points = [None] * n
+    for _ in range(n):
+        number, tokens = next_line(lines, filename, "NODE_COORD_SECTION")
+        if len(tokens) != 3:
+            raise ValueError(f"{filename}, line {number}: expected a point as 'number x y', found {' '.join(tokens)!r}")
+        node = to_int(tokens[0], filename, number, "point number")
+        if not 1 <= node <= n:
+            raise ValueError(f"{filename}, line {number}: point {node} is not between 1 and DIMENSION ({n})")
+        if points[node-1] is not None:
+            raise ValueError(f"{filename}, line {number}: point {node} is given twice")
+        points[node-1] = (to_int(tokens[1], filename, number, "x coordinate"), to_int(tokens[2], filename, number, "y coordinate"))
+
+    return points
+
+#Method that reads the r sets of the GVRP_SET_SECTION, with the customers counted from 0
+def read_clusters(lines, filename: str, n: int, r: int):
+    clusters = [None] * r
+    set_of = [None] * n
+    for _ in range(r):
+        number, tokens = next_line(lines, filename, "GVRP_SET_SECTION")
+        cluster = to_int(tokens[0], filename, number, "set number")
+        if not 1 <= cluster <= r:
+            raise ValueError(f"{filename}, line {number}: set {cluster} is not between 1 and GVRP_SETS ({r})")
+        if clusters[cluster-1] is not None:
+            raise ValueError(f"{filename}, line {number}: set {cluster} is given twice")
+        tokens = tokens[1:]
+        #The customers of a set may go on over several lines, up to the -1
+        while not tokens or tokens[-1] != "-1":
+            number, more = next_line(lines, filename, f"set {cluster} of the GVRP_SET_SECTION")
+            tokens += more
+        customers = []
+        for token in tokens[:-1]:
+            customer = to_int(token, filename, number, "customer")
+            if not 2 <= customer <= n:
+                raise ValueError(f"{filename}, line {number}: customer {customer} of set {cluster} is not between 2 and DIMENSION ({n})")
+            if set_of[customer-1] is not None:
+                raise ValueError(f"{filename}, line {number}: customer {customer} is in set {set_of[customer-1]} and in set {cluster}")
+            set_of[customer-1] = cluster
+            #Subtract 1 to assure indexing starting at 0
+            customers.append(customer-1)
+        if not customers:
+            raise ValueError(f"{filename}, line {number}: set {cluster} has no customers")
+        clusters[cluster-1] = customers
+
+    missing = [customer+1 for customer in range(1, n) if set_of[customer] is None]
+    if missing:
+        raise ValueError(f"{filename}: customer {missing[0]} is in no set ({len(missing)} customers are missing)")
+    return clusters
+
+#Method that reads the demands of the r sets of the DEMAND_SECTION
+def read_demands(lines, filename: str, r: int):
+    demands = [None] * r
+    for _ in range(r):
+        number, tokens = next_line(lines, filename, "DEMAND_SECTION")
+        if len(tokens) != 2:
+            raise ValueError(f"{filename}, line {number}: expected a demand as 'set demand', found {' '.join(tokens)!r}")
+        cluster = to_int(tokens[0], filename, number, "set number")
+        if not 1 <= cluster <= r:
+            raise ValueError(f"{filename}, line {number}: set {cluster} is not between 1 and GVRP_SETS ({r})")
+        if demands[cluster-1] is not None:
+            raise ValueError(f"{filename}, line {number}: the demand of set {cluster} is given twice")
+        demands[cluster-1] = to_int(tokens[1], filename, number, "demand")
+
+    return demands
+
+#Method that reads an instance from a .gvrp file and checks it, and returns it like read_input does: n, k, r, Q, points, clusters, demands
+def parse_instance(filename: str):
+    with open(filename) as file:
+        return parse_lines(file, filename)
+
+#Method that reads an instance from the lines of a .gvrp file (any iterable of lines, e.g. an open file or the lines of a text)
+#and checks it, filename names the instance in the errors
+def parse_lines(file, filename: str = "<instance>"):
+    header = {}
+    points = clusters = demands = None
+    lines = numbered_lines(file)
+    for number, tokens in lines:
+        line = " ".join(tokens)
+        if ":" in line:
+            key, _, value = line.partition(":")
+            key = key.strip().upper()
+            if key in ("DIMENSION", "VEHICLES", "GVRP_SETS", "CAPACITY"):
+                header[key] = to_int(value.strip(), filename, number, key)
+                if header[key] < 1:
+                    raise ValueError(f"{filename}, line {number}: {key} must be at least 1, not {header[key]}")
+            elif key == "EDGE_WEIGHT_TYPE" and value.strip() != "EUC_2D":
+                raise ValueError(f"{filename}, line {number}: only EUC_2D distances are supported, not {value.strip()}")
+            continue
+
+        section = tokens[0].upper()
+        if section == "EOF":
+            break
+        if section not in ("NODE_COORD_SECTION", "GVRP_SET_SECTION", "DEMAND_SECTION"):
+            raise ValueError(f"{filename}, line {number}: unknown section {tokens[0]!r}")
+        needed = {"NODE_COORD_SECTION": ["DIMENSION"], "GVRP_SET_SECTION": ["DIMENSION", "GVRP_SETS"], "DEMAND_SECTION": ["GVRP_SETS"]}[section]
+        for key in needed:
+            if key not in header:
+                raise ValueError(f"{filename}, line {number}: {key} must be given before the {section}")
+        if section == "NODE_COORD_SECTION":
+            points = read_points(lines, filename, header["DIMENSION"])
+        elif section == "GVRP_SET_SECTION":
+            clusters = read_clusters(lines, filename, header["DIMENSION"], header["GVRP_SETS"])
+        else:
+            demands = read_demands(lines, filename, header["GVRP_SETS"])
+
+    for key in ("DIMENSION", "VEHICLES", "GVRP_SETS", "CAPACITY"):
+        if key not in header:
+            raise ValueError(f"{filename}: {key} is missing")
+    for section, found in (("NODE_COORD_SECTION", points), ("GVRP_SET_SECTION", clusters), ("DEMAND_SECTION", demands)):
+        if found is None:
+            raise ValueError(f"{filename}: the {section} is missing")
+    n, k, r, Q = header["DIMENSION"], header["VEHICLES"], header["GVRP_SETS"], header["CAPACITY"]
+    if k > r:
+        raise ValueError(f"{filename}: there are more vehicles ({k}) than sets ({r})")
+    if max(demands) > Q:
+        raise ValueError(f"{filename}: the demand {max(demands)} of set {demands.index(max(demands))+1} is larger than the capacity ({Q})")
+
+    return n, k, r, Q, points, clusters, demands
+
+
+# --------------------------------- Binary copy --------------------------------------- #
+
+#Method that returns the type code of the smallest integer array type that can hold every distance between the points
+def distance_typecode(points: list[tuple]):
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return array_typecode(round(sqrt((max(xs) - min(xs)) **2 + (max(ys) - min(ys)) **2)))
+
+#Method that writes the binary copy of an instance, with its distance matrix if it is given,
+#through a temporary file so that a process reading the old copy is not disturbed
+def write_cache(filename: str, instance: tuple, distances: list[list] = None):
+    n, k, r, Q, points, clusters, demands = instance
+    source = os.stat(filename)
+    typecode = distance_typecode(points) if distances is not None else None
+    path = cache_file(filename)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, source.st_size, source.st_mtime_ns, n, k, r, Q, sum(map(len, clusters)), ord(typecode) if typecode else 0))
+        array("i", chain.from_iterable(points)).tofile(file)
+        starts = [0]
+        for cluster in clusters:
+            starts.append(starts[-1] + len(cluster))
+        array("i", starts).tofile(file)
+        array("i", chain.from_iterable(clusters)).tofile(file)
+        array("i", demands).tofile(file)
+        if distances is not None:
+            write_distances(file, distances, typecode)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+#Method that reads the binary copy of an instance and returns the instance and its distances (None when they are not in it),
+#or None when there is no copy or it does not match the .gvrp file
+def read_cache(filename: str, packed: bool = None):
+    path = cache_file(filename)
+    try:
+        source = os.stat(filename)
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    with mapped:
+        if len(mapped) < HEADER.size:
+            return None
+        magic, version, size, mtime, n, k, r, Q, nr_customers, typecode = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION or size != source.st_size or mtime != source.st_mtime_ns:
+            return None
+        itemsize = array("i").itemsize
+        offset = HEADER.size
+        end = offset + itemsize * (2 * n + (r + 1) + nr_customers + r)
+        if typecode:
+            typecode = chr(typecode)
+            expected = end + n * n * array(typecode).itemsize
+        else:
+            expected = end
+        if len(mapped) != expected:
+            return None
+
+        numbers = memoryview(mapped)[offset:end].cast("i")
+        try:
+            values = numbers.tolist()
+        finally:
+            numbers.release()
+
+    points = list(zip(values[0:2*n:2], values[1:2*n:2]))
+    starts = values[2*n:2*n+r+1]
+    customers = values[2*n+r+1:2*n+r+1+nr_customers]
+    clusters = [customers[starts[i]:starts[i+1]] for i in range(r)]
+    demands = values[2*n+r+1+nr_customers:]
+    distances = None
+    if typecode:
+        distances = MappedDistances(path, end, n, typecode)
+        if packed is None:
+            packed = n >= PACKED_FROM
+        #Python lists are the fastest to index, so small instances keep them (like distance_matrix)
+        if not packed:
+            distances = [row.tolist() for row in distances]
+
+    return (n, k, r, Q, points, clusters, demands), distances
+
+#Method that reads an instance and returns it with its distances: from its binary copy when it is up to date, else by
+#parsing the .gvrp file and computing the distances, after which the copy is written (if cache is True and the directory can be written),
+#with the distance matrix in it if cache_distances is True
+def read_instance(filename: str, cache: bool = True, cache_distances: bool = False):
+    if cache:
+        cached = read_cache(filename)
+        if cached is not None:
+            instance, distances = cached
+            #A copy without the distances is written again when they are asked for
+            if distances is not None or not cache_distances or instance[0] >= LAZY_FROM:
+                if distances is None:
+                    distances = distance_provider(instance[0], instance[4])
+                return instance, distances
+
+    instance = parse_instance(filename)
+    distances = distance_provider(instance[0], instance[4])
+    if cache:
+        #On-demand distances are computed as they are used, only a full matrix is saved
+        full = cache_distances and instance[0] < LAZY_FROM
+        try:
+            write_cache(filename, instance, distances if full else None)
+        except OSError:
+            pass
+
+    return instance, distances
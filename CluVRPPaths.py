@@ -0,0 +1,227 @@
+from collections import OrderedDict
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module optimizes the order of the customers inside a cluster for the Strong programs,
+# where a vehicle visits all the customers of a cluster in one go: the customers form a path
+# from the customer visited before the cluster (the entry) to the one visited after it (the exit)
+
+# Small clusters are solved exactly: once per cluster, a dynamic program over the subsets of its
+# customers (Held-Karp) gives the shortest path between every pair of first and last customer,
+# after which the best path for any entry and exit is the best of these pairs
+
+# Larger clusters are improved with 2-opt (reversing a part of the path), Or-opt (moving a part
+# of at most OR_OPT_LENGTH customers elsewhere) and swaps of two customers, until none improves
+
+# The clusters do not change during a run, so the tables of the dynamic program are kept for the
+# whole run and the best path found for a cluster, entry and exit is kept in an LRU cache. The path
+# of a large cluster depends on the order it was improved from, so it is cached with that order
+# and a later order is improved again. When the clusters are given the tables are all built up
+# front, before the search starts
+
+# With the tables, the best paths of all the clusters of a vehicle route (for the order of its
+# clusters) follow from a second dynamic program over the route: for every cluster in turn it
+# keeps the shortest route from the depot ending in each of its customers, using only lookups
+# in the tables and the distances. Clusters too large for a table can be walked either way
+
+
+#Largest cluster that is solved exactly (the dynamic program grows with 2^size * size^3)
+EXACT_SIZE = 8
+
+#Longest part of the path moved by Or-opt
+OR_OPT_LENGTH = 3
+
+#Number of (cluster, entry, exit) paths (and starting orders of the large clusters) kept in the cache
+CACHE_PATHS = 100000
+
+#Method that returns the length of a path through the given customers
+def path_length(distances: list[list], path: list):
+    return sum(distances[path[i]][path[i+1]] for i in range(len(path)-1))
+
+#Method that returns, for every pair of first and last customer, the shortest path visiting all the customers
+#(Held-Karp dynamic program from every first customer), as {(first, last): (length, path)}
+def all_pair_paths(distances: list[list], customers: list):
+    size = len(customers)
+    if size == 1:
+        return {(customers[0], customers[0]): (0, [customers[0]])}
+
+    full = (1 << size) - 1
+    paths = {}
+    for start in range(size):
+        #lengths[mask][j]: shortest path from start through the customers in mask, ending in j
+        lengths = [[None] * size for _ in range(1 << size)]
+        parents = [[None] * size for _ in range(1 << size)]
+        lengths[1 << start][start] = 0
+        for mask in range(1 << size):
+            if not mask & (1 << start):
+                continue
+            for j in range(size):
+                length = lengths[mask][j]
+                if length is None:
+                    continue
+                row = distances[customers[j]]
+                for t in range(size):
+                    if mask & (1 << t):
+                        continue
+                    new_mask = mask | (1 << t)
+                    new_length = length + row[customers[t]]
+                    if lengths[new_mask][t] is None or new_length < lengths[new_mask][t]:
+                        lengths[new_mask][t] = new_length
+                        parents[new_mask][t] = j
+        for end in range(size):
+            if end == start:
+                continue
+            path = []
+            mask = full
+            j = end
+            while j is not None:
+                path.append(customers[j])
+                previous = parents[mask][j]
+                mask ^= 1 << j
+                j = previous
+            path.reverse()
+            paths[(customers[start], customers[end])] = (lengths[full][end], path)
+
+    return paths
+
+#Method that improves a path from entry to exit through the customers with 2-opt, Or-opt and swaps until none of them
+#improves it, and returns the new order of the customers
+def improve_path(distances: list[list], entry: int, customers: list, exit: int):
+    path = [entry] + customers + [exit]
+    size = len(customers)
+    improved = True
+    while improved:
+        improved = False
+
+        #2-opt: reverse the customers from position i to position j
+        for i in range(1, size):
+            for j in range(i+1, size+1):
+                delta = (distances[path[i-1]][path[j]] + distances[path[i]][path[j+1]]
+                         - distances[path[i-1]][path[i]] - distances[path[j]][path[j+1]])
+                if delta < 0:
+                    path[i:j+1] = path[i:j+1][::-1]
+                    improved = True
+
+        #Or-opt: move the customers from position i to i+t-1 between the positions j and j+1
+        for t in range(1, min(OR_OPT_LENGTH, size-1)+1):
+            i = 1
+            while i + t <= size + 1:
+                first = path[i]
+                last = path[i+t-1]
+                removal = distances[path[i-1]][path[i+t]] - distances[path[i-1]][first] - distances[last][path[i+t]]
+                best_delta = 0
+                best_j = None
+                for j in range(size+1):
+                    if i - 1 <= j <= i + t - 1:
+                        continue
+                    delta = removal + distances[path[j]][first] + distances[last][path[j+1]] - distances[path[j]][path[j+1]]
+                    if delta < best_delta:
+                        best_delta = delta
+                        best_j = j
+                if best_j is not None:
+                    segment = path[i:i+t]
+                    del path[i:i+t]
+                    position = best_j + 1 if best_j < i else best_j + 1 - t
+                    path[position:position] = segment
+                    improved = True
+                i += 1
+
+        #Swap the customers at positions i and j
+        for i in range(1, size):
+            for j in range(i+1, size+1):
+                if j == i + 1:
+                    delta = (distances[path[i-1]][path[j]] + distances[path[i]][path[j+1]]
+                             - distances[path[i-1]][path[i]] - distances[path[j]][path[j+1]])
+                else:
+                    delta = (distances[path[i-1]][path[j]] + distances[path[j]][path[i+1]] + distances[path[j-1]][path[i]] + distances[path[i]][path[j+1]]
+                             - distances[path[i-1]][path[i]] - distances[path[i]][path[i+1]] - distances[path[j-1]][path[j]] - distances[path[j]][path[j+1]])
+                if delta < 0:
+                    path[i], path[j] = path[j], path[i]
+                    improved = True
+
+    return path[1:-1]
+
+#Class that returns the best order of the customers of a cluster for an entry and an exit customer
+class ClusterPaths:
+
+    def __init__(self, distances: list[list], clusters: list[list] = None, exact_size: int = EXACT_SIZE, cache_paths: int = CACHE_PATHS):
+        self.distances = distances
+        self.exact_size = exact_size
+        self.cache_paths = max(cache_paths, 1)
+        self.tables = {}
+        self.cache = OrderedDict()
+        if clusters is not None:
+            for cluster in range(len(clusters)):
+                if len(clusters[cluster]) <= exact_size:
+                    self.table(cluster, clusters[cluster])
+
+    #Method that returns the shortest path between every pair of first and last customer of a small cluster
+    def table(self, cluster: int, customers: list):
+        table = self.tables.get(cluster)
+        if table is None:
+            table = self.tables[cluster] = all_pair_paths(self.distances, customers)
+
+        return table
+
+    #Method that returns the paths a cluster can take in a route as {(first, last): (length, path)}, all of them
+    #for a small cluster and the current path in both directions for a large one
+    def end_paths(self, cluster: int, customers: list):
+        if len(customers) <= self.exact_size:
+            return self.table(cluster, customers)
+
+        length = path_length(self.distances, customers)
+        return {(customers[0], customers[-1]): (length, customers), (customers[-1], customers[0]): (length, customers[::-1])}
+
+    #Method that returns the shortest length of a vehicle route with its clusters in the given order, and the path
+    #of every cluster in it (lists of the tables, not to be changed)
+    def best_route(self, vehicle_route: list, customer_orders: dict):
+        distances = self.distances
+        #lengths[last]: shortest route from the depot through the clusters so far that ends in the customer last
+        lengths = {0: 0}
+        choices = []
+        for cluster in vehicle_route:
+            table = self.end_paths(cluster, customer_orders[cluster])
+            entries = {}
+            new_lengths = {}
+            choice = {}
+            for (first, last), (length, path) in table.items():
+                if first not in entries:
+                    previous = min(lengths, key=lambda previous: lengths[previous] + distances[previous][first])
+                    entries[first] = (lengths[previous] + distances[previous][first], previous)
+                total, previous = entries[first]
+                total += length
+                if last not in new_lengths or total < new_lengths[last]:
+                    new_lengths[last] = total
+                    choice[last] = (previous, path)
+            lengths = new_lengths
+            choices.append(choice)
+
+        last = min(lengths, key=lambda last: lengths[last] + distances[last][0])
+        total = lengths[last] + distances[last][0]
+        route_paths = []
+        for choice in reversed(choices):
+            last, path = choice[last]
+            route_paths.append(path)
+        route_paths.reverse()
+
+        return total, route_paths
+
+    #Method that returns the best order found of the customers of a cluster between entry and exit, as a new list
+    def best_path(self, cluster: int, entry: int, customers: list, exit: int):
+        exact = len(customers) <= self.exact_size
+        key = (cluster, entry, exit) if exact else (cluster, entry, exit, tuple(customers))
+        path = self.cache.get(key)
+        if path is not None:
+            self.cache.move_to_end(key)
+            return path.copy()
+
+        if exact:
+            table = self.table(cluster, customers)
+            entry_row = self.distances[entry]
+            path = min(table.values(), key=lambda pair: entry_row[pair[1][0]] + pair[0] + self.distances[pair[1][-1]][exit])[1]
+        else:
+            path = improve_path(self.distances, entry, customers.copy(), exit)
+
+        self.cache[key] = path
+        if len(self.cache) > self.cache_paths:
+            self.cache.popitem(last=False)
+        return path.copy()
@@ -0,0 +1,118 @@
+import random
+
+from CluVRPSolution import Solution
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module keeps a pool of elite solutions of the Strong program: the best local optima
+# found by the restarts of the Multi-Start, kept different enough from each other that the
+# Iterative VNS can start its perturbations from several of them instead of only the last one.
+# The pool is only kept when the search is given its size (--pool-size), without it the Iterative
+# VNS perturbs the solution of its last iteration as it always did
+
+# Two solutions are compared by the pairs of clusters visited one right after the other (the
+# depot counts as a cluster): their distance is the fraction of these pairs of one solution that
+# the other one does not have, so 0 for the same routes and 1 for routes without a pair in common.
+# The direction of a route and the order of the vehicles do not matter
+
+# A solution offered to the pool:
+#   - that is closer than min_distance to elites replaces them if it is better than all of them, else it is left out
+#   - else it is added when the pool is not full, or replaces the worst elite if it is better than it
+# so the best solution offered is always in the pool
+
+# The elites are kept as compact copies (see CluVRPSolution), the pool never hands out or keeps
+# a list that the search can change
+
+
+#Default number of elites of a pool (the searches only keep a pool when they are given a size, see CluVRPSolve)
+POOL_SIZE = 10
+
+#Default smallest distance between two elites
+MIN_DISTANCE = 0.1
+
+#Method that returns the pairs of clusters visited one right after the other, with the depot as -1
+def cluster_pairs(cluster_orders: list[list]):
+    pairs = set()
+    for vehicle_route in cluster_orders:
+        previous = -1
+        for cluster in vehicle_route + [-1]:
+            pairs.add((previous, cluster) if previous < cluster else (cluster, previous))
+            previous = cluster
+
+    return frozenset(pairs)
+
+#Method that returns the distance between two solutions given by their cluster_pairs, between 0 and 1
+def solution_distance(pairs1: frozenset, pairs2: frozenset):
+    return 1 - len(pairs1 & pairs2) / max(len(pairs1), len(pairs2), 1)
+
+#Class that keeps the elite solutions of a search as (Solution, pairs), from the best to the worst
+class ElitePool:
+
+    def __init__(self, size: int = POOL_SIZE, min_distance: float = MIN_DISTANCE):
+        self.size = max(size, 1)
+        self.min_distance = min_distance
+        self.elites = []
+
+    def __len__(self):
+        return len(self.elites)
+
+    #Method that returns the largest distance a new solution can have to be taken into the pool
+    def threshold(self):
+        if len(self.elites) < self.size:
+            return float("inf")
+
+        return self.elites[-1][0].total_distance
+
+    #Method that returns the elites a solution is closer to than min_distance
+    def close_elites(self, pairs: frozenset):
+        return [elite for elite in self.elites if solution_distance(pairs, elite[1]) < self.min_distance]
+
+    #Method that checks if a solution would be taken into the pool, without changing it
+    def admits(self, total_distance: int, pairs: frozenset):
+        close = self.close_elites(pairs)
+        if close:
+            return all(total_distance < elite[0].total_distance for elite in close)
+
+        return total_distance < self.threshold()
+
+    #Method that takes a solution into the pool, in the place of the elites close to it or else of the worst elite
+    def add(self, solution: Solution, pairs: frozenset):
+        close = self.close_elites(pairs)
+        if close:
+            for elite in close:
+                self.elites.remove(elite)
+        elif len(self.elites) >= self.size:
+            self.elites.pop()
+        self.elites.append((solution, pairs))
+        self.elites.sort(key=lambda elite: elite[0].total_distance)
+
+    #Method that offers a solution to the pool and returns whether it was taken in, only a solution that is taken in is copied
+    def offer(self, total_distance: int, cluster_orders: list[list], customer_orders: dict):
+        pairs = cluster_pairs(cluster_orders)
+        if not self.admits(total_distance, pairs):
+            return False
+
+        self.add(Solution.strong(total_distance, cluster_orders, customer_orders), pairs)
+        return True
+
+    #Method that offers a solution already copied into a Solution (e.g. sent back by a worker process)
+    def offer_solution(self, solution: Solution):
+        pairs = cluster_pairs(solution.cluster_orders())
+        if not self.admits(solution.total_distance, pairs):
+            return False
+
+        self.add(solution, pairs)
+        return True
+
+    #Method that returns an elite chosen at random, as total_distance, cluster_orders, customer_orders (new lists)
+    def choose(self, rng: random.Random = random):
+        solution = rng.choice(self.elites)[0]
+        return solution.total_distance, solution.cluster_orders(), solution.customer_orders()
+
+    #Method that returns the mean distance between the elites, 0 when there are less than two
+    def diversity(self):
+        distances = [solution_distance(self.elites[i][1], self.elites[j][1]) for i in range(len(self.elites)) for j in range(i+1, len(self.elites))]
+        return sum(distances) / len(distances) if distances else 0
+
+    #Method that returns the state of the pool reported by the status events of the searches (see CluVRPEvents)
+    def status(self):
+        return {"elites": len(self.elites), "diversity": round(self.diversity(), 4)}
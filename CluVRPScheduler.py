@@ -0,0 +1,94 @@
+from time import perf_counter, process_time
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module orders the moves of the local search of the Strong and Weak programs at run
+# time, by the improvement in distance they have brought per second of CPU time
+
+# With the fixed order the local search applies every move until it fails, in the same order
+# every time. With the adaptive order (a MoveScheduler) the local search tries the moves from
+# the best gain per second to the worst, and goes back to the best one after every improving
+# move, so a move that costs a lot for little gain is only tried once the others have failed
+
+# The search still ends only when every move has failed in a row, so it ends in a solution
+# that none of the moves improves, like with the fixed order
+
+# The time of a move is the CPU time of the process (process_time), which unlike the wall-clock
+# time does not grow when the machine is loaded or the workers of a process pool wait for a core
+
+# Moves that were never tried come first, and among moves without any gain the cheapest
+# comes first. The gains and times are averaged with more weight on the recent calls, so the
+# order follows the search as it goes (early on the cheap moves gain a lot, later on less)
+
+# The adaptive order depends on measured times, so a search with it is not exactly repeated by
+# running it again with the same seed (the fixed order is)
+
+# Example: python CluVRPSolve.py D.gvrp --variant weak --order adaptive
+
+
+#The orders of the moves a search can use
+ORDERS = ["fixed", "adaptive"]
+
+#Weight of the last call of a move in its averages
+DECAY = 0.2
+
+#Class that keeps the gain per second of every move and applies the moves in the order of it
+class MoveScheduler:
+
+    def __init__(self, names: list, decay: float = DECAY):
+        #The names in the fixed order, which breaks ties
+        self.names = list(names)
+        self.decay = decay
+        self.gain = {}
+        self.seconds = {}
+
+    #Method that updates the averages of a move with a call that took seconds of CPU time and lowered the distance by gain
+    def record(self, name: str, seconds: float, gain: int):
+        if name not in self.seconds:
+            self.gain[name] = gain
+            self.seconds[name] = seconds
+        else:
+            self.gain[name] += self.decay * (gain - self.gain[name])
+            self.seconds[name] += self.decay * (seconds - self.seconds[name])
+
+    #Method that returns the gain per second of a move, moves never tried count as infinitely good
+    def rate(self, name: str):
+        if name not in self.seconds:
+            return float("inf")
+
+        return self.gain[name] / self.seconds[name] if self.seconds[name] > 0 else 0
+
+    #Method that returns the names of the moves from the best to the worst gain per second
+    def order(self):
+        return sorted(self.names, key=lambda name: (-self.rate(name), self.seconds.get(name, 0)))
+
+    #Method that applies the moves until none of them improves the solution and returns its final distance,
+    #moves maps the names to functions that apply the move, and distance returns the distance of the solution
+    def descent(self, moves: dict, distance, total_distance_traveled: int, budget = None, stats = None):
+        order = self.order()
+        i = 0
+        while i < len(order) and not (budget is not None and budget.expired()):
+            name = order[i]
+            #The profile of the moves keeps their wall-clock time (see CluVRPStats)
+            if stats is not None:
+                started = perf_counter()
+            cpu_started = process_time()
+            moves[name]()
+            new_distance = distance()
+            self.record(name, process_time() - cpu_started, total_distance_traveled - new_distance)
+            if stats is not None:
+                stats.record(name, started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                order = self.order()
+                i = 0
+            else:
+                i += 1
+
+        return total_distance_traveled
+
+#Method that checks the name of an order of the moves and returns a scheduler for the moves, or None for the fixed order
+def move_scheduler(order: str, names: list):
+    if order not in ORDERS:
+        raise ValueError(f"Unknown order of the moves {order!r}, expected 'fixed' or 'adaptive'")
+
+    return MoveScheduler(names) if order == "adaptive" else None
@@ -0,0 +1,419 @@
+from time import perf_counter, time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+
+from CluVRPBudget import Budget
+from CluVRPSolution import Solution
+from CluVRPInstance import parse_lines
+from CluVRPSolve import VARIANTS, variant_program, solve
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module serves the solvers over HTTP on the local machine: instances are sent as the
+# text of a .gvrp file, queued, and solved by a pool of worker processes, so the event loop
+# (asyncio) only reads requests and passes on messages and never waits for a search
+
+# The requests:
+#   POST   /jobs?variant=strong&time_limit=30&seed=1  - queue a job, the body is the .gvrp text
+#   GET    /jobs                                      - the state of every job
+#   GET    /jobs/<id>                                 - the state of a job, with its solution once it has ended
+#   GET    /jobs/<id>/events                          - the events of a job as JSON lines, as they happen
+#   DELETE /jobs/<id>                                 - stop a job and return the best solution found so far
+# the answers are JSON, and a job is in the state queued, running, finished, cancelled or failed
+
+# The events are: started, improvement (every new best distance, as the checkpoints of the
+# searches are offered it or their phases find it, with the phase then), the status, milestone,
+# stagnation and budget events of the phases of the search (see CluVRPEvents, the phases of the
+# Strong start of a weak-v2 job are under "strong-start") and the last one, finished/cancelled/failed,
+# with the result. A client that asks for the events late first gets the ones it missed
+
+# A job is stopped through its budget: the searches check the budget between two moves, and
+# the budget of a job also reads a flag in memory shared with the workers, which the service
+# sets. The search then ends as if its time was up and the job returns the best solution found
+# so far; a job that had not started yet is simply taken out of the queue
+
+# At most MAX_JOBS jobs can be queued or running at once (every one has its own flag), more
+# are refused until some of them end. A job that has ended is kept with its events and its
+# solution for KEEP_SECONDS, and only the last KEEP_JOBS of them, after which it is forgotten
+# (404), so a service that runs for long does not keep every job it ever ran
+
+# Example: python CluVRPService.py --port 8080 --workers 4
+#          curl --data-binary @D.gvrp "http://localhost:8080/jobs?variant=strong&time_limit=60"
+#          curl -N http://localhost:8080/jobs/1/events
+
+
+#Default number of jobs that can be queued or running at once
+MAX_JOBS = 1024
+
+#Default number of ended jobs that are kept
+KEEP_JOBS = 256
+
+#Default number of seconds an ended job is kept
+KEEP_SECONDS = 3600
+
+#Largest .gvrp text accepted, in bytes
+MAX_BODY = 64 * 1024 * 1024
+
+#The reasons of the HTTP status codes used
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+# ------------------------------------ Workers ---------------------------------------- #
+
+#Class that stops a search when the time is up or when the service sets the flag of its job
+class StoppableBudget(Budget):
+
+    def __init__(self, seconds: float, stops, slot: int):
+        super().__init__(seconds)
+        self.stops = stops
+        self.slot = slot
+
+    def expired(self):
+        return self.stops[self.slot] != 0 or super().expired()
+
+#The events of the phases of a search that are passed on to the service as they are
+PHASE_EVENTS = ("status", "milestone", "stagnation", "budget")
+
+#Class that takes the place of a checkpoint and sends every new best distance of a search to the service as an event,
+#it is also the callback of the events of the search (see CluVRPEvents)
+class ProgressEvents:
+
+    def __init__(self, events, job_id: int):
+        self.events = events
+        self.job_id = job_id
+        self.best = None
+        self.start = perf_counter()
+
+    #Method that is offered the best solution after every iteration, like Checkpoint.update
+    def update(self, solution: Solution):
+        self.improvement(solution.total_distance)
+
+    #Method that sends a best distance as an event if it is better than the last one, with the phase that found it when it is known
+    def improvement(self, best_total_distance: int, phase: str = None):
+        if self.best is not None and best_total_distance >= self.best:
+            return
+        self.best = best_total_distance
+        event = {"event": "improvement", "total_distance": best_total_distance, "seconds": round(perf_counter() - self.start, 4), "time": time()}
+        if phase is not None:
+            event["phase"] = phase
+        self.events.put((self.job_id, event))
+
+    #Method that is passed the events of the search: the new best distances are sent as improvements, the events of
+    #PHASE_EVENTS as they are and the others (restarts, ends of the phases) are left out
+    def __call__(self, event: dict):
+        if event["event"] == "improvement":
+            self.improvement(event["best_distance"], event["phase"])
+        elif event["event"] in PHASE_EVENTS:
+            self.events.put((self.job_id, event))
+
+    def flush(self):
+        pass
+
+#The queue of the events and the flags of the jobs, in every worker process
+worker_data = {}
+
+#Method that gives a worker process the queue of the events and the flags of the jobs, a Ctrl+C is left to the service,
+#which stops the jobs through their flags
+def init_worker(events, stops):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_data["events"] = events
+    worker_data["stops"] = stops
+
+#Method that runs a job in a worker process and returns its result, the events of the job end with (job_id, None)
+def run_job(job_id: int, slot: int, instance: tuple, variant: str, seconds: float = None, iterations: int = None, seed: int = None):
+    events = worker_data["events"]
+    try:
+        events.put((job_id, {"event": "started", "time": time()}))
+        budget = StoppableBudget(seconds, worker_data["stops"], slot)
+        #Without a number of iterations a job with a time limit runs until it (or until it is stopped)
+        if iterations is None and seconds is not None:
+            iterations = sys.maxsize
+        progress = ProgressEvents(events, job_id)
+        result = solve(instance, variant, budget, seed, 1, iterations, checkpoint=progress, events=progress)
+        orders = result["customer_orders"] if result["customer_orders"] is not None else result["vehicle_tours"]
+        return {
+            "total_distance": result["total_distance"],
+            "seconds": round(result["seconds"], 4),
+            "stopped": worker_data["stops"][slot] != 0,
+            "solution": variant_program(variant).solution_lines(result["total_distance"], result["cluster_orders"], orders),
+        }
+    finally:
+        events.put((job_id, None))
+
+
+# ------------------------------------- Service --------------------------------------- #
+
+#Class that keeps the jobs of the service and runs them on a pool of worker processes
+class SolverService:
+
+    def __init__(self, workers: int = None, max_jobs: int = MAX_JOBS, keep_jobs: int = KEEP_JOBS, keep_seconds: float = KEEP_SECONDS):
+        self.events = multiprocessing.Queue()
+        self.stops = multiprocessing.RawArray("b", max_jobs)
+        self.free_slots = list(range(max_jobs - 1, -1, -1))
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.events, self.stops))
+        self.jobs = {}
+        self.next_id = 1
+        self.keep_jobs = keep_jobs
+        self.keep_seconds = keep_seconds
+        #The ids of the ended jobs, from the first one to end to the last
+        self.ended = deque()
+
+    #Method that forgets the ended jobs beyond the last keep_jobs of them or older than keep_seconds
+    def forget(self):
+        while self.ended and (len(self.ended) > self.keep_jobs or self.jobs[self.ended[0]]["ended"] < time() - self.keep_seconds):
+            del self.jobs[self.ended.popleft()]
+
+    #Method that returns what is shown of a job
+    def summary(self, job: dict, result: bool = True):
+        shown = {key: job[key] for key in ("id", "variant", "state", "time_limit", "seed", "best_distance", "error")}
+        if result:
+            shown["result"] = job["result"]
+        return shown
+
+    #Method that passes an event on to the clients that follow the job and keeps it for the clients that come later
+    def publish(self, job: dict, event: dict):
+        event = dict(event, job=job["id"])
+        job["events"].append(event)
+        for listener in job["listeners"]:
+            listener.put_nowait(event)
+
+    #Method that receives the events of the workers, until it gets None
+    async def pump_events(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self.events.get)
+            if item is None:
+                return
+            job_id, event = item
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            if event is None:
+                job["drained"].set()
+            else:
+                if event["event"] == "started":
+                    job["state"] = "running"
+                elif event["event"] == "improvement":
+                    job["best_distance"] = event["total_distance"]
+                self.publish(job, event)
+
+    #Method that queues a job and returns it
+    def submit(self, instance: tuple, variant: str, seconds: float = None, iterations: int = None, seed: int = None):
+        self.forget()
+        if not self.free_slots:
+            raise OverflowError("Too many jobs are queued, try again later")
+
+        slot = self.free_slots.pop()
+        self.stops[slot] = 0
+        job = {"id": self.next_id, "variant": variant, "state": "queued", "time_limit": seconds, "seed": seed, "best_distance": None,
+               "error": None, "result": None, "slot": slot, "events": [], "listeners": set(), "drained": asyncio.Event()}
+        self.next_id += 1
+        self.jobs[job["id"]] = job
+        job["task"] = self.executor.submit(run_job, job["id"], slot, instance, variant, seconds, iterations, seed)
+        job["future"] = asyncio.wrap_future(job["task"])
+        job["done"] = asyncio.ensure_future(self.finish(job))
+        return job
+
+    #Method that waits for a job to end, records its result and sends the last event
+    async def finish(self, job: dict):
+        try:
+            job["result"] = await job["future"]
+            job["state"] = "cancelled" if job["result"]["stopped"] else "finished"
+        except asyncio.CancelledError:
+            job["state"] = "cancelled"
+        except Exception as error:
+            job["state"] = "failed"
+            job["error"] = f"{type(error).__name__}: {error}"
+        #The events of a job that ran are all passed on before the last one
+        if job["state"] != "failed" and job["result"] is not None:
+            await job["drained"].wait()
+        self.free_slots.append(job["slot"])
+        self.publish(job, {"event": job["state"], "time": time(), "result": job["result"], "error": job["error"]})
+        job["ended"] = time()
+        self.ended.append(job["id"])
+        self.forget()
+
+    #Method that stops a job and returns it once it has ended, with the best solution found so far
+    async def cancel(self, job: dict):
+        if job["state"] in ("queued", "running"):
+            self.stops[job["slot"]] = 1
+            #Only a job that has not started is taken out of the queue, a running one ends through its flag with its result
+            job["task"].cancel()
+        await asyncio.shield(job["done"])
+        return job
+
+    #Method that stops every job and the workers
+    def close(self):
+        for job in self.jobs.values():
+            if job["state"] in ("queued", "running"):
+                self.stops[job["slot"]] = 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.events.put(None)
+
+
+# --------------------------------------- HTTP ---------------------------------------- #
+
+#Method that writes an answer with a JSON body and closes the connection
+async def respond(writer, status: int, body):
+    data = (json.dumps(body) + "\n").encode()
+    writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                 "Connection: close\r\n\r\n".encode() + data)
+    await writer.drain()
+
+#Method that writes the events of a job as JSON lines in chunks, the ones that happened already first, until its last event
+async def stream_events(writer, service: SolverService, job: dict):
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+    listener = asyncio.Queue()
+    for event in job["events"]:
+        listener.put_nowait(event)
+    job["listeners"].add(listener)
+    try:
+        while True:
+            event = await listener.get()
+            data = (json.dumps(event) + "\n").encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            if event["event"] in ("finished", "cancelled", "failed"):
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    finally:
+        job["listeners"].discard(listener)
+
+#Method that reads a request and returns its method, path, query and body
+async def read_request(reader):
+    line = (await reader.readline()).decode("latin-1").split()
+    if len(line) != 3:
+        raise ValueError("Malformed request line")
+    headers = {}
+    while True:
+        header = (await reader.readline()).decode("latin-1")
+        if header in ("\r\n", "\n", ""):
+            break
+        name, _, value = header.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise OverflowError(f"The instance is larger than {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    target = urlsplit(line[1])
+    return line[0].upper(), target.path.rstrip("/"), {key: values[-1] for key, values in parse_qs(target.query).items()}, body
+
+#Method that reads a number from the query of a request
+def query_number(query: dict, name: str, kind):
+    if name not in query:
+        return None
+    try:
+        return kind(query[name])
+    except ValueError:
+        raise ValueError(f"{name} must be a number, not {query[name]!r}") from None
+
+#Method that answers a request
+async def handle(service: SolverService, reader, writer):
+    try:
+        try:
+            method, path, query, body = await read_request(reader)
+        except OverflowError as error:
+            return await respond(writer, 413, {"error": str(error)})
+        except (ValueError, asyncio.IncompleteReadError) as error:
+            return await respond(writer, 400, {"error": str(error)})
+
+        service.forget()
+        parts = path.strip("/").split("/")
+        if parts[0] != "jobs" or len(parts) > 3:
+            return await respond(writer, 404, {"error": f"Unknown path {path}"})
+
+        if len(parts) == 1:
+            if method == "GET":
+                return await respond(writer, 200, [service.summary(job, False) for job in service.jobs.values()])
+            if method != "POST":
+                return await respond(writer, 405, {"error": "Use GET or POST on /jobs"})
+            try:
+                variant = query.get("variant", "strong")
+                variant_program(variant)
+                seconds = query_number(query, "time_limit", float)
+                iterations = query_number(query, "iterations", int)
+                seed = query_number(query, "seed", int)
+                #The instance is checked here, so that a bad one is refused at once
+                text = body.decode("utf-8")
+                instance = await asyncio.get_running_loop().run_in_executor(None, parse_lines, text.splitlines(), "instance")
+            except (ValueError, UnicodeDecodeError) as error:
+                return await respond(writer, 400, {"error": str(error)})
+            try:
+                job = service.submit(instance, variant, seconds, iterations, seed)
+            except OverflowError as error:
+                return await respond(writer, 503, {"error": str(error)})
+            return await respond(writer, 201, service.summary(job))
+
+        try:
+            job = service.jobs[int(parts[1])]
+        except (ValueError, KeyError):
+            return await respond(writer, 404, {"error": f"Unknown job {parts[1]}"})
+
+        if len(parts) == 3:
+            if parts[2] != "events":
+                return await respond(writer, 404, {"error": f"Unknown path {path}"})
+            if method != "GET":
+                return await respond(writer, 405, {"error": "Use GET on the events of a job"})
+            return await stream_events(writer, service, job)
+
+        if method == "GET":
+            return await respond(writer, 200, service.summary(job))
+        if method == "DELETE":
+            return await respond(writer, 200, service.summary(await service.cancel(job)))
+        return await respond(writer, 405, {"error": "Use GET or DELETE on a job"})
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    except Exception as error:
+        try:
+            await respond(writer, 500, {"error": f"{type(error).__name__}: {error}"})
+        except ConnectionError:
+            pass
+    finally:
+        writer.close()
+
+#Method that runs the service until it gets SIGINT or SIGTERM, after which the running jobs are stopped and the workers end
+async def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = None, max_jobs: int = MAX_JOBS, keep_jobs: int = KEEP_JOBS, keep_seconds: float = KEEP_SECONDS):
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    service = SolverService(workers, max_jobs, keep_jobs, keep_seconds)
+    pump = asyncio.ensure_future(service.pump_events())
+    server = await asyncio.start_server(lambda reader, writer: handle(service, reader, writer), host, port)
+    print(f"Serving the solvers on http://{host}:{port}/jobs (variants: {', '.join(VARIANTS)})")
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        await loop.run_in_executor(None, service.close)
+        await pump
+    print("The service has stopped")
+
+
+# ------------------------------- Command line interface ------------------------------ #
+
+#Method that runs the service from the command line
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Serve the Clustered Vehicle Routing solvers over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on (default 127.0.0.1, only this machine)")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on (default 8080)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="the number of worker processes (default the number of CPUs)")
+    parser.add_argument("--max-jobs", type=int, default=MAX_JOBS, help=f"the number of jobs that can be queued or running at once (default {MAX_JOBS})")
+    parser.add_argument("--keep-jobs", type=int, default=KEEP_JOBS, help=f"the number of ended jobs that are kept with their solutions (default {KEEP_JOBS})")
+    parser.add_argument("--keep-seconds", type=float, default=KEEP_SECONDS, help=f"the seconds an ended job is kept with its solution (default {KEEP_SECONDS})")
+    args = parser.parse_args(argv)
+
+    asyncio.run(serve(args.host, args.port, args.workers, args.max_jobs, args.keep_jobs, args.keep_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from array import array
+from itertools import accumulate, chain
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module holds a compact copy of a solution of the Strong or Weak programs, for the
+# solutions that are kept or sent elsewhere rather than changed by the moves: the best solution
+# of a search (which is also what the checkpoints and the search states save), the solution the
+# iterations of an Iterative VNS start from, the elites of the pool and the solutions the worker
+# processes send back
+
+# The searches work on lists of lists (cluster_orders, vehicle_tours) and a dictionary of lists
+# (customer_orders), which cost a Python object per number. A Solution keeps the same numbers in
+# two flat integer arrays with the offset where every list starts:
+#   routes - the clusters of every vehicle (cluster_orders)
+#   paths  - the customers of every cluster (Strong) or of every vehicle (Weak)
+# so a copy takes a few bytes per number and is made, pickled and restored in one go
+
+# The moves locate the clusters and the customers of the lists they change with their own
+# position indices (cluster_positions in CluVRPCandidates, tour_positions in the Weak programs)
+
+
+#Method that joins lists of integers into one array, and returns it with the offset where every list starts (and one past the end)
+def flatten(lists: list[list]):
+    return array("i", chain.from_iterable(lists)), array("i", accumulate(map(len, lists), initial=0))
+
+#Class that holds a copy of a solution in flat arrays
+class Solution:
+
+    __slots__ = ("total_distance", "routes", "route_starts", "paths", "path_starts")
+
+    def __init__(self, total_distance: int, routes: list[list], paths: list[list]):
+        self.total_distance = total_distance
+        self.routes, self.route_starts = flatten(routes)
+        self.paths, self.path_starts = flatten(paths)
+
+    def __getstate__(self):
+        return self.total_distance, self.routes, self.route_starts, self.paths, self.path_starts
+
+    def __setstate__(self, state):
+        self.total_distance, self.routes, self.route_starts, self.paths, self.path_starts = state
+
+    #Method that returns a copy of a solution of the Strong programs
+    @classmethod
+    def strong(cls, total_distance: int, cluster_orders: list[list], customer_orders: dict):
+        return cls(total_distance, cluster_orders, [customer_orders[cluster] for cluster in range(len(customer_orders))])
+
+    #Method that returns a copy of a solution of the Weak programs
+    @classmethod
+    def weak(cls, total_distance: int, cluster_orders: list[list], vehicle_tours: list[list]):
+        return cls(total_distance, cluster_orders, vehicle_tours)
+
+    #Method that returns the number of vehicles
+    def vehicles(self):
+        return len(self.route_starts) - 1
+
+    #Method that returns the clusters of a vehicle as a new list
+    def route(self, vehicle: int):
+        return self.routes[self.route_starts[vehicle]:self.route_starts[vehicle+1]].tolist()
+
+    #Method that returns the customers of a cluster (Strong) or of a vehicle (Weak) as a new list
+    def path(self, index: int):
+        return self.paths[self.path_starts[index]:self.path_starts[index+1]].tolist()
+
+    #Method that returns new lists of the clusters of every vehicle
+    def cluster_orders(self):
+        return [self.route(vehicle) for vehicle in range(self.vehicles())]
+
+    #Method that returns a new dictionary of the customers of every cluster (Strong)
+    def customer_orders(self):
+        return {cluster: self.path(cluster) for cluster in range(len(self.path_starts) - 1)}
+
+    #Method that returns new lists of the customers of every vehicle (Weak)
+    def vehicle_tours(self):
+        return [self.path(vehicle) for vehicle in range(len(self.path_starts) - 1)]
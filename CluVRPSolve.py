@@ -0,0 +1,266 @@
+from time import perf_counter
+import argparse
+import os.path
+import random
+
+import CluVRPStrong
+import CluVRPStrongV2
+import CluVRPWeak
+import CluVRPWeakV2
+from CluVRPDistances import distance_provider
+from CluVRPInstance import read_instance
+from CluVRPCandidates import candidate_lists
+from CluVRPBudget import Budget, Checkpoint, Snapshot, CHECKPOINT_INTERVAL, SNAPSHOT_INTERVAL, flush_on_signals
+from CluVRPStats import MoveStats, STATS_INTERVAL, print_stats
+from CluVRPScheduler import ORDERS, move_scheduler
+from CluVRPPaths import ClusterPaths
+from CluVRPConstruct import CONSTRUCTIONS, check_construction
+from CluVRPPool import ElitePool, POOL_SIZE
+from CluVRPEvents import JsonLines, ConvergenceMetrics, METRICS_INTERVAL, print_event, broadcast, labelled
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module is the entry point of the solvers: solve() runs one of the variants on an
+# instance and returns the best solution found, and main() is the command line interface
+
+# The variants are:
+#   "strong"     - Strong constraints, Multi-Start + Iterative VNS (CluVRPStrongV2)
+#   "strong-vns" - Strong constraints, Multi-Start VNS (CluVRPStrong)
+#   "weak"       - Weak constraints, Multi-Start VNS (CluVRPWeak)
+#   "weak-v2"    - Weak constraints, Iterative VNS started from a Strong solution (CluVRPWeakV2)
+
+# Every solve has its own random number generator and no state is shared between solves,
+# so several of them can run in one process at the same time
+
+# A solve prints nothing of the search itself, its progress is passed as events to the callback
+# it is given (see CluVRPEvents): the command line prints them, and can also write them down as
+# JSON lines (--events) and export metrics of the convergence (--metrics)
+
+# Example: python CluVRPSolve.py D.gvrp --variant strong --time-limit 30 --seed 1
+
+
+# ------------------------------------ Variants --------------------------------------- #
+
+#The program of every variant
+VARIANTS = {
+    "strong": CluVRPStrongV2,
+    "strong-vns": CluVRPStrong,
+    "weak": CluVRPWeak,
+    "weak-v2": CluVRPWeakV2,
+}
+
+#The number of iterations every variant runs when no other number is given
+DEFAULT_ITERATIONS = {
+    "strong": 10000,
+    "strong-vns": 1000,
+    "weak": 100,
+    "weak-v2": 100,
+}
+
+#Method that returns the program of a variant
+def variant_program(variant: str):
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant {variant!r}, expected one of {', '.join(VARIANTS)}")
+
+    return VARIANTS[variant]
+
+#Method that reads an instance from its file and returns it with its distances, through the binary copy of the instance when
+#cache is True, with the distance matrix in the copy when cache_distances is True (see CluVRPInstance), an instance that was
+#already read is returned as it is, without distances
+def load_instance(instance, cache: bool = True, cache_distances: bool = False):
+    if isinstance(instance, str):
+        instance, distances = read_instance(instance, cache, cache_distances)
+        print("Input red!")
+        return instance, distances
+
+    return instance, None
+
+#Method that joins the customers of the clusters of every vehicle into its tour
+def strong_tours(cluster_orders: list[list], customer_orders: dict[list]):
+    return [[customer for cluster in vehicle for customer in customer_orders[cluster]] for vehicle in cluster_orders]
+
+
+# ------------------------------------- Solving --------------------------------------- #
+
+#Method that solves an instance with one of the variants and returns the best solution found as a dictionary,
+#budget is a number of seconds or a Budget, seed makes the search reproducible when workers is 1 (a resumed search has a serial Multi-Start),
+#with a MoveStats the moves are profiled and its report is added to the result, order is "fixed" or "adaptive" (see CluVRPScheduler)
+#construction is "random" or "greedy" (see CluVRPConstruct), start is the (cluster_orders, vehicle_tours) of a Strong solution the weak-v2
+#variant starts from (computed first when None), the strong variant keeps pool_size elites (0 for none, the default, see CluVRPPool),
+#an instance given by its file is read through its binary copy unless cache is False, and the progress of the search is passed to events
+def solve(instance, variant: str = "strong", budget = None, seed: int = None, workers: int = 1, iterations: int = None, strategy: str = "best",
+          neighbours: int = None, distances: list[list] = None, checkpoint: Checkpoint = None, snapshot: Snapshot = None, start: tuple = None,
+          stats: MoveStats = None, order: str = "fixed", construction: str = "random",
+          pool_size: int = 0, cache: bool = True, events = None):
+    program = variant_program(variant)
+    if snapshot is not None and variant != "strong":
+        raise ValueError("Only the strong variant can resume a search")
+    (n, k, r, Q, points, clusters, demands), loaded = load_instance(instance, cache)
+    if distances is None:
+        distances = loaded if loaded is not None else distance_provider(n, points)
+    if not isinstance(budget, Budget):
+        budget = Budget(budget)
+    if iterations is None:
+        iterations = DEFAULT_ITERATIONS[variant]
+    near = candidate_lists(distances, clusters, neighbours) if neighbours else None
+    scheduler = move_scheduler(order, program.MOVE_ORDER)
+    check_construction(construction)
+    rng = random.Random(seed)
+    customer_orders = None
+
+    start_time = perf_counter()
+    if variant == "strong":
+        #The Multi-Start gets 90% of the budget and the Iterative VNS what is left of it, when resuming the Multi-Start gets
+        #the whole time slice and the Iterative VNS starts in the slice where the Multi-Start finishes
+        ms_budget = budget if snapshot is not None else budget.share(0.9)
+        #The paths of the clusters found by the Multi-Start are reused by the Iterative VNS
+        paths = ClusterPaths(distances, clusters)
+        #With a pool the Iterative VNS starts from the elites of the Multi-Start, else from the solution of its last iteration
+        pool = ElitePool(pool_size) if pool_size > 0 else None
+        #Only the serial Multi-Start saves its state, so a resumed search does not use the workers
+        if workers > 1 and snapshot is None:
+            best_total_distance, cluster_orders, customer_orders = program.parallel_MS_VNS(iterations, k, Q, distances, clusters, demands, workers, rng.getrandbits(64), strategy, near, ms_budget, checkpoint, rng, stats, scheduler, construction, pool, events)
+        else:
+            best_total_distance, cluster_orders, customer_orders = program.MS_VNS(iterations, k, Q, distances, clusters, demands, None, None, strategy, near, ms_budget, checkpoint, snapshot, rng, stats, scheduler, paths, construction, pool, events)
+        best_total_distance, cluster_orders, customer_orders = program.ITER_VNS(max(iterations // 10, 1), k, Q, distances, clusters, best_total_distance, cluster_orders, customer_orders, demands, strategy, near, budget, checkpoint, snapshot, rng, stats, scheduler, paths, pool, events)
+        if snapshot is not None and not budget.exhausted():
+            snapshot.clear()
+        vehicle_tours = strong_tours(cluster_orders, customer_orders)
+    elif variant == "strong-vns":
+        best_total_distance, cluster_orders, customer_orders = program.VNS(iterations, k, Q, distances, clusters, demands, strategy, near, budget, checkpoint, rng, stats, scheduler, None, construction, events)
+        vehicle_tours = strong_tours(cluster_orders, customer_orders)
+    elif variant == "weak":
+        if workers > 1:
+            best_total_distance, cluster_orders, vehicle_tours = program.parallel_VNS(iterations, k, Q, distances, clusters, demands, workers, rng.getrandbits(64), strategy, near, budget, checkpoint, rng, stats, scheduler, construction, events)
+        else:
+            best_total_distance, cluster_orders, vehicle_tours = program.VNS(iterations, k, Q, distances, clusters, demands, strategy, near, budget, checkpoint, rng, stats, scheduler, construction, events)
+    else:
+        #Without a start solution one is computed with half of the budget (its moves are not profiled, they are not the moves of the Weak program),
+        #its events are passed on with the phases under "strong-start"
+        if start is None:
+            strong = solve((n, k, r, Q, points, clusters, demands), "strong", budget.share(0.5), rng.getrandbits(64), workers, None, strategy, neighbours, distances,
+                           order=order, construction=construction, events=labelled(events, "strong-start"))
+            start = (strong["cluster_orders"], strong["vehicle_tours"])
+        best_total_distance, cluster_orders, vehicle_tours = program.VNS(iterations, Q, distances, clusters, demands, start[0], start[1], strategy, near, budget, checkpoint, rng, stats, scheduler, events)
+
+    return {
+        "instance": instance if isinstance(instance, str) else None,
+        "variant": variant,
+        "seed": seed,
+        "total_distance": best_total_distance,
+        "cluster_orders": cluster_orders,
+        "customer_orders": customer_orders,
+        "vehicle_tours": vehicle_tours,
+        "seconds": perf_counter() - start_time,
+        "move_stats": None if stats is None else stats.report(variant, True),
+    }
+
+
+# ------------------------------- Command line interface ------------------------------ #
+
+#Method that prints a solution returned by solve to the screen
+def print_result(result: dict, demands: list):
+    print()
+    print(f"The best solution found for instance {result['instance']} with the {result['variant']} variant has distance:")
+    print(result["total_distance"])
+    print()
+    print("The solution corresponding to this result is:")
+    print()
+    for i in range(len(result["cluster_orders"])):
+        print(f"Vehicle {i+1}: ", end ="")
+        print(' '.join([str(n+1) for n in result["cluster_orders"][i]]))
+        print(f"Total demand: {sum(demands[cluster] for cluster in result['cluster_orders'][i])}")
+        print("Tour: |", end ="")
+        if result["customer_orders"] is not None:
+            for cluster in result["cluster_orders"][i]:
+                print(' '.join([str(n+1) for n in result["customer_orders"][cluster]]), end="")
+                print("|", end="")
+        else:
+            print(' '.join([str(n+1) for n in result["vehicle_tours"][i]]), end="")
+            print("|", end="")
+        print()
+        print()
+    print("The algorithm took:")
+    print(f"{result['seconds'] :.2f} seconds")
+    print()
+
+#Method that returns the parser of the command line arguments
+def argument_parser(variant: str = "strong"):
+    parser = argparse.ArgumentParser(description="Solve a Clustered Vehicle Routing instance (.gvrp file)")
+    parser.add_argument("instance", help="the .gvrp file of the instance")
+    parser.add_argument("--variant", choices=list(VARIANTS), default=variant, help=f"the variant of the problem and algorithm (default {variant})")
+    parser.add_argument("--time-limit", type=float, default=None, help="the time limit of the search in seconds (default none)")
+    parser.add_argument("--iterations", type=int, default=None, help="the number of iterations (default depends on the variant)")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the random number generator")
+    parser.add_argument("--workers", type=int, default=1, help="the number of worker processes for the Multi-Start (default 1)")
+    parser.add_argument("--strategy", choices=["best", "first"], default="best", help="best or first improvement (default best)")
+    parser.add_argument("--neighbours", type=int, default=None, help="the size of the candidate lists of the granular neighbourhoods (default full neighbourhoods)")
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL, help=f"the seconds between two checkpoints of the best solution (default {CHECKPOINT_INTERVAL})")
+    parser.add_argument("--resume", action="store_true", help="save the state of the search and resume it on the next run (strong variant only, with a serial Multi-Start)")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL, help=f"the seconds between two saves of the search state (default {SNAPSHOT_INTERVAL})")
+    parser.add_argument("--order", choices=ORDERS, default="fixed", help="apply the moves in a fixed order or adaptively by their gain per second (default fixed)")
+    parser.add_argument("--construction", choices=CONSTRUCTIONS, default="random", help="the starting solutions visit the clusters in a random or a nearest neighbour order (default random)")
+    parser.add_argument("--pool-size", type=int, default=0, help=f"the number of elite solutions the Iterative VNS starts from, e.g. {POOL_SIZE}, 0 for only the last one (default 0, strong variant only)")
+    parser.add_argument("--no-cache", action="store_true", help="read the .gvrp file and compute the distances without the binary copy of the instance")
+    parser.add_argument("--cache-distances", action="store_true", help="also keep the distance matrix in the binary copy of the instance (n^2 numbers), so the next runs do not compute it")
+    parser.add_argument("--profile", action="store_true", help="count the calls, candidates, improvements, gain and time of every move and print them")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL, help=f"the seconds between two prints of the counters of the moves (default {STATS_INTERVAL})")
+    parser.add_argument("--events", default=None, help="append the progress events of the search to a file as JSON lines")
+    parser.add_argument("--metrics", default=None, help="write counters of the progress and the convergence of the search to a file in the text format of Prometheus")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL, help=f"the seconds between two writes of the metrics (default {METRICS_INTERVAL})")
+    return parser
+
+#Method that runs the command line interface, the scripts of the variants call it with their own variant as default
+def main(argv: list = None, variant: str = "strong"):
+    parser = argument_parser(variant)
+    args = parser.parse_args(argv)
+    if args.resume and args.variant != "strong":
+        parser.error("--resume is only supported by the strong variant")
+    if args.resume and args.workers > 1:
+        print("The state of the parallel Multi-Start is not saved, with --resume it runs in this process only")
+    program = variant_program(args.variant)
+    instance, distances = load_instance(args.instance, not args.no_cache, args.cache_distances)
+    name = os.path.basename(args.instance)
+
+    #The best solution is checkpointed to the solution file of the variant, in the working directory like the scripts do
+    checkpoint = Checkpoint(program.solution_file(name), program.checkpoint_lines, args.checkpoint_interval)
+    snapshot = Snapshot(program.state_file(name), args.snapshot_interval) if args.resume else None
+    flush_on_signals(checkpoint, snapshot)
+    #The Weak program starts from the saved Strong solution of the instance, if the solution file holds one of this instance
+    start = None
+    if args.variant == "weak-v2" and os.path.isfile(CluVRPStrongV2.solution_file(name)):
+        try:
+            start = program.read_strong_solution(name)
+        except ValueError:
+            pass
+        if start is None or not program.strong_solution_fits(*start, instance[1], instance[3], instance[5], instance[6]):
+            print(f"{CluVRPStrongV2.solution_file(name)} does not hold a solution of {args.instance}, a Strong solution is computed first")
+            start = None
+    stats = MoveStats(print_stats, args.stats_interval) if args.profile else None
+    #The events and the metrics say which run they belong to
+    labels = {"instance": name, "variant": args.variant, "seed": args.seed}
+    log = JsonLines(args.events, labels) if args.events is not None else None
+    metrics = ConvergenceMetrics(args.metrics, args.metrics_interval, labels) if args.metrics is not None else None
+
+    try:
+        result = solve(instance, args.variant, args.time_limit, args.seed, args.workers, args.iterations, args.strategy, args.neighbours,
+                       distances, checkpoint, snapshot, start, stats, args.order, args.construction, args.pool_size,
+                       events=broadcast(print_event, log, metrics))
+    finally:
+        if log is not None:
+            log.close()
+        if metrics is not None:
+            metrics.write()
+    result["instance"] = args.instance
+    print_result(result, instance[6])
+
+    #Update the solution written down into a file if it is better
+    if result["customer_orders"] is not None:
+        program.write_solution(name, result["total_distance"], result["cluster_orders"], result["customer_orders"])
+    else:
+        program.write_solution(name, result["total_distance"], result["cluster_orders"], result["vehicle_tours"])
+    #and the best distance of the instance, which the benchmark takes its targets from
+    program.update_best_solution(name, result["total_distance"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from time import perf_counter
+
+# ----------------------- Description of the module: ---------------------------------- #
+# This module profiles the moves of the local search of the Strong and Weak programs: for
+# every move it counts the calls, the candidates evaluated, the calls that improved the
+# solution, the total gain in distance and the time spent in it
+
+# The searches only profile when they are given a MoveStats, without one every move costs
+# a single "is None" check per call (not per candidate), so profiling can stay in the code
+
+# The counts are kept over the whole search, a report is made at the end of every phase
+# (MS_VNS, ITER_VNS, VNS) and at most once every interval seconds while it runs, and both
+# are passed to the callback (if there is one)
+
+# A report is a dictionary:
+#   {"phase": ..., "final": True/False, "seconds": ..., "moves": {"move1": {"calls": ..., "candidates": ...,
+#    "improving": ..., "gain": ..., "seconds": ..., "candidates_per_second": ..., "gain_per_second": ...}, ...}}
+
+
+#Default number of seconds between two reports while a search runs
+STATS_INTERVAL = 10
+
+#Position of every counter in the list of counters of a move
+CALLS, CANDIDATES, IMPROVING, GAIN, SECONDS = range(5)
+
+#Class that holds the counters of the moves of a search
+class MoveStats:
+
+    def __init__(self, callback = None, interval: float = STATS_INTERVAL):
+        self.counts = {}
+        self.callback = callback
+        self.interval = interval
+        self.start = perf_counter()
+        self.last_time = self.start
+        self.reports = {}
+
+    #Method that returns the counters of a move: calls, candidates, improving calls, gain and seconds
+    def move(self, name: str):
+        counts = self.counts.get(name)
+        if counts is None:
+            counts = self.counts[name] = [0, 0, 0, 0, 0.0]
+
+        return counts
+
+    #Method that passes on the candidates of a move and counts them
+    def counted(self, name: str, candidates):
+        counts = self.move(name)
+        for candidate in candidates:
+            counts[CANDIDATES] += 1
+            yield candidate
+
+    #Method that records a call of a move that started at perf_counter() time started and lowered the distance by gain
+    def record(self, name: str, started: float, gain: int):
+        counts = self.move(name)
+        counts[CALLS] += 1
+        if gain > 0:
+            counts[IMPROVING] += 1
+            counts[GAIN] += gain
+        counts[SECONDS] += perf_counter() - started
+
+    #Method that adds the counters of another search (e.g. of a restart in a worker process)
+    def merge(self, counts: dict):
+        for name, other in counts.items():
+            mine = self.move(name)
+            for i in range(len(mine)):
+                mine[i] += other[i]
+
+    #Method that returns the report of the counters so far
+    def report(self, phase: str = None, final: bool = False):
+        moves = {}
+        for name in sorted(self.counts):
+            calls, candidates, improving, gain, seconds = self.counts[name]
+            moves[name] = {
+                "calls": calls,
+                "candidates": candidates,
+                "improving": improving,
+                "gain": gain,
+                "seconds": seconds,
+                "candidates_per_second": candidates / seconds if seconds > 0 else None,
+                "gain_per_second": gain / seconds if seconds > 0 else None,
+            }
+
+        return {"phase": phase, "final": final, "seconds": perf_counter() - self.start, "moves": moves}
+
+    #Method that is called after every iteration of a phase, it passes a report to the callback once every interval seconds
+    def tick(self, phase: str):
+        if self.callback is not None and perf_counter() - self.last_time >= self.interval:
+            self.last_time = perf_counter()
+            self.callback(self.report(phase))
+
+    #Method that is called at the end of a phase, it keeps the final report of the phase and passes it to the callback
+    def finish(self, phase: str):
+        report = self.report(phase, True)
+        self.reports[phase] = report
+        if self.callback is not None:
+            self.callback(report)
+
+        return report
+
+#Method that prints a report to the screen as a table
+def print_stats(report: dict):
+    print()
+    print(f"Moves {'at the end of' if report['final'] else 'during'} {report['phase']}, after {report['seconds']:.2f} seconds:")
+    print(f"{'move':<8}{'calls':>10}{'candidates':>14}{'improving':>11}{'gain':>10}{'seconds':>10}{'gain/s':>12}")
+    for name, move in report["moves"].items():
+        gain_per_second = f"{move['gain_per_second']:.1f}" if move["gain_per_second"] is not None else "-"
+        print(f"{name:<8}{move['calls']:>10}{move['candidates']:>14}{move['improving']:>11}{move['gain']:>10}{move['seconds']:>10.2f}{gain_per_second:>12}")
+    print()
@@ -1,7 +1,19 @@
-from math import sqrt
-from random import shuffle, choice, randint
 from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import os.path
+import random
+
+from CluVRPDistances import distance_matrix, distance_provider, SharedDistances
+from CluVRPInstance import parse_instance
+from CluVRPCandidates import candidate_lists, cluster_positions, swap_candidates, segment_candidates, relocate_candidates, exchange_candidates
+from CluVRPBudget import Budget, Checkpoint, Snapshot, CHECKPOINT_INTERVAL, SNAPSHOT_INTERVAL, saved_distance, write_atomic, flush_on_signals
+from CluVRPStats import MoveStats
+from CluVRPScheduler import MoveScheduler
+from CluVRPSolution import Solution
+from CluVRPConstruct import pack_clusters, greedy_route
+from CluVRPPool import ElitePool
+from CluVRPPaths import ClusterPaths, path_length
+from CluVRPEvents import Progress
 
 # ----------------------- Description of the program: --------------------------------- #
 # This program solves the Vehicle Routing problem with Strong Cluster constraints
@@ -13,41 +25,10 @@ import os.path
 
 # -------------------- Reading/Printing/Writing  Input/Output Methods ----------------- #
 
-#Method that reads the input from the file:
+#Method that reads the input from the file (see CluVRPInstance for the format and the checks):
 def read_input(filename: str):
-    with open (filename) as new_file:
-        for _ in range(2):
-            next(new_file)
-        line = new_file.readline().strip().split(" ")
-        n = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        k = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        r = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        Q = int(line[-1])
-        for _ in range(2):
-            next(new_file)
-        points = []
-        for _ in range(n):
-            line = new_file.readline().strip().split(" ")
-            points.append((int(line[1]), int(line[2])))
-        next(new_file)
-        clusters = []
-        for _ in range(r):
-            line = new_file.readline().strip().split(" ")
-            cluster = []
-            for point in line[1:-1]:
-                #Subtract 1 to assure indexing starting at 0
-                cluster.append(int(point)-1)
-            clusters.append(cluster)
-        demands = []
-        next(new_file)
-        for _ in range(r):
-            line = new_file.readline().strip().split(" ")
-            demands.append(int(line[-1]))
-        next(new_file)
-        print("Input red!")
+    n, k, r, Q, points, clusters, demands = parse_instance(filename)
+    print("Input red!")
     return n, k, r, Q, points, clusters, demands
 
 #Method that prints the input to the screen (for potential verification purposes)
@@ -110,7 +91,8 @@ def update_best_solution(filename: str, best_total_distance: int):
             parts = line.strip().split(" ")
             best_scores[parts[0]] = int(parts[1])
 
-        if best_scores[filename[0]] > best_total_distance:
+        #An instance that is not in the file yet (e.g. a generated one) gets its own line
+        if filename[0] not in best_scores or best_scores[filename[0]] > best_total_distance:
             best_scores[filename[0]] = best_total_distance
             print("New best result found!")
 
@@ -119,53 +101,40 @@ def update_best_solution(filename: str, best_total_distance: int):
             line = instance + " " + str(distance)
             my_file.write(line+"\n") 
 
+#Method that returns the name of the file holding the best solution found for an instance (named after the whole instance,
+#e.g. A_StrongSolution.txt for A.gvrp, so instances starting with the same letter do not share it)
+def solution_file(filename: str):
+    return os.path.splitext(filename)[0] + "_StrongSolution.txt"
+
+#Method that returns the name of the file holding the saved state of the search on an instance
+def state_file(filename: str):
+    return os.path.splitext(filename)[0] + "_StrongState.pkl"
+
+#Method that returns the lines of the solution file for a solution
+def solution_lines(best_total_distance: int, best_cluster_orders: list[list], best_customer_orders: dict[list]):
+    lines = [str(best_total_distance)]
+    for i in range(len(best_cluster_orders)):
+        lines.append(' '.join([str(n+1) for n in best_cluster_orders[i]]))
+        line = ""
+        for cluster in best_cluster_orders[i]:
+            line += ' '.join([str(n+1) for n in best_customer_orders[cluster]])
+            line += " "
+        lines.append(line[:-1])
+
+    return lines
+
+#Method that returns the lines of the solution file for a solution kept as a Solution (the checkpoints of the search)
+def checkpoint_lines(solution: Solution):
+    return solution_lines(solution.total_distance, solution.cluster_orders(), solution.customer_orders())
+
 #Method that writes out the solution to a file
 def write_solution(filename: str, best_total_distance: int, best_cluster_orders: list[list], best_customer_orders: dict[list]):
-    if not os.path.isfile(filename[0] + "_StrongSolution.txt"):
-        with open(filename[0] + "_StrongSolution.txt", "w") as new_file:
-            line = str(best_total_distance)
-            new_file.write(line+"\n")
-            for i in range(len(best_cluster_orders)):
-                line = ""
-                line += ' '.join([str(n+1) for n in best_cluster_orders[i]])
-                new_file.write(line+"\n")
-                line = ""
-                for cluster in best_cluster_orders[i]:
-                    line += ' '.join([str(n+1) for n in best_customer_orders[cluster]])
-                    line += " "
-                line = line[:-1]
-                new_file.write(line+"\n")
-        
-    else:
-        with open(filename[0] + "_StrongSolution.txt", "r") as my_file:
-            line = my_file.readline().strip()
-            past_distance = int(line)
-
-        if best_total_distance < past_distance:
-            with open(filename[0] + "_StrongSolution.txt", "w") as file:
-                line = str(best_total_distance)
-                file.write(line+"\n")
-                for i in range(len(best_cluster_orders)):
-                    line = ""
-                    line += ' '.join([str(n+1) for n in best_cluster_orders[i]])
-                    file.write(line+"\n")
-                    line = ""
-                    for cluster in best_cluster_orders[i]:
-                        line += ' '.join([str(n+1) for n in best_customer_orders[cluster]])
-                        line += " "
-                    line = line[:-1]
-                    file.write(line+"\n")
+    past_distance = saved_distance(solution_file(filename))
+    if past_distance is None or best_total_distance < past_distance:
+        write_atomic(solution_file(filename), solution_lines(best_total_distance, best_cluster_orders, best_customer_orders))
 
 # -------------------- Methods that construct the initial solution -------------------- #
 
-#Method that computes the distances between the points and returns them in adjancencency matrix form:
-def distance_matrix(n: int, points: list[tuple]):
-    distance_matrix = [[0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            distance_matrix[i][j] = round(sqrt((points[i][0] - points[j][0]) **2 + (points[i][1] - points[j][1]) **2))
-    return distance_matrix
-    
 #Method that computes the current sum of demands for a list of clusters
 def sum_demands(cluster_list:list, demands:list):
     sum = 0
@@ -189,225 +158,276 @@ def total_distance(distances: list[list], cluster_orders: list[list], customer_o
 
     return total_distance
 
-#Method that performs a first-fit heuristic for a bin packing problem, until exactly k bins are used 
-def first_fit(k: int, Q: int, demands: list):
-    copy_demands = demands.copy()
-    shuffle(copy_demands)
-    bins = []
-
-    while len(bins) != k:
-        bins = []
-        shuffle(copy_demands)
-        bins.append([])
-        for number in copy_demands:
-            added = False
-            for bin in bins:
-                if sum(bin) + number <= Q:
-                    bin.append(number)
-                    added = True
-                    break
-            if not added:
-                new_bin = []
-                new_bin.append(number)
-                bins.append(new_bin)
-
-    return bins
-
-#Method that uses the bin allocation from above to create an initial allocation of clusters to vehicle tours
-def clusters_to_vehicles(k: int, Q: int, demands: list):
-    bins = first_fit(k, Q, demands)
-    vehicles = []
-    copy_demands = demands.copy()
-
-    for bin in bins:
-        vehicle = []
-        for number in bin:
-            indexes = []
-            for i in range(len(copy_demands)):
-                if copy_demands[i] == number:
-                    indexes.append(i)
-            index = choice(indexes)
-            copy_demands[index] = -1
-            vehicle.append(index)
-        vehicles.append(vehicle)
-
+#Class that caches the internal path length of every cluster, the cost of every vehicle route and the total distance of a solution,
+#the moves call update_cluster / update_vehicle for what they changed so that only those entries are recomputed
+class RouteCosts:
+
+    def __init__(self, distances: list[list], cluster_orders: list[list], customer_orders: dict):
+        self.distances = distances
+        self.cluster_orders = cluster_orders
+        self.customer_orders = customer_orders
+        self.cluster_costs = {}
+        for cluster, customers in customer_orders.items():
+            self.cluster_costs[cluster] = self.path_cost(customers)
+        self.vehicle_of = {}
+        self.vehicle_costs = [0] * len(cluster_orders)
+        self.total = 0
+        for vehicle in range(len(cluster_orders)):
+            self.update_vehicle(vehicle)
+
+    #Method that computes the length of the path through the customers of a cluster
+    def path_cost(self, customers: list):
+        cost = 0
+        for i in range(len(customers)-1):
+            cost += self.distances[customers[i]][customers[i+1]]
+        return cost
+
+    #Method that computes the cost of a vehicle route from the cached cluster costs
+    def route_cost(self, vehicle_route: list):
+        distances = self.distances
+        customer_orders = self.customer_orders
+        cost = distances[0][customer_orders[vehicle_route[0]][0]] + distances[0][customer_orders[vehicle_route[-1]][-1]]
+        for i in range(len(vehicle_route)):
+            cost += self.cluster_costs[vehicle_route[i]]
+            if i > 0:
+                cost += distances[customer_orders[vehicle_route[i-1]][-1]][customer_orders[vehicle_route[i]][0]]
+        return cost
+
+    #Method to call after the order of the clusters of a vehicle route changed
+    def update_vehicle(self, vehicle: int):
+        vehicle_route = self.cluster_orders[vehicle]
+        for cluster in vehicle_route:
+            self.vehicle_of[cluster] = vehicle
+        cost = self.route_cost(vehicle_route)
+        self.total += cost - self.vehicle_costs[vehicle]
+        self.vehicle_costs[vehicle] = cost
+
+    #Method to call after the order of the customers of all the clusters of a vehicle route changed
+    def update_route(self, vehicle: int):
+        for cluster in self.cluster_orders[vehicle]:
+            self.cluster_costs[cluster] = self.path_cost(self.customer_orders[cluster])
+        self.update_vehicle(vehicle)
+
+    #Method to call after the order of the customers of a cluster changed
+    def update_cluster(self, cluster: int):
+        self.cluster_costs[cluster] = self.path_cost(self.customer_orders[cluster])
+        if cluster in self.vehicle_of:
+            self.update_vehicle(self.vehicle_of[cluster])
+
+#Method that creates an initial allocation of clusters to vehicle tours, packed into exactly k vehicles (see CluVRPConstruct)
+def clusters_to_vehicles(k: int, Q: int, demands: list, rng: random.Random = random):
+    vehicles = pack_clusters(k, Q, demands, rng)
     for vehicle in vehicles:
-        shuffle(vehicle)
+        rng.shuffle(vehicle)
 
-    return vehicles  
-        
-#Method that generates the initial solution
-def generate_solution(clusters: list[list], demands: list):
+    return vehicles
+
+#Method that generates the initial solution, rng is the random number generator of the search (the random module by default),
+#with the greedy construction the vehicles visit what they have left in a nearest neighbour order (distances must be given)
+def generate_solution(k: int, Q: int, clusters: list[list], demands: list, rng: random.Random = random, construction: str = "random", distances: list[list] = None):
     customer_orders = {}
     for i in range(len(clusters)):
         copy = clusters[i].copy()
-        shuffle(copy)
+        rng.shuffle(copy)
         customer_orders[i] = copy.copy()
 
-    cluster_orders = clusters_to_vehicles(k, Q, demands)
+    cluster_orders = clusters_to_vehicles(k, Q, demands, rng)
+    if construction == "greedy":
+        for vehicle_route in cluster_orders:
+            greedy_route(distances, clusters, vehicle_route, customer_orders)
 
     return cluster_orders, customer_orders
 
 
 # ------------------- Methods that implement the moves of the VNS --------------------- #
 
-#Method that implements move 1
-def move1(distances: list[list], cluster_orders: list[list], customer_orders: dict):
-    for customers in customer_orders.values():
-        best_distance = total_distance(distances, cluster_orders, customer_orders)
-        index1 = 0
-        index2 = 0
-        for i in range (len(customers)):
-            for j in range (len(customers)):
-                swap_in_list(customers, i, j)
-                if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                    best_distance = total_distance(distances, cluster_orders, customer_orders)
-                    index1 = i
-                    index2 = j
-                swap_in_list(customers, i, j)
-
-        swap_in_list(customers, index1, index2)
-                
-#Method that implements move 2
-def move2(distances: list[list], cluster_orders: list[list], customer_orders: dict):
-    for customers in customer_orders.values():
-        best_distance = total_distance(distances, cluster_orders, customer_orders)
-        index1 = 0
-        index2 = 0
-        length = 1
-        for i in range (len(customers)):
-            for j in range (len(customers)):
-                for k in range(1, len(customers)+1):
-                    if max(i + k, j + k) <= len(customers):    
-                        move_in_list(customers, i, j, k)
-                        if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                            best_distance = total_distance(distances, cluster_orders, customer_orders)
-                            index1 = i
-                            index2 = j
-                            length = k
-                        move_in_list(customers, j, i, k)
-
-        move_in_list(customers, index1, index2, length)
+#Method that implements move 2: every vehicle route gets the best paths through its clusters for the order of its clusters
+#(exact for the small clusters, from the tables of paths, see CluVRPPaths), then every large cluster gets the best order
+#paths finds between the customers visited right before and after it, this covers every swap and every move of a segment
+#of customers inside a cluster, first and near do not apply to it
+def move2(distances: list[list], cluster_orders: list[list], customer_orders: dict, costs: RouteCosts = None, first: bool = False, near: dict = None, stats: MoveStats = None, paths: ClusterPaths = None):
+    positions = cluster_positions(cluster_orders)
+    candidates = range(len(cluster_orders))
+    if stats is not None:
+        candidates = stats.counted("move2", candidates)
+    for vehicle in candidates:
+        vehicle_route = cluster_orders[vehicle]
+        length, route_paths = paths.best_route(vehicle_route, customer_orders)
+        old_length = costs.vehicle_costs[vehicle] if costs is not None else total_distance(distances, [vehicle_route], customer_orders)
+        if length < old_length:
+            for i in range(len(vehicle_route)):
+                customer_orders[vehicle_route[i]][:] = route_paths[i]
+            if costs is not None:
+                costs.update_route(vehicle)
+
+        for cluster in vehicle_route:
+            customers = customer_orders[cluster]
+            if len(customers) <= paths.exact_size:
+                continue
+            previous, following = cluster_neighbours(cluster, cluster_orders, customer_orders, positions)
+            order = paths.best_path(cluster, previous, customers, following)
+            if path_length(distances, [previous] + order + [following]) < path_length(distances, [previous] + customers + [following]):
+                customers[:] = order
+                if costs is not None:
+                    costs.update_cluster(cluster)
 
 #Method that implements move 3
-def move3(distances: list[list], cluster_orders: list[list], customer_orders: dict):
-    for vehicle_route in cluster_orders:
-        best_distance = total_distance(distances, cluster_orders, customer_orders)
+def move3(distances: list[list], cluster_orders: list[list], customer_orders: dict, costs: RouteCosts = None, first: bool = False, near: dict = None, stats: MoveStats = None):
+    near_clusters = None if near is None else near["clusters"]
+    for vehicle in range(len(cluster_orders)):
+        vehicle_route = cluster_orders[vehicle]
+        firsts, lasts = route_ends(vehicle_route, customer_orders)
+        best_delta = 0
         index1 = 0
         index2 = 0
-        for i in range (len(vehicle_route)):
-            for j in range (len(vehicle_route)):
-                swap_in_list(vehicle_route, i, j)
-                if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                    best_distance = total_distance(distances, cluster_orders, customer_orders)
-                    index1 = i
-                    index2 = j
-                swap_in_list(vehicle_route, i, j)
+        candidates = swap_candidates(vehicle_route, near_clusters)
+        if stats is not None:
+            candidates = stats.counted("move3", candidates)
+        for i, j in candidates:
+            delta = swap_delta(distances, firsts, lasts, i, j)
+            if delta < best_delta:
+                best_delta = delta
+                index1 = i
+                index2 = j
+                if first:
+                    break
 
         swap_in_list(vehicle_route, index1, index2)
+        if costs is not None and best_delta < 0:
+            costs.update_vehicle(vehicle)
 
 #Method that implements move 4
-def move4(distances: list[list], cluster_orders: list[list], customer_orders: dict):
-    for vehicle_route in cluster_orders:
-        best_distance = total_distance(distances, cluster_orders, customer_orders)
+def move4(distances: list[list], cluster_orders: list[list], customer_orders: dict, costs: RouteCosts = None, first: bool = False, near: dict = None, stats: MoveStats = None):
+    near_clusters = None if near is None else near["clusters"]
+    for vehicle in range(len(cluster_orders)):
+        vehicle_route = cluster_orders[vehicle]
+        firsts, lasts = route_ends(vehicle_route, customer_orders)
+        best_delta = 0
         index1 = 0
         index2 = 0
         length = 1
-        for i in range (len(vehicle_route)):
-            for j in range (len(vehicle_route)):
-                for k in range (1, len(vehicle_route)+1):
-                    if max(i + k, j + k) <= len(vehicle_route):
-                        move_in_list(vehicle_route, i, j, k)
-                        if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                            best_distance = total_distance(distances, cluster_orders, customer_orders)
-                            index1 = i
-                            index2 = j
-                            length = k
-                        move_in_list(vehicle_route, j, i, k)
+        candidates = segment_candidates(vehicle_route, near_clusters)
+        if stats is not None:
+            candidates = stats.counted("move4", candidates)
+        for i, j, k in candidates:
+            delta = move_delta(distances, firsts, lasts, i, j, k)
+            if delta < best_delta:
+                best_delta = delta
+                index1 = i
+                index2 = j
+                length = k
+                if first:
+                    break
 
         move_in_list(vehicle_route, index1, index2, length)
+        if costs is not None and best_delta < 0:
+            costs.update_vehicle(vehicle)
 
 #Method that implements move 5
-def move5(Q: int, demands: list, distances: list[list], cluster_orders: list[list], customer_orders: dict):
-    best_distance = total_distance(distances, cluster_orders, customer_orders)
+def move5(Q: int, demands: list, distances: list[list], cluster_orders: list[list], customer_orders: dict, costs: RouteCosts = None, first: bool = False, near: dict = None, stats: MoveStats = None):
+    ends = [route_ends(vehicle_route, customer_orders) for vehicle_route in cluster_orders]
+    loads = [sum_demands(vehicle_route, demands) for vehicle_route in cluster_orders]
+    near_clusters = None if near is None else near["clusters"]
+    positions = None if near is None else cluster_positions(cluster_orders)
+    best_delta = 0
     old_vehicle = 0
     new_vehicle = 0
     old_postion = 0
     new_position = 0
     length = 1
 
-    for i in range(len(cluster_orders)):
-        for j in range(len(cluster_orders[i])):
-            for k in range(len(cluster_orders)): 
-                if k != i:
-                    for l in range(len(cluster_orders[k])):
-                        for m in range(1, len(cluster_orders[i])+1):
-                            if m + j <= len(cluster_orders[i]):
-                                sum = sum_demands(cluster_orders[k], demands)
-                                for t in range(m):
-                                    sum += demands[cluster_orders[i][j+t]]
-                                if sum <= Q:
-                                    move_between_lists(cluster_orders[i], cluster_orders[k], j, l, m)
-                                    if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                                        best_distance = total_distance(distances, cluster_orders, customer_orders)
-                                        old_vehicle = i
-                                        new_vehicle = k
-                                        old_postion = j
-                                        new_position = l
-                                        length = m
-                                    move_between_lists(cluster_orders[k], cluster_orders[i], l, j, m)
+    candidates = relocate_candidates(cluster_orders, near_clusters, positions)
+    if stats is not None:
+        candidates = stats.counted("move5", candidates)
+    for i, j, k, l in candidates:
+        firsts1, lasts1 = ends[i]
+        firsts2, lasts2 = ends[k]
+        sum = loads[k]
+        #Moving the whole route would leave vehicle i without clusters, so m stops before that
+        for m in range(1, len(cluster_orders[i])):
+            if m + j <= len(cluster_orders[i]):
+                sum += demands[cluster_orders[i][j+m-1]]
+                if sum <= Q:
+                    delta = (distances[lasts1[j]][firsts1[j+m+1]] - distances[lasts1[j]][firsts1[j+1]] - distances[lasts1[j+m]][firsts1[j+m+1]]
+                            + distances[lasts2[l]][firsts1[j+1]] + distances[lasts1[j+m]][firsts2[l+1]] - distances[lasts2[l]][firsts2[l+1]])
+                    if delta < best_delta:
+                        best_delta = delta
+                        old_vehicle = i
+                        new_vehicle = k
+                        old_postion = j
+                        new_position = l
+                        length = m
+                        if first:
+                            break
+        if first and best_delta < 0:
+            break
 
     move_between_lists(cluster_orders[old_vehicle], cluster_orders[new_vehicle], old_postion, new_position, length)
+    if costs is not None and best_delta < 0:
+        costs.update_vehicle(old_vehicle)
+        costs.update_vehicle(new_vehicle)
 
 #Method that implements move 6
-def move6(Q: int, demands: list, distances: list[list], cluster_orders: list[list], customer_orders: dict):
+def move6(Q: int, demands: list, distances: list[list], cluster_orders: list[list], customer_orders: dict, costs: RouteCosts = None, first: bool = False, near: dict = None, stats: MoveStats = None):
+    ends = [route_ends(vehicle_route, customer_orders) for vehicle_route in cluster_orders]
+    loads = [sum_demands(vehicle_route, demands) for vehicle_route in cluster_orders]
+    near_clusters = None if near is None else near["clusters"]
+    positions = None if near is None else cluster_positions(cluster_orders)
     vehicle1 = 0
     vehicle2 = 0
     cluster_index1 = 0
     cluster_index2 = 0
-    best_distance = total_distance(distances, cluster_orders, customer_orders)
-
-    for i in range(len(cluster_orders)):
-        for j in range(len(cluster_orders)):
-            if i != j:
-                for k in range(len(cluster_orders[i])):
-                    for l in range(len(cluster_orders[j])):
-                        sum1 = sum_demands(cluster_orders[i], demands) - demands[cluster_orders[i][k]] + demands[cluster_orders[j][l]]
-                        sum2 = sum_demands(cluster_orders[j], demands) - demands[cluster_orders[j][l]] + demands[cluster_orders[i][k]]
-                        if sum1 <= Q and sum2 <= Q:
-                            swap_between_lists(cluster_orders[i], cluster_orders[j], k, l)
-                            if total_distance(distances, cluster_orders, customer_orders) < best_distance:
-                                best_distance = total_distance(distances, cluster_orders, customer_orders)
-                                vehicle1 = i
-                                vehicle2 = j
-                                cluster_index1 = k
-                                cluster_index2 = l
-                            swap_between_lists(cluster_orders[i], cluster_orders[j], k, l)
+    best_delta = 0
+
+    candidates = exchange_candidates(cluster_orders, near_clusters, positions)
+    if stats is not None:
+        candidates = stats.counted("move6", candidates)
+    for i, j, k, l in candidates:
+        firsts1, lasts1 = ends[i]
+        firsts2, lasts2 = ends[j]
+        sum1 = loads[i] - demands[cluster_orders[i][k]] + demands[cluster_orders[j][l]]
+        sum2 = loads[j] - demands[cluster_orders[j][l]] + demands[cluster_orders[i][k]]
+        if sum1 <= Q and sum2 <= Q:
+            delta = (distances[lasts1[k]][firsts2[l+1]] + distances[lasts2[l+1]][firsts1[k+2]]
+                    - distances[lasts1[k]][firsts1[k+1]] - distances[lasts1[k+1]][firsts1[k+2]]
+                    + distances[lasts2[l]][firsts1[k+1]] + distances[lasts1[k+1]][firsts2[l+2]]
+                    - distances[lasts2[l]][firsts2[l+1]] - distances[lasts2[l+1]][firsts2[l+2]])
+            if delta < best_delta:
+                best_delta = delta
+                vehicle1 = i
+                vehicle2 = j
+                cluster_index1 = k
+                cluster_index2 = l
+                if first:
+                    break
 
     swap_between_lists(cluster_orders[vehicle1], cluster_orders[vehicle2], cluster_index1, cluster_index2)
+    if costs is not None and best_delta < 0:
+        costs.update_vehicle(vehicle1)
+        costs.update_vehicle(vehicle2)
 
 # Method that performs a perturbation on the current solution
-def perturbation(cluster_orders: list[list], customer_orders: dict[list], demands:list):
+def perturbation(Q: int, cluster_orders: list[list], customer_orders: dict[list], demands:list, rng: random.Random = random):
     
     perturbated = False
     while not perturbated:
 
-        i = randint(0, len(cluster_orders)-1)
-        j = randint(0, len(cluster_orders)-1)
+        i = rng.randint(0, len(cluster_orders)-1)
+        j = rng.randint(0, len(cluster_orders)-1)
         if i != j:
-            k = randint(0, len(cluster_orders[i])-1)
-            l = randint(0, len(cluster_orders[j])-1)
+            k = rng.randint(0, len(cluster_orders[i])-1)
+            l = rng.randint(0, len(cluster_orders[j])-1)
             sum1 = sum_demands(cluster_orders[i], demands) - demands[cluster_orders[i][k]] + demands[cluster_orders[j][l]]
             sum2 = sum_demands(cluster_orders[j], demands) - demands[cluster_orders[j][l]] + demands[cluster_orders[i][k]]
             if sum1 <= Q and sum2 <= Q:
                 swap_between_lists(cluster_orders[i], cluster_orders[j], k, l)
-                shuffle(cluster_orders[i])
-                shuffle(cluster_orders[j])
+                rng.shuffle(cluster_orders[i])
+                rng.shuffle(cluster_orders[j])
                 perturbated = True
                 break
 
         for customers in customer_orders.values():
-            shuffle(customers)
+            rng.shuffle(customers)
 
 # -------------------- Helper Methods for immplementing the moves --------------------- #
 
@@ -443,278 +463,488 @@ def move_between_lists(list1: list, list2: list, index1: int, index2: int, t: in
     for i in range(t):
         list2.insert(index2, temp[i])
 
-#Method that returns a copy for a list of lists
-def copy_lists_of_lists(my_list: list[list]):
-    new_list = []
-    for item in my_list:
-        temp = item.copy()
-        new_list.append(temp)
+#Method that returns the customers visited right before and right after a cluster (0 being the depot)
+def cluster_neighbours(cluster: int, cluster_orders: list[list], customer_orders: dict, positions: dict):
+    vehicle, position = positions[cluster]
+    vehicle_route = cluster_orders[vehicle]
+    previous = 0
+    following = 0
+    if position > 0:
+        previous = customer_orders[vehicle_route[position-1]][-1]
+    if position < len(vehicle_route)-1:
+        following = customer_orders[vehicle_route[position+1]][0]
+
+    return previous, following
+
+#Method that returns the first and last customer of every cluster in a vehicle route, with the depot added on both ends
+def route_ends(vehicle_route: list, customer_orders: dict):
+    firsts = [0]
+    lasts = [0]
+    for cluster in vehicle_route:
+        firsts.append(customer_orders[cluster][0])
+        lasts.append(customer_orders[cluster][-1])
+    firsts.append(0)
+    lasts.append(0)
+
+    return firsts, lasts
+
+#Method that computes the change in distance caused by swap_in_list(list, index1, index2), 
+#where the path is given by the entry (firsts) and exit (lasts) customers of its items, bounded by the previous and next customer
+def swap_delta(distances: list[list], firsts: list, lasts: list, index1: int, index2: int):
+    if index1 == index2:
+        return 0
+    a = min(index1, index2) + 1
+    b = max(index1, index2) + 1
+    if b == a + 1:
+        old = distances[lasts[a-1]][firsts[a]] + distances[lasts[a]][firsts[b]] + distances[lasts[b]][firsts[b+1]]
+        new = distances[lasts[a-1]][firsts[b]] + distances[lasts[b]][firsts[a]] + distances[lasts[a]][firsts[b+1]]
+    else:
+        old = (distances[lasts[a-1]][firsts[a]] + distances[lasts[a]][firsts[a+1]]
+               + distances[lasts[b-1]][firsts[b]] + distances[lasts[b]][firsts[b+1]])
+        new = (distances[lasts[a-1]][firsts[b]] + distances[lasts[b]][firsts[a+1]]
+               + distances[lasts[b-1]][firsts[a]] + distances[lasts[a]][firsts[b+1]])
 
-    return new_list
+    return new - old
 
-#method that returns a copy of a dictionary of lists:
-def copy_dictionary(my_dict: dict[list]):
-    new_dict = {}
-    for key, value in my_dict.items():
-        new_dict[key] = value.copy()
+#Method that computes the change in distance caused by move_in_list(list, index1, index2, t), on a path given as for swap_delta
+def move_delta(distances: list[list], firsts: list, lasts: list, index1: int, index2: int, t: int):
+    if index1 == index2:
+        return 0
+    before = index1
+    first = index1 + 1
+    last = index1 + t
+    after = index1 + t + 1
+    #Neighbours of the insertion point once the t items have been taken out
+    x = index2 if index2 <= index1 else index2 + t
+    y = index2 + 1 if index2 < index1 else index2 + t + 1
 
-    return new_dict
+    return (distances[lasts[before]][firsts[after]] - distances[lasts[before]][firsts[first]] - distances[lasts[last]][firsts[after]]
+            + distances[lasts[x]][firsts[first]] + distances[lasts[last]][firsts[y]] - distances[lasts[x]][firsts[y]])
 
 
 # ---------------------------------- Main Methods ------------------------------------- #
 
+#The order in which the local search applies the moves (the fixed order, and what breaks ties in the adaptive order)
+MOVE_ORDER = ["move6", "move5", "move4", "move3", "move2"]
+
+#Method that checks the name of a search strategy and returns whether the moves use first-improvement
+def search_strategy(strategy: str):
+    if strategy not in ("best", "first"):
+        raise ValueError(f"Unknown search strategy {strategy!r}, expected 'best' or 'first'")
+
+    return strategy == "first"
+
+#Read-only instance data of a worker process of the parallel Multi-Start (filled by init_worker)
+worker_data = {}
+
+#Method that applies the moves of the VNS to a solution until none of them improves it and returns its final distance,
+#the moves apply their best improving candidate, or the first one when first is set, among the candidates allowed by near,
+#the search stops between two moves once the deadline of the budget has passed, and the moves are profiled in stats if it is given,
+#with a scheduler the moves are applied in its adaptive order instead of the fixed MOVE_ORDER, and paths keeps the paths of the clusters
+def local_search(Q: int, demands: list, distances: list[list], cluster_orders: list[list], customer_orders: dict, first: bool = False, near: dict = None, budget: Budget = None, stats: MoveStats = None, scheduler: MoveScheduler = None, paths: ClusterPaths = None):
+    costs = RouteCosts(distances, cluster_orders, customer_orders)
+    total_distance_traveled = costs.total
+    if paths is None:
+        paths = ClusterPaths(distances)
+    if scheduler is not None:
+        moves = {
+            "move6": lambda: move6(Q, demands, distances, cluster_orders, customer_orders, costs, first, near, stats),
+            "move5": lambda: move5(Q, demands, distances, cluster_orders, customer_orders, costs, first, near, stats),
+            "move4": lambda: move4(distances, cluster_orders, customer_orders, costs, first, near, stats),
+            "move3": lambda: move3(distances, cluster_orders, customer_orders, costs, first, near, stats),
+            "move2": lambda: move2(distances, cluster_orders, customer_orders, costs, first, near, stats, paths),
+        }
+        return scheduler.descent(moves, lambda: costs.total, total_distance_traveled, budget, stats)
+
+    #The budget is checked before every move, not only before every round of the moves
+    improvement = True
+    while improvement and not (budget is not None and budget.expired()):
+        improvement = False
+
+        improve = True        
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            #The moves are only timed when they are profiled
+            if stats is not None:
+                started = perf_counter()
+            move6(Q, demands, distances, cluster_orders, customer_orders, costs, first, near, stats)
+            new_distance = costs.total
+            if stats is not None:
+                stats.record("move6", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move5(Q, demands,distances, cluster_orders, customer_orders, costs, first, near, stats)
+            new_distance = costs.total
+            if stats is not None:
+                stats.record("move5", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move4(distances, cluster_orders, customer_orders, costs, first, near, stats)
+            new_distance = costs.total
+            if stats is not None:
+                stats.record("move4", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move3(distances, cluster_orders, customer_orders, costs, first, near, stats)
+            new_distance = costs.total
+            if stats is not None:
+                stats.record("move3", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move2(distances, cluster_orders, customer_orders, costs, first, near, stats, paths)
+            new_distance = costs.total
+            if stats is not None:
+                stats.record("move2", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+    return total_distance_traveled
+
+#Method that returns a solution kept in a search state ("best" or "current"), the states saved by older versions keep its lists instead of a Solution
+def saved_solution(state: dict, name: str, distances: list[list]):
+    if name in state:
+        return state[name]
+
+    prefix = "best_" if name == "best" else ""
+    cluster_orders, customer_orders = state[prefix + "cluster_orders"], state[prefix + "customer_orders"]
+    return Solution.strong(total_distance(distances, cluster_orders, customer_orders), cluster_orders, customer_orders)
+
 #Method that applies the Multi-Start Variable Neigbourhood Search:
-def MS_VNS(n_iter: int, Q: int, distances: list[list], clusters: list[list], demands: list, start_cluster_orders, start_customer_orders):
-    start_time = perf_counter()
-    seconds_1 = False
-    seconds_10 = False
-    seconds_30 = False
-    seconds_60 = False
-    seconds_300 = False
-    seconds_1800 = False
+def MS_VNS(n_iter: int, k: int, Q: int, distances: list[list], clusters: list[list], demands: list, start_cluster_orders, start_customer_orders, strategy: str = "best", near: dict = None, budget: Budget = None, checkpoint: Checkpoint = None, snapshot: Snapshot = None, rng: random.Random = random, stats: MoveStats = None, scheduler: MoveScheduler = None, paths: ClusterPaths = None, construction: str = "random", pool: ElitePool = None, events = None):
+    first = search_strategy(strategy)
+    #The paths of the clusters are kept for the whole search
+    if paths is None:
+        paths = ClusterPaths(distances, clusters)
     m = max(n_iter // 10, 1)
     t = max(n_iter // 100, 1)
-
-    if start_cluster_orders is None:
-        cluster_orders, customer_orders = generate_solution(clusters, demands)
-        prints = True
+    progress = Progress("MS_VNS", events, t, status=None if pool is None else pool.status)
+    state = snapshot.load("MS_VNS", clusters, demands) if snapshot is not None else None
+    started = state is not None
+    interrupted = False
+
+    if state is not None:
+        if pool is not None:
+            pool.elites = list(state.get("pool") or [])
+        best = saved_solution(state, "best", distances)
+        if state["done"]:
+            return best.total_distance, best.cluster_orders(), best.customer_orders()
+        multi_start = True
+        start = None
+        count_no_improve = state["count_no_improve"]
+        rng.setstate(state["random_state"])
+        start_iteration = state["iteration"]
+        progress = Progress("MS_VNS", events, t, state["milestones"], state["elapsed"], start_iteration, None if pool is None else pool.status)
     else:
-        cluster_orders = copy_lists_of_lists(start_cluster_orders)
-        customer_orders = copy_dictionary(start_customer_orders)
-        prints = False
-    total_distance_traveled = total_distance(distances, cluster_orders, customer_orders)
-    best_total_distance = total_distance_traveled
-    best_cluster_orders = copy_lists_of_lists(cluster_orders)
-    best_customer_orders = copy_dictionary(customer_orders) 
-    count_no_improve = 0
-
-    for i in range(n_iter):
+        if start_cluster_orders is None:
+            cluster_orders, customer_orders = generate_solution(k, Q, clusters, demands, rng, construction, distances)
+            multi_start = True
+        else:
+            #From a solution given every restart starts from it
+            cluster_orders, customer_orders = start_cluster_orders, start_customer_orders
+            multi_start = False
+        #The best solution is kept as a compact copy, which is only made again when a better one is found
+        best = Solution.strong(total_distance(distances, cluster_orders, customer_orders), cluster_orders, customer_orders)
+        start = None if multi_start else best
+        count_no_improve = 0
+        start_iteration = 0
+
+    for i in range(start_iteration, n_iter):
+        #The state is taken at the start of an iteration, an iteration cut short by the deadline is done again on resuming
+        if snapshot is not None and not interrupted:
+            state = {"phase": "MS_VNS", "done": False, "iteration": i, "count_no_improve": count_no_improve, "pool": None if pool is None else pool.elites.copy(),
+                     "best": best, "milestones": progress.reached,
+                     "elapsed": progress.seconds(), "random_state": rng.getstate(), "clusters": clusters, "demands": demands}
+        if budget is not None and budget.exhausted():
+            progress.budget(i, best.total_distance)
+            break
+        started = True
+        if snapshot is not None:
+            snapshot.update(state)
         IMPROVEMENT = False
-        if count_no_improve >= m and seconds_10 and prints:
-            print(f"No improvement after {m} iterations")
-            print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the best solution found has total distance: {best_total_distance}")
-            print()
+        if count_no_improve >= m and progress.passed(10) and multi_start:
+            progress.stagnation(i, best.total_distance, m)
             break
 
-        if start_cluster_orders is None:
-            cluster_orders, customer_orders = generate_solution(clusters, demands)
+        if start is None:
+            cluster_orders, customer_orders = generate_solution(k, Q, clusters, demands, rng, construction, distances)
         else:
-            cluster_orders = copy_lists_of_lists(start_cluster_orders)
-            customer_orders = copy_dictionary(start_customer_orders)
-        total_distance_traveled = total_distance(distances, cluster_orders, customer_orders)
-        
-        improvement = True
-        while improvement:
-            improvement = False
-
-            improve = True        
-            while improve:
-                improve = False
-                move6(Q, demands, distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move5(Q, demands,distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move4(distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move3(distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move2(distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move1(distances, cluster_orders, customer_orders)
-                new_distance = total_distance(distances, cluster_orders, customer_orders)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-                
-            if total_distance_traveled < best_total_distance:
-                best_total_distance = total_distance(distances, cluster_orders, customer_orders)
-                best_cluster_orders = copy_lists_of_lists(cluster_orders)
-                best_customer_orders = copy_dictionary(customer_orders) 
-                IMPROVEMENT = True
-                if seconds_30 and prints:
-                    print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the NEW best solution found has total distance: {best_total_distance}")
+            cluster_orders, customer_orders = start.cluster_orders(), start.customer_orders()
+        total_distance_traveled = local_search(Q, demands, distances, cluster_orders, customer_orders, first, near, budget, stats, scheduler, paths)
+        interrupted = budget is not None and budget.expired()
+        if pool is not None and not interrupted:
+            pool.offer(total_distance_traveled, cluster_orders, customer_orders)
+
+        if total_distance_traveled < best.total_distance:
+            best = Solution.strong(total_distance_traveled, cluster_orders, customer_orders)
+            IMPROVEMENT = True
+            progress.improvement(i+1, best.total_distance)
 
         if IMPROVEMENT:
             count_no_improve = 0
         else:
             count_no_improve += 1
 
-        if perf_counter() - start_time > 1 and not seconds_1 and prints:
-            seconds_1 = True
-            print(f"After 1 second, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
+        if budget is not None:
+            budget.spend()
+        if checkpoint is not None:
+            checkpoint.update(best)
+        if stats is not None and multi_start:
+            stats.tick("MS_VNS")
 
-        if perf_counter() - start_time > 10 and not seconds_10 and prints:
-            seconds_10 = True
+        #The iterations without improvement are only counted from 10 seconds on
+        if 10 in progress.restart(i+1, total_distance_traveled, best.total_distance):
             count_no_improve = 0
-            print(f"After 10 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 30 and not seconds_30 and prints:
-            seconds_30 = True
-            print(f"After 30 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 60 and not seconds_60 and prints:
-            seconds_60 = True
-            print(f"After 60 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 300 and not seconds_300 and prints:
-            seconds_300 = True
-            print()
-            print(f"After 300 seconds(5 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 1800 and not seconds_1800 and prints:
-            seconds_1800 = True
-            print()
-            print(f"After 1800 seconds(30 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if i%t == t-1 and seconds_60 and prints:
-            print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the best solution found has total distance: {best_total_distance}")
-
-    return best_total_distance, best_cluster_orders, best_customer_orders
 
-#Method that applies the Multi-Start Variable Neigbourhood Search:
-def ITER_VNS(n_iter:int, Q: int, distances: list[list], clusters: list[list], best_total_distance:int, best_cluster_orders: list[list], best_customer_orders: dict[list], demands:list):
-    cluster_orders = copy_lists_of_lists(best_cluster_orders) 
-    customer_orders = copy_dictionary(best_customer_orders)
-    start_time = perf_counter()
-    seconds_1 = False
-    seconds_10 = False
-    seconds_30 = False
-    seconds_60 = False
-    seconds_300 = False
-    seconds_1800 = False
+    progress.finished(best.total_distance)
+    if checkpoint is not None:
+        checkpoint.flush()
+    #Inside ITER_VNS the moves are reported by ITER_VNS
+    if stats is not None and multi_start:
+        stats.finish("MS_VNS")
+    #A phase stopped before its first iteration saves no state, the next run starts it from the solution it is given then
+    if snapshot is not None and started:
+        if budget is not None and budget.exhausted():
+            snapshot.update(state)
+        else:
+            snapshot.update({"phase": "MS_VNS", "done": True, "best": best, "pool": None if pool is None else pool.elites.copy(), "clusters": clusters, "demands": demands})
+        snapshot.flush()
+
+    return best.total_distance, best.cluster_orders(), best.customer_orders()
+
+#Method that stores the read-only instance data in a worker process of the parallel Multi-Start
+def init_worker(worker_k: int, worker_Q: int, distances: list[list], clusters: list[list], demands: list, first: bool = False, near: dict = None, budget: Budget = None, profile: bool = False, adaptive: bool = False, construction: str = "random"):
+    worker_data["k"] = worker_k
+    worker_data["Q"] = worker_Q
+    worker_data["distances"] = distances
+    worker_data["clusters"] = clusters
+    worker_data["demands"] = demands
+    worker_data["first"] = first
+    worker_data["near"] = near
+    worker_data["budget"] = budget
+    worker_data["profile"] = profile
+    worker_data["construction"] = construction
+    #Every worker learns the order of the moves from its own restarts
+    worker_data["scheduler"] = MoveScheduler(MOVE_ORDER) if adaptive else None
+    #Every worker keeps the paths of the clusters over its restarts
+    worker_data["paths"] = ClusterPaths(distances, clusters)
+
+#Method that runs one restart of the Multi-Start in a worker process, the solution is only sent back if it beats the threshold
+#(as a compact Solution), and the counters of the moves are sent back when the search is profiled
+def parallel_restart(restart_seed: int, threshold: int):
+    rng = random.Random(restart_seed)
+    distances = worker_data["distances"]
+    stats = MoveStats() if worker_data["profile"] else None
+    cluster_orders, customer_orders = generate_solution(worker_data["k"], worker_data["Q"], worker_data["clusters"], worker_data["demands"], rng, worker_data["construction"], worker_data["distances"])
+    total_distance_traveled = local_search(worker_data["Q"], worker_data["demands"], distances, cluster_orders, customer_orders, worker_data["first"], worker_data["near"], worker_data["budget"], stats, worker_data["scheduler"], worker_data["paths"])
+    counts = None if stats is None else stats.counts
+    if total_distance_traveled < threshold:
+        return total_distance_traveled, Solution.strong(total_distance_traveled, cluster_orders, customer_orders), counts
+
+    return total_distance_traveled, None, counts
+
+#Method that returns the distance a restart in a worker has to beat to be sent back: the best distance, or with a pool of elites
+#the distance that gets a solution into the pool
+def threshold(best_total_distance: int, pool: ElitePool = None):
+    if pool is None:
+        return best_total_distance
+
+    return max(best_total_distance, pool.threshold())
+
+#Method that applies the Multi-Start Variable Neigbourhood Search with the restarts spread over a pool of worker processes
+def parallel_MS_VNS(n_iter: int, k: int, Q: int, distances: list[list], clusters: list[list], demands: list, workers: int, seed: int = None, strategy: str = "best", near: dict = None, budget: Budget = None, checkpoint: Checkpoint = None, rng: random.Random = random, stats: MoveStats = None, scheduler: MoveScheduler = None, construction: str = "random", pool: ElitePool = None, events = None):
+    first = search_strategy(strategy)
     m = max(n_iter // 10, 1)
+    t = max(n_iter // 100, 1)
+    progress = Progress("MS_VNS", events, t, status=None if pool is None else pool.status)
+    seeds = random.Random(seed)
+    #Restarts already in flight can not be taken back, so no more of them are submitted than the budget allows
+    if budget is not None and budget.remaining_iterations() is not None:
+        n_iter = min(n_iter, budget.remaining_iterations())
+
+    cluster_orders, customer_orders = generate_solution(k, Q, clusters, demands, rng, construction, distances)
+    best = Solution.strong(total_distance(distances, cluster_orders, customer_orders), cluster_orders, customer_orders)
+    count_no_improve = 0
+    submitted = 0
+    i = 0
+
+    #The workers map one shared copy of a large distance matrix instead of each getting their own
+    with SharedDistances(distances) as shared, ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(k, Q, shared, clusters, demands, first, near, budget, stats is not None, scheduler is not None, construction)) as executor:
+        #Two restarts per worker are kept in flight so that no worker waits for the coordinator
+        pending = set()
+        while submitted < n_iter and len(pending) < 2*workers and not (budget is not None and budget.exhausted()):
+            pending.add(executor.submit(parallel_restart, seeds.getrandbits(64), threshold(best.total_distance, pool)))
+            submitted += 1
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                total_distance_traveled, solution, counts = future.result()
+                if counts is not None:
+                    stats.merge(counts)
+                if pool is not None and solution is not None:
+                    pool.offer_solution(solution)
+                #The solution sent back is already a compact copy and is kept as it is
+                if solution is not None and total_distance_traveled < best.total_distance:
+                    best = solution
+                    count_no_improve = 0
+                    progress.improvement(i+1, best.total_distance)
+                else:
+                    count_no_improve += 1
+
+                if 10 in progress.restart(i+1, total_distance_traveled, best.total_distance):
+                    count_no_improve = 0
+
+                if budget is not None:
+                    budget.spend()
+                if checkpoint is not None:
+                    checkpoint.update(best)
+                if stats is not None:
+                    stats.tick("MS_VNS")
+                i += 1
+
+            if budget is not None and budget.exhausted():
+                progress.budget(i, best.total_distance)
+                for future in pending:
+                    future.cancel()
+                break
 
-    for i in range(nr_iterations):
-        
-        perturbation(cluster_orders, customer_orders, demands)
-        total_distance_traveled, cluster_orders, customer_orders = MS_VNS(1, Q, distances, clusters, demands, cluster_orders, customer_orders)
-        
-        if total_distance_traveled < best_total_distance:
-            best_total_distance = total_distance(distances, cluster_orders, customer_orders)
-            best_cluster_orders = copy_lists_of_lists(cluster_orders)
-            best_customer_orders = copy_dictionary(customer_orders) 
-            if seconds_30:
-                print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the NEW best solution found has total distance: {best_total_distance}")
-
-        if perf_counter() - start_time > 1 and not seconds_1:
-            seconds_1 = True
-            print(f"After 1 second, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 10 and not seconds_10:
-            seconds_10 = True
-            print(f"After 10 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 30 and not seconds_30:
-            seconds_30 = True
-            print(f"After 30 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 60 and not seconds_60:
-            seconds_60 = True
-            print(f"After 60 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 300 and not seconds_300:
-            seconds_300 = True
-            print()
-            print(f"After 300 seconds(5 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 1800 and not seconds_1800:
-            seconds_1800 = True
-            print()
-            print(f"After 1800 seconds(30 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if i%m == m-1 and seconds_60:
-            print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the best solution found has total distance: {best_total_distance}")
-
-    return best_total_distance, best_cluster_orders, best_customer_orders
-
-
-if __name__ == "__main__":
+            if count_no_improve >= m and progress.passed(10):
+                progress.stagnation(i, best.total_distance, m)
+                for future in pending:
+                    future.cancel()
+                break
 
-    #Update the name of the file to switch to a different instance
-    filename = "D.gvrp"
-    #Read the input from the file
-    n, k, r, Q, points, clusters, demands = read_input(filename)
-    distances = distance_matrix(n, points)
+            while submitted < n_iter and len(pending) < 2*workers and not (budget is not None and budget.exhausted()):
+                pending.add(executor.submit(parallel_restart, seeds.getrandbits(64), threshold(best.total_distance, pool)))
+                submitted += 1
 
-    #Printing the input(for potential verification purposes)   
-    #print_input(n, k, r, Q, points, clusters, demands)
+    progress.finished(best.total_distance)
+    if checkpoint is not None:
+        checkpoint.flush()
+    if stats is not None:
+        stats.finish("MS_VNS")
 
-    #The number of iterations can be updated here
-    nr_iterations = 10000
+    return best.total_distance, best.cluster_orders(), best.customer_orders()
 
-    start_time = perf_counter()
-    best_total_distance, best_cluster_orders, best_customer_orders = MS_VNS(nr_iterations, Q, distances, clusters, demands, None, None)
-    best_at_first = best_total_distance
+#Method that applies the Multi-Start Variable Neigbourhood Search:
+def ITER_VNS(n_iter: int, k: int, Q: int, distances: list[list], clusters: list[list], best_total_distance:int, best_cluster_orders: list[list], best_customer_orders: dict[list], demands:list, strategy: str = "best", near: dict = None, budget: Budget = None, checkpoint: Checkpoint = None, snapshot: Snapshot = None, rng: random.Random = random, stats: MoveStats = None, scheduler: MoveScheduler = None, paths: ClusterPaths = None, pool: ElitePool = None, events = None):
+    first = search_strategy(strategy)
+    #The paths of the clusters are kept for the whole search
+    if paths is None:
+        paths = ClusterPaths(distances, clusters)
+    #The best solution is kept as a compact copy, the iterations change new lists restored from it
+    best = Solution.strong(best_total_distance, best_cluster_orders, best_customer_orders)
+    cluster_orders, customer_orders = best.cluster_orders(), best.customer_orders()
+    total_distance_traveled = best.total_distance
+    m = max(n_iter // 10, 1)
+    progress = Progress("ITER_VNS", events, m, status=None if pool is None else pool.status)
+    state = snapshot.load("ITER_VNS", clusters, demands) if snapshot is not None else None
+    started = state is not None
+    interrupted = False
+    start_iteration = 0
+
+    if state is not None:
+        best = saved_solution(state, "best", distances)
+        if state["done"]:
+            return best.total_distance, best.cluster_orders(), best.customer_orders()
+        current = saved_solution(state, "current", distances)
+        cluster_orders, customer_orders = current.cluster_orders(), current.customer_orders()
+        total_distance_traveled = current.total_distance
+        if pool is not None:
+            pool.elites = list(state.get("pool") or [])
+        rng.setstate(state["random_state"])
+        start_iteration = state["iteration"]
+        progress = Progress("ITER_VNS", events, m, state["milestones"], state["elapsed"], start_iteration, None if pool is None else pool.status)
+
+    for i in range(start_iteration, n_iter):
+        #The state is taken at the start of an iteration, an iteration cut short by the deadline is done again on resuming
+        if snapshot is not None and not interrupted:
+            state = {"phase": "ITER_VNS", "done": False, "iteration": i, "current": Solution.strong(total_distance_traveled, cluster_orders, customer_orders),
+                     "pool": None if pool is None else pool.elites.copy(), "best": best, "milestones": progress.reached,
+                     "elapsed": progress.seconds(), "random_state": rng.getstate(), "clusters": clusters, "demands": demands}
+        if budget is not None and budget.exhausted():
+            progress.budget(i, best.total_distance)
+            break
+        started = True
+        if snapshot is not None:
+            snapshot.update(state)
+        
+        #With a pool of elites every iteration starts from one of them, else from the solution of the last iteration
+        if pool is not None and len(pool) > 0:
+            _, cluster_orders, customer_orders = pool.choose(rng)
+        perturbation(Q, cluster_orders, customer_orders, demands, rng)
+        #The perturbed solution is improved in place, the local search only makes it shorter
+        total_distance_traveled = local_search(Q, demands, distances, cluster_orders, customer_orders, first, near, budget, stats, scheduler, paths)
+        if budget is not None:
+            budget.spend()
+        interrupted = budget is not None and budget.expired()
+        if pool is not None and not interrupted:
+            pool.offer(total_distance_traveled, cluster_orders, customer_orders)
+        
+        if total_distance_traveled < best.total_distance:
+            best = Solution.strong(total_distance_traveled, cluster_orders, customer_orders)
+            progress.improvement(i+1, best.total_distance)
+
+        if checkpoint is not None:
+            checkpoint.update(best)
+        if stats is not None:
+            stats.tick("ITER_VNS")
+
+        progress.restart(i+1, total_distance_traveled, best.total_distance)
+
+    progress.finished(best.total_distance)
+    if checkpoint is not None:
+        checkpoint.flush()
+    if stats is not None:
+        stats.finish("ITER_VNS")
+    #A phase stopped before its first iteration saves no state, the next run starts it from the solution it is given then
+    if snapshot is not None and started:
+        if budget is not None and budget.exhausted():
+            snapshot.update(state)
+        else:
+            snapshot.update({"phase": "ITER_VNS", "done": True, "best": best, "clusters": clusters, "demands": demands})
+        snapshot.flush()
 
-    nr_iterations //= 10
-    best_total_distance, best_cluster_orders, best_customer_orders = ITER_VNS(nr_iterations, Q, distances, clusters, best_total_distance, best_cluster_orders, best_customer_orders, demands)
-    end_time = perf_counter()
-    time = end_time - start_time
+    return best.total_distance, best.cluster_orders(), best.customer_orders()
 
-    #Print the best solution found at the end of the algorithm
-    printSolution(filename, time, nr_iterations, best_at_first, best_total_distance,  best_cluster_orders, best_customer_orders, demands)
 
-    #Update the file containing the best distances found so far
-    update_best_solution(filename, best_total_distance)
+if __name__ == "__main__":
 
-    #Update the solution written down into a file if it is better
-    write_solution(filename, best_total_distance, best_cluster_orders, best_customer_orders)
\ No newline at end of file
+    #The instance, the time limit, the seed and the other settings are given on the command line,
+    #e.g. python CluVRPStrongV2.py D.gvrp --time-limit 60 --seed 1 (see CluVRPSolve.py for all the options)
+    from CluVRPSolve import main
+    main(variant="strong")
\ No newline at end of file
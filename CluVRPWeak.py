@@ -1,7 +1,17 @@
-from math import sqrt
-from random import shuffle, choice
 from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import os.path
+import random
+
+from CluVRPDistances import distance_matrix, distance_provider, SharedDistances
+from CluVRPInstance import parse_instance
+from CluVRPCandidates import candidate_lists, cluster_positions, swap_candidates, segment_candidates, exchange_candidates, target_candidates
+from CluVRPBudget import Budget, Checkpoint, CHECKPOINT_INTERVAL, saved_distance, write_atomic, flush_on_signals
+from CluVRPStats import MoveStats
+from CluVRPScheduler import MoveScheduler
+from CluVRPSolution import Solution
+from CluVRPConstruct import pack_clusters, nearest_path
+from CluVRPEvents import Progress
 
 # ----------------------- Description of the program: --------------------------------- #
 # This program solves the Vehicle Routing problem with Weak Cluster constraints
@@ -13,41 +23,10 @@ import os.path
 
 # -------------------- Reading/Printing/Writing  Input/Output Methods ----------------- #
 
-#Method that reads the input from the file:
+#Method that reads the input from the file (see CluVRPInstance for the format and the checks):
 def read_input(filename: str):
-    with open (filename) as new_file:
-        for _ in range(2):
-            next(new_file)
-        line = new_file.readline().strip().split(" ")
-        n = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        k = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        r = int(line[-1])
-        line = new_file.readline().strip().split(" ")
-        Q = int(line[-1])
-        for _ in range(2):
-            next(new_file)
-        points = []
-        for _ in range(n):
-            line = new_file.readline().strip().split(" ")
-            points.append((int(line[1]), int(line[2])))
-        next(new_file)
-        clusters = []
-        for _ in range(r):
-            line = new_file.readline().strip().split(" ")
-            cluster = []
-            for point in line[1:-1]:
-                #Subtract 1 to assure indexing starting at 0
-                cluster.append(int(point)-1)
-            clusters.append(cluster)
-        demands = []
-        next(new_file)
-        for _ in range(r):
-            line = new_file.readline().strip().split(" ")
-            demands.append(int(line[-1]))
-        next(new_file)
-        print("Input red!")
+    n, k, r, Q, points, clusters, demands = parse_instance(filename)
+    print("Input red!")
     return n, k, r, Q, points, clusters, demands
 
 #Method that prints the input to the screen (for potential verification purposes)
@@ -105,7 +84,8 @@ def update_best_solution(filename: str, best_total_distance: int):
             parts = line.strip().split(" ")
             best_scores[parts[0]] = int(parts[1])
 
-        if best_scores[filename[0]] > best_total_distance:
+        #An instance that is not in the file yet (e.g. a generated one) gets its own line
+        if filename[0] not in best_scores or best_scores[filename[0]] > best_total_distance:
             best_scores[filename[0]] = best_total_distance
             print("New best result found!")
 
@@ -114,48 +94,33 @@ def update_best_solution(filename: str, best_total_distance: int):
             line = instance + " " + str(distance)
             my_file.write(line+"\n")  
 
+#Method that returns the name of the file holding the best solution found for an instance (named after the whole instance,
+#e.g. A_WeakSolution.txt for A.gvrp, so instances starting with the same letter do not share it)
+def solution_file(filename: str):
+    return os.path.splitext(filename)[0] + "_WeakSolution.txt"
+
+#Method that returns the lines of the solution file for a solution
+def solution_lines(best_total_distance: int, best_cluster_orders: list[list], best_vehicle_tours: list[list]):
+    lines = [str(best_total_distance)]
+    for i in range(len(best_cluster_orders)):
+        lines.append(' '.join([str(n+1) for n in best_cluster_orders[i]]))
+        lines.append(' '.join([str(n+1) for n in best_vehicle_tours[i]]))
+
+    return lines
+
+#Method that returns the lines of the solution file for a solution kept as a Solution (the checkpoints of the search)
+def checkpoint_lines(solution: Solution):
+    return solution_lines(solution.total_distance, solution.cluster_orders(), solution.vehicle_tours())
+
 #Method that writes out the solution to a file
 def write_solution(filename: str, best_total_distance: int, best_cluster_orders: list[list], best_vehicle_tours: list[list]):
-    if not os.path.isfile(filename[0] + "_WeakSolution.txt"):
-        with open(filename[0] + "_WeakSolution.txt", "w") as new_file:
-            line = str(best_total_distance)
-            new_file.write(line+"\n")
-            for i in range(len(best_cluster_orders)):
-                line = ""
-                line += ' '.join([str(n+1) for n in best_cluster_orders[i]])
-                new_file.write(line+"\n")
-                line = ""
-                line += ' '.join([str(n+1) for n in best_vehicle_tours[i]])
-                new_file.write(line+"\n")
-        
-    else:
-        with open(filename[0] + "_WeakSolution.txt", "r") as my_file:
-            line = my_file.readline().strip()
-            past_distance = int(line)
-
-        if best_total_distance < past_distance:
-            with open(filename[0] + "_WeakSolution.txt", "w") as new_file:
-                line = str(best_total_distance)
-                new_file.write(line+"\n")
-                for i in range(len(best_cluster_orders)):
-                    line = ""
-                    line += ' '.join([str(n+1) for n in best_cluster_orders[i]])
-                    new_file.write(line+"\n")
-                    line = ""
-                    line += ' '.join([str(n+1) for n in best_vehicle_tours[i]])
-                    new_file.write(line+"\n") 
+    past_distance = saved_distance(solution_file(filename))
+    if past_distance is None or best_total_distance < past_distance:
+        write_atomic(solution_file(filename), solution_lines(best_total_distance, best_cluster_orders, best_vehicle_tours))
 
 
 # -------------------- Methods that construct the initial solution -------------------- #
 
-#Method that computes the distances between the points and returns them in adjancencency matrix form:
-def distance_matrix(n: int, points: list[tuple]):
-    distance_matrix = [[0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            distance_matrix[i][j] = round(sqrt((points[i][0] - points[j][0]) **2 + (points[i][1] - points[j][1]) **2))
-    return distance_matrix
-    
 #Method that computes the current sum of demands for a list of clusters
 def sum_demands(cluster_list:list, demands:list):
     sum = 0
@@ -175,56 +140,18 @@ def total_distance(distances: list[list], vehicle_tours: list[list]):
 
     return total_distance
 
-#Method that performs a first-fit heuristic for a bin packing problem, until exactly k bins are used 
-def first_fit(k: int, Q: int, demands: list):
-    copy_demands = demands.copy()
-    shuffle(copy_demands)
-    bins = []
-
-    while len(bins) != k:
-        bins = []
-        shuffle(copy_demands)
-        bins.append([])
-        for number in copy_demands:
-            added = False
-            for bin in bins:
-                if sum(bin) + number <= Q:
-                    bin.append(number)
-                    added = True
-                    break
-            if not added:
-                new_bin = []
-                new_bin.append(number)
-                bins.append(new_bin)
-
-    return bins
-
-#Method that uses the bin allocation from above to create an initial allocation of clusters to vehicle tours
-def clusters_to_vehicles(k: int, Q: int, demands: list):
-    bins = first_fit(k, Q, demands)
-    vehicles = []
-    copy_demands = demands.copy()
-
-    for bin in bins:
-        vehicle = []
-        for number in bin:
-            indexes = []
-            for i in range(len(copy_demands)):
-                if copy_demands[i] == number:
-                    indexes.append(i)
-            index = choice(indexes)
-            copy_demands[index] = -1
-            vehicle.append(index)
-        vehicles.append(vehicle)
-
+#Method that creates an initial allocation of clusters to vehicle tours, packed into exactly k vehicles (see CluVRPConstruct)
+def clusters_to_vehicles(k: int, Q: int, demands: list, rng: random.Random = random):
+    vehicles = pack_clusters(k, Q, demands, rng)
     for vehicle in vehicles:
-        shuffle(vehicle)
+        rng.shuffle(vehicle)
 
-    return vehicles  
-        
-#Method that generates the initial solution
-def generate_solution(clusters: list[list], demands: list):
-    cluster_orders = clusters_to_vehicles(k, Q, demands)
+    return vehicles
+
+#Method that generates the initial solution, rng is the random number generator of the search (the random module by default),
+#with the greedy construction the vehicles visit what they have left in a nearest neighbour order (distances must be given)
+def generate_solution(k: int, Q: int, clusters: list[list], demands: list, rng: random.Random = random, construction: str = "random", distances: list[list] = None):
+    cluster_orders = clusters_to_vehicles(k, Q, demands, rng)
 
     vehicle_tours = []
     for vehicle in cluster_orders:
@@ -232,7 +159,9 @@ def generate_solution(clusters: list[list], demands: list):
         for cluster in vehicle:
             for customer in clusters[cluster]:
                 vehicle_tour.append(customer)
-        shuffle(vehicle_tour)
+        rng.shuffle(vehicle_tour)
+        if construction == "greedy":
+            vehicle_tour = nearest_path(distances, 0, vehicle_tour)
         vehicle_tours.append(vehicle_tour)
 
 
@@ -241,130 +170,156 @@ def generate_solution(clusters: list[list], demands: list):
 # ------------------- Methods that implement the moves of the VNS --------------------- #
 
 #Method that implements move 1
-def move1(distances: list[list], vehicle_tours: list[list]):
+def move1(distances: list[list], vehicle_tours: list[list], first: bool = False, near: dict = None, stats: MoveStats = None):
+    near_customers = None if near is None else near["customers"]
     for vehicle in vehicle_tours:
-        best_distance = total_distance(distances, vehicle_tours)
+        path = [0] + vehicle + [0]
+        best_delta = 0
         index1 = 0
         index2 = 0
-        for i in range(len(vehicle)):
-            for j in range(len(vehicle)):
-                swap_in_list(vehicle, i, j)
-                if total_distance(distances, vehicle_tours) < best_distance:
-                    best_distance = total_distance(distances, vehicle_tours)
-                    index1 = i
-                    index2 = j
-                swap_in_list(vehicle, i, j)
+        candidates = swap_candidates(vehicle, near_customers)
+        if stats is not None:
+            candidates = stats.counted("move1", candidates)
+        for i, j in candidates:
+            delta = swap_delta(distances, path, path, i, j)
+            if delta < best_delta:
+                best_delta = delta
+                index1 = i
+                index2 = j
+                if first:
+                    break
 
         swap_in_list(vehicle, index1, index2)
                 
 #Method that implements move 2
-def move2(distances: list[list], vehicle_tours: list[list]):
+def move2(distances: list[list], vehicle_tours: list[list], first: bool = False, near: dict = None, stats: MoveStats = None):
+    near_customers = None if near is None else near["customers"]
     for vehicle in vehicle_tours:
-        best_distance = total_distance(distances, vehicle_tours)
+        path = [0] + vehicle + [0]
+        best_delta = 0
         index1 = 0
         index2 = 0
         length = 1
-        for i in range(len(vehicle)):
-            for j in range(len(vehicle)):
-                for k in range(1, len(vehicle)+1):
-                    if max(i + k, j + k) <= len(vehicle):
-                        move_in_list(vehicle, i, j, k)
-                        if total_distance(distances, vehicle_tours) < best_distance:
-                            best_distance = total_distance(distances, vehicle_tours)
-                            index1 = i
-                            index2 = j
-                            length = k
-                        move_in_list(vehicle, j, i, k)
+        candidates = segment_candidates(vehicle, near_customers)
+        if stats is not None:
+            candidates = stats.counted("move2", candidates)
+        for i, j, k in candidates:
+            delta = move_delta(distances, path, path, i, j, k)
+            if delta < best_delta:
+                best_delta = delta
+                index1 = i
+                index2 = j
+                length = k
+                if first:
+                    break
 
         move_in_list(vehicle, index1, index2, length)
 
 #Method that implements move 3
-def move3(Q: int, demands: list, distances: list[list], clusters: list[list], cluster_orders: list[list], vehicle_tours: list[list]):
-    best_distance = total_distance(distances, vehicle_tours)
+def move3(Q: int, demands: list, distances: list[list], clusters: list[list], cluster_orders: list[list], vehicle_tours: list[list], first: bool = False, near: dict = None, stats: MoveStats = None):
+    position_of = tour_positions(vehicle_tours)
+    near_clusters = None if near is None else near["clusters"]
+    positions = None if near is None else cluster_positions(cluster_orders)
+    best_delta = 0
     old_vehicle = 0
     new_vehicle = 0
     position_cluster = 0
     position_customer = 0
     length = 1
     improvement = False
-
-    for i in range(len(cluster_orders)):
-        for j in range(len(cluster_orders)):
-            if i != j:
-                for k in range(len(cluster_orders[i])):
-                    for m in range(1, len(cluster_orders[i])):
-                        if m + k < len(cluster_orders[i]): 
-                            sum = sum_demands(cluster_orders[j], demands)
-                            for t in range(m):
-                                sum += demands[cluster_orders[i][k+t]]
-                            if sum <= Q:
-                                for l in range(len(vehicle_tours[j])+1):
-                                    copy_vehicle_tours = copy_lists_of_lists(vehicle_tours)
-                                    aux_list = []
-                                    for t in range(m):
-                                        temp = remove_from_list(copy_vehicle_tours[i], clusters[cluster_orders[i][k+t]])
-                                        for item in temp:
-                                            aux_list.append(item)
-                                    insert_list_in_list(copy_vehicle_tours[j], aux_list, l)
-                                    if total_distance(distances, copy_vehicle_tours) < best_distance:
-                                        best_distance = total_distance(distances, copy_vehicle_tours)
-                                        old_vehicle = i
-                                        new_vehicle = j
-                                        position_cluster = k
-                                        position_customer = l
-                                        length = m
-                                        improvement = True
+    #The customers taken out of tour i only depend on (i, k, m), so they are split off once for every target tour j
+    blocks = {}
+
+    candidates = target_candidates(cluster_orders, near_clusters, positions)
+    if stats is not None:
+        candidates = stats.counted("move3", candidates)
+    for i, j, k in candidates:
+        for m in range(1, len(cluster_orders[i])):
+            if m + k < len(cluster_orders[i]): 
+                sum = sum_demands(cluster_orders[j], demands)
+                for t in range(m):
+                    sum += demands[cluster_orders[i][k+t]]
+                if sum <= Q:
+                    if (i, k, m) not in blocks:
+                        block, removed = cluster_block(cluster_orders[i][k:k+m], clusters, position_of)
+                        blocks[(i, k, m)] = (block, removed, removal_delta(distances, vehicle_tours[i], removed), path_distance(distances, block))
+                    block, removed, removal, internal = blocks[(i, k, m)]
+                    vehicle_tour = vehicle_tours[j]
+                    for l in range(len(vehicle_tour)+1):
+                        delta = removal + internal + insertion_delta(distances, vehicle_tour, l, block[0], block[-1])
+                        if delta < best_delta:
+                            best_delta = delta
+                            old_vehicle = i
+                            new_vehicle = j
+                            position_cluster = k
+                            position_customer = l
+                            length = m
+                            improvement = True
+                            if first:
+                                break
+            if first and improvement:
+                break
+        if first and improvement:
+            break
                                         
     if improvement:
-        aux_list = []
-        for t in range(length):
-            temp = remove_from_list(vehicle_tours[old_vehicle], clusters[cluster_orders[old_vehicle][position_cluster+t]])
-            for item in temp:
-                aux_list.append(item)
-        insert_list_in_list(vehicle_tours[new_vehicle], aux_list, position_customer)
+        block, removed = blocks[(old_vehicle, position_cluster, length)][:2]
+        vehicle_tours[old_vehicle][:] = tour_without(vehicle_tours[old_vehicle], removed)
+        insert_list_in_list(vehicle_tours[new_vehicle], block, position_customer)
         move_between_lists(cluster_orders[old_vehicle], cluster_orders[new_vehicle], position_cluster, 0, length)
 
 #Method that implements move 4
-def move4(Q: int, demands: list, distances: list[list], clusters: list[list], cluster_orders: list[list], vehicle_tours: list[list]):
+def move4(Q: int, demands: list, distances: list[list], clusters: list[list], cluster_orders: list[list], vehicle_tours: list[list], first: bool = False, near: dict = None, stats: MoveStats = None):
+    position_of = tour_positions(vehicle_tours)
+    near_clusters = None if near is None else near["clusters"]
+    positions = None if near is None else cluster_positions(cluster_orders)
     vehicle1 = 0
     vehicle2 = 0
     cluster_index1 = 0
     cluster_index2 = 0
     tour_index1 = 0
     tour_index2 = 0
-    best_distance = total_distance(distances, vehicle_tours)
+    best_delta = 0
     improvement = False
-
-    for i in range(len(cluster_orders)):
-        for j in range(len(cluster_orders)):
-            if i != j:
-                for k in range(len(cluster_orders[i])):
-                    for l in range(len(cluster_orders[j])):
-                        sum1 = sum_demands(cluster_orders[i], demands) - demands[cluster_orders[i][k]] + demands[cluster_orders[j][l]]
-                        sum2 = sum_demands(cluster_orders[j], demands) - demands[cluster_orders[j][l]] + demands[cluster_orders[i][k]]
-                        if sum1 <= Q and sum2 <= Q:
-                            for i1 in range(len(vehicle_tours[i])+1):
-                                for j1 in range(len(vehicle_tours[j])+1):
-                                    copy_vehicle_tours = copy_lists_of_lists(vehicle_tours)
-                                    aux_list1 = remove_from_list(copy_vehicle_tours[i], clusters[cluster_orders[i][k]])
-                                    aux_list2 = remove_from_list(copy_vehicle_tours[j], clusters[cluster_orders[j][l]])
-                                    insert_list_in_list(copy_vehicle_tours[i], aux_list2, i1)
-                                    insert_list_in_list(copy_vehicle_tours[j], aux_list1, j1)
-                                    if total_distance(distances, copy_vehicle_tours) < best_distance:
-                                        best_distance = total_distance(distances, copy_vehicle_tours)
-                                        vehicle1 = i
-                                        vehicle2 = j
-                                        cluster_index1 = k
-                                        cluster_index2 = l
-                                        tour_index1 = i1
-                                        tour_index2 = j1
-                                        improvement = True
+    #For every (vehicle, cluster index): the cluster's customers, the tour without them and the change in distance of taking them out
+    parts = {}
+
+    candidates = exchange_candidates(cluster_orders, near_clusters, positions)
+    if stats is not None:
+        candidates = stats.counted("move4", candidates)
+    for i, j, k, l in candidates:
+        sum1 = sum_demands(cluster_orders[i], demands) - demands[cluster_orders[i][k]] + demands[cluster_orders[j][l]]
+        sum2 = sum_demands(cluster_orders[j], demands) - demands[cluster_orders[j][l]] + demands[cluster_orders[i][k]]
+        if sum1 <= Q and sum2 <= Q:
+            for vehicle, index in ((i, k), (j, l)):
+                if (vehicle, index) not in parts:
+                    block, removed = cluster_block([cluster_orders[vehicle][index]], clusters, position_of)
+                    parts[(vehicle, index)] = (block, tour_without(vehicle_tours[vehicle], removed), removal_delta(distances, vehicle_tours[vehicle], removed))
+            block1, rest1, removal1 = parts[(i, k)]
+            block2, rest2, removal2 = parts[(j, l)]
+            #The two insertions are independent, so the best (i1, j1) pair is made of the best i1 and the best j1
+            insertion1, i1 = best_insertion(distances, rest1, block2, len(vehicle_tours[i])+1)
+            insertion2, j1 = best_insertion(distances, rest2, block1, len(vehicle_tours[j])+1)
+            delta = removal1 + removal2 + insertion1 + insertion2
+            if delta < best_delta:
+                best_delta = delta
+                vehicle1 = i
+                vehicle2 = j
+                cluster_index1 = k
+                cluster_index2 = l
+                tour_index1 = i1
+                tour_index2 = j1
+                improvement = True
+                if first:
+                    break
 
     if improvement:
-        aux_list1 = remove_from_list(vehicle_tours[vehicle1], clusters[cluster_orders[vehicle1][cluster_index1]])
-        aux_list2 = remove_from_list(vehicle_tours[vehicle2], clusters[cluster_orders[vehicle2][cluster_index2]])
-        insert_list_in_list(vehicle_tours[vehicle1], aux_list2, tour_index1)
-        insert_list_in_list(vehicle_tours[vehicle2], aux_list1, tour_index2)
+        block1, rest1 = parts[(vehicle1, cluster_index1)][:2]
+        block2, rest2 = parts[(vehicle2, cluster_index2)][:2]
+        vehicle_tours[vehicle1][:] = rest1
+        vehicle_tours[vehicle2][:] = rest2
+        insert_list_in_list(vehicle_tours[vehicle1], block2, tour_index1)
+        insert_list_in_list(vehicle_tours[vehicle2], block1, tour_index2)
         swap_between_lists(cluster_orders[vehicle1], cluster_orders[vehicle2], cluster_index1, cluster_index2)
 
 
@@ -402,175 +357,380 @@ def move_between_lists(list1: list, list2: list, index1: int, index2: int, t: in
     for i in range(t):
         list2.insert(index2, temp[i])
 
-#method that the removes the the elements of a list that are contained in another list and returns them
-def remove_from_list(list1: list, list2: list):
-    new_list = []
-    for item in list1:
-        if item in list2:
-            new_list.append(item)
-    for item in new_list:
-        list1.remove(item)
+#Method that inserts a list of items into a larger list at a specific instance, past the end of the larger list
+#the items are appended in the order of appended_order (list2 itself is left as it is)
+def insert_list_in_list(list1: list, list2: list, index: int):
+    if index > len(list1):
+        list1 += appended_order(list2, index - len(list1))
+    else:
+        list1[index:index] = list2
+
+#Method that computes the change in distance caused by swap_in_list(list, index1, index2), 
+#where the path is given by the entry (firsts) and exit (lasts) customers of its items, bounded by the previous and next customer
+def swap_delta(distances: list[list], firsts: list, lasts: list, index1: int, index2: int):
+    if index1 == index2:
+        return 0
+    a = min(index1, index2) + 1
+    b = max(index1, index2) + 1
+    if b == a + 1:
+        old = distances[lasts[a-1]][firsts[a]] + distances[lasts[a]][firsts[b]] + distances[lasts[b]][firsts[b+1]]
+        new = distances[lasts[a-1]][firsts[b]] + distances[lasts[b]][firsts[a]] + distances[lasts[a]][firsts[b+1]]
+    else:
+        old = (distances[lasts[a-1]][firsts[a]] + distances[lasts[a]][firsts[a+1]]
+               + distances[lasts[b-1]][firsts[b]] + distances[lasts[b]][firsts[b+1]])
+        new = (distances[lasts[a-1]][firsts[b]] + distances[lasts[b]][firsts[a+1]]
+               + distances[lasts[b-1]][firsts[a]] + distances[lasts[a]][firsts[b+1]])
+
+    return new - old
+
+#Method that computes the change in distance caused by move_in_list(list, index1, index2, t), on a path given as for swap_delta
+def move_delta(distances: list[list], firsts: list, lasts: list, index1: int, index2: int, t: int):
+    if index1 == index2:
+        return 0
+    before = index1
+    first = index1 + 1
+    last = index1 + t
+    after = index1 + t + 1
+    #Neighbours of the insertion point once the t items have been taken out
+    x = index2 if index2 <= index1 else index2 + t
+    y = index2 + 1 if index2 < index1 else index2 + t + 1
+
+    return (distances[lasts[before]][firsts[after]] - distances[lasts[before]][firsts[first]] - distances[lasts[last]][firsts[after]]
+            + distances[lasts[x]][firsts[first]] + distances[lasts[last]][firsts[y]] - distances[lasts[x]][firsts[y]])
+
+#Method that returns for every customer (by index, the depot is None) the vehicle whose tour visits it and its position in that tour,
+#valid until the tours change
+def tour_positions(vehicle_tours: list[list]):
+    position_of = [None] * (sum(len(vehicle_tour) for vehicle_tour in vehicle_tours) + 1)
+    for vehicle in range(len(vehicle_tours)):
+        vehicle_tour = vehicle_tours[vehicle]
+        for position in range(len(vehicle_tour)):
+            position_of[vehicle_tour[position]] = (vehicle, position)
+
+    return position_of
+
+#Method that returns the customers of the given clusters of a tour (cluster by cluster, each in the order of the tour) and their
+#positions in the tour in increasing order, in time linear in the number of these customers rather than in the length of the tour
+def cluster_block(cluster_list: list, clusters: list[list], position_of: list):
+    block = []
+    for cluster in cluster_list:
+        block += sorted(clusters[cluster], key=lambda customer: position_of[customer][1])
+
+    return block, sorted(position_of[customer][1] for customer in block)
+
+#Method that returns a tour without the customers at the given positions (in increasing order), as a new list
+def tour_without(vehicle_tour: list, positions: list):
+    rest = []
+    previous = 0
+    for position in positions:
+        rest += vehicle_tour[previous:position]
+        previous = position + 1
+    rest += vehicle_tour[previous:]
+
+    return rest
+
+#Method that computes the change in distance of taking the customers at the given positions (in increasing order) out of a tour,
+#every run of consecutive positions is replaced by the edge between its neighbours
+def removal_delta(distances: list[list], vehicle_tour: list, positions: list):
+    delta = 0
+    start = 0
+    for index in range(len(positions)):
+        if index + 1 < len(positions) and positions[index+1] == positions[index] + 1:
+            continue
+        first = positions[start]
+        last = positions[index]
+        previous = vehicle_tour[first-1] if first > 0 else 0
+        following = vehicle_tour[last+1] if last + 1 < len(vehicle_tour) else 0
+        delta += (distances[previous][following] - distances[previous][vehicle_tour[first]]
+                  - path_distance(distances, vehicle_tour[first:last+1]) - distances[vehicle_tour[last]][following])
+        start = index + 1
+
+    return delta
+
+#Method that computes the distance of a path without returning to the depot
+def path_distance(distances: list[list], path: list):
+    distance = 0
+    for i in range(len(path)-1):
+        distance += distances[path[i]][path[i+1]]
+
+    return distance
+
+#Method that computes the distance of a single vehicle tour (0 for an empty tour)
+def tour_distance(distances: list[list], vehicle_tour: list):
+    if len(vehicle_tour) == 0:
+        return 0
+
+    return distances[0][vehicle_tour[0]] + path_distance(distances, vehicle_tour) + distances[0][vehicle_tour[-1]]
+
+#Method that computes the change in distance of linking a path from customer first to customer last into a tour at a given position
+def insertion_delta(distances: list[list], vehicle_tour: list, index: int, first: int, last: int):
+    previous = 0
+    following = 0
+    if index > 0:
+        previous = vehicle_tour[index-1]
+    if index < len(vehicle_tour):
+        following = vehicle_tour[index]
+
+    return distances[previous][first] + distances[last][following] - distances[previous][following]
+
+#Method that returns the order insert_list_in_list leaves a list of items in, when the index is e positions past the end of the larger list
+def appended_order(items: list, e: int):
+    if e >= len(items):
+        return items[::-1]
+
+    return items[len(items)-e:][::-1] + items[:len(items)-e]
+
+#Method that finds the cheapest of the first nr_positions positions for insert_list_in_list(vehicle_tour, block, position)
+#and returns the change in distance (including the block itself) together with the first position that achieves it
+def best_insertion(distances: list[list], vehicle_tour: list, block: list, nr_positions: int):
+    internal = path_distance(distances, block)
+    best_delta = None
+    best_position = 0
+    for position in range(nr_positions):
+        if position <= len(vehicle_tour):
+            delta = internal + insertion_delta(distances, vehicle_tour, position, block[0], block[-1])
+        else:
+            order = appended_order(block, position - len(vehicle_tour))
+            delta = path_distance(distances, order) + insertion_delta(distances, vehicle_tour, len(vehicle_tour), order[0], order[-1])
+        if best_delta is None or delta < best_delta:
+            best_delta = delta
+            best_position = position
+
+    return best_delta, best_position
+
 
-    return new_list
+# ---------------------------------- Main Method -------------------------------------- #
 
-#Method that inserts a list of items into a larger list at a specific instance 
-def insert_list_in_list(list1: list, list2: list, index: int):
-    list2.reverse()
-    for item in list2:
-        list1.insert(index, item)
+#The order in which the local search applies the moves (the fixed order, and what breaks ties in the adaptive order)
+MOVE_ORDER = ["move4", "move3", "move2", "move1"]
 
-#Method that returns a copy for a list of lists
-def copy_lists_of_lists(my_list: list[list]):
-    new_list = []
-    for item in my_list:
-        temp = item.copy()
-        new_list.append(temp)
+#Method that checks the name of a search strategy and returns whether the moves use first-improvement
+def search_strategy(strategy: str):
+    if strategy not in ("best", "first"):
+        raise ValueError(f"Unknown search strategy {strategy!r}, expected 'best' or 'first'")
 
-    return new_list
+    return strategy == "first"
 
+#Read-only instance data of a worker process of the parallel Multi-Start (filled by init_worker)
+worker_data = {}
 
-# ---------------------------------- Main Method -------------------------------------- #
+#Method that applies the moves of the VNS to a solution until none of them improves it and returns its final distance,
+#the moves apply their best improving candidate, or the first one when first is set, among the candidates allowed by near,
+#the search stops between two moves once the deadline of the budget has passed, and the moves are profiled in stats if it is given,
+#with a scheduler the moves are applied in its adaptive order instead of the fixed MOVE_ORDER
+def local_search(Q: int, demands: list, distances: list[list], clusters: list[list], cluster_orders: list[list], vehicle_tours: list[list], first: bool = False, near: dict = None, budget: Budget = None, stats: MoveStats = None, scheduler: MoveScheduler = None):
+    total_distance_traveled = total_distance(distances, vehicle_tours)
+    if scheduler is not None:
+        moves = {
+            "move4": lambda: move4(Q, demands, distances, clusters, cluster_orders, vehicle_tours, first, near, stats),
+            "move3": lambda: move3(Q, demands, distances, clusters, cluster_orders, vehicle_tours, first, near, stats),
+            "move2": lambda: move2(distances, vehicle_tours, first, near, stats),
+            "move1": lambda: move1(distances, vehicle_tours, first, near, stats),
+        }
+        return scheduler.descent(moves, lambda: total_distance(distances, vehicle_tours), total_distance_traveled, budget, stats)
+
+    #The budget is checked before every move, not only before every round of the moves
+    improvement = True
+    while improvement and not (budget is not None and budget.expired()):
+        improvement = False
+
+        improve = True        
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            #The moves are only timed when they are profiled
+            if stats is not None:
+                started = perf_counter()
+            move4(Q, demands, distances, clusters, cluster_orders, vehicle_tours, first, near, stats)
+            new_distance = total_distance(distances, vehicle_tours)
+            if stats is not None:
+                stats.record("move4", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move3(Q, demands, distances, clusters, cluster_orders, vehicle_tours, first, near, stats)
+            new_distance = total_distance(distances, vehicle_tours)
+            if stats is not None:
+                stats.record("move3", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move2(distances, vehicle_tours, first, near, stats)
+            new_distance = total_distance(distances, vehicle_tours)
+            if stats is not None:
+                stats.record("move2", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+        improve = True
+        while improve and not (budget is not None and budget.expired()):
+            improve = False
+            if stats is not None:
+                started = perf_counter()
+            move1(distances, vehicle_tours, first, near, stats)
+            new_distance = total_distance(distances, vehicle_tours)
+            if stats is not None:
+                stats.record("move1", started, total_distance_traveled - new_distance)
+            if new_distance < total_distance_traveled:
+                total_distance_traveled = new_distance
+                improvement = True
+                improve = True
+
+    return total_distance_traveled
 
 #Method that applies the Multi-Start Variable Neigbourhood Search:
-def VNS(n_iter: int, Q: int, distances: list[list], clusters: list[list], demands: list):
-    start_time = perf_counter()
-    seconds_1 = False
-    seconds_10 = False
-    seconds_30 = False
-    seconds_60 = False
-    seconds_300 = False
-    seconds_1800 = False
-    m = n_iter // 10
+def VNS(n_iter: int, k: int, Q: int, distances: list[list], clusters: list[list], demands: list, strategy: str = "best", near: dict = None, budget: Budget = None, checkpoint: Checkpoint = None, rng: random.Random = random, stats: MoveStats = None, scheduler: MoveScheduler = None, construction: str = "random", events = None):
+    first = search_strategy(strategy)
+    m = max(n_iter // 10, 1)
+    progress = Progress("VNS", events, m)
     
-    cluster_orders, vehicle_tours = generate_solution(clusters, demands)
+    cluster_orders, vehicle_tours = generate_solution(k, Q, clusters, demands, rng, construction, distances)
     total_distance_traveled = total_distance(distances, vehicle_tours)
-    best_total_distance = total_distance_traveled
-    best_cluster_orders = copy_lists_of_lists(cluster_orders)
-    best_vehicle_tours = copy_lists_of_lists(vehicle_tours) 
+    #The best solution is kept as a compact copy, which is only made again when a better one is found
+    best = Solution.weak(total_distance_traveled, cluster_orders, vehicle_tours)
 
     for i in range(n_iter):
-
-        cluster_orders, vehicle_tours = generate_solution(clusters, demands)
-        total_distance_traveled = total_distance(distances, vehicle_tours)
-        
-        improvement = True
-        while improvement:
-            improvement = False
-
-            improve = True        
-            while improve:
-                improve = False
-                move4(Q, demands, distances, clusters, cluster_orders, vehicle_tours)
-                new_distance = total_distance(distances, vehicle_tours)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move3(Q, demands, distances, clusters, cluster_orders, vehicle_tours)
-                new_distance = total_distance(distances, vehicle_tours)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move2(distances, vehicle_tours)
-                new_distance = total_distance(distances, vehicle_tours)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-
-            improve = True
-            while improve:
-                improve = False
-                move1(distances, vehicle_tours)
-                new_distance = total_distance(distances, vehicle_tours)
-                if new_distance < total_distance_traveled:
-                    total_distance_traveled = new_distance
-                    improvement = True
-                    improve = True
-                
-            if total_distance_traveled < best_total_distance:
-                best_total_distance = total_distance(distances, vehicle_tours)
-                best_cluster_orders = copy_lists_of_lists(cluster_orders)
-                best_vehicle_tours = copy_lists_of_lists(vehicle_tours)
-                if seconds_30:
-                    print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the NEW best solution found has total distance: {best_total_distance}")
-
-        if perf_counter() - start_time > 1 and not seconds_1:
-            seconds_1 = True
-            print(f"After 1 second, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 10 and not seconds_10:
-            seconds_10 = True
-            print(f"After 10 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 30 and not seconds_30:
-            seconds_30 = True
-            print(f"After 30 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-
-        if perf_counter() - start_time > 60 and not seconds_60:
-            seconds_60 = True
-            print(f"After 60 seconds, {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 300 and not seconds_300:
-            seconds_300 = True
-            print()
-            print(f"After 300 seconds(5 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if perf_counter() - start_time > 1800 and not seconds_1800:
-            seconds_1800 = True
-            print()
-            print(f"After 1800 seconds(30 minutes), {i+1} iterations, best solution found has total distance:")
-            print(best_total_distance)
-            print()
-
-        if i%m == m-1 and seconds_60:
-            print(f"After {i+1} iterations, {perf_counter()-start_time:.2f} seconds, the best solution found has total distance: {best_total_distance}")
-
-    return best_total_distance, best_cluster_orders, best_vehicle_tours
+        if budget is not None and budget.exhausted():
+            progress.budget(i, best.total_distance)
+            break
+
+        cluster_orders, vehicle_tours = generate_solution(k, Q, clusters, demands, rng, construction, distances)
+        total_distance_traveled = local_search(Q, demands, distances, clusters, cluster_orders, vehicle_tours, first, near, budget, stats, scheduler)
+
+        if total_distance_traveled < best.total_distance:
+            best = Solution.weak(total_distance_traveled, cluster_orders, vehicle_tours)
+            progress.improvement(i+1, best.total_distance)
+
+        if budget is not None:
+            budget.spend()
+        if checkpoint is not None:
+            checkpoint.update(best)
+        if stats is not None:
+            stats.tick("VNS")
+
+        progress.restart(i+1, total_distance_traveled, best.total_distance)
+
+    progress.finished(best.total_distance)
+    if checkpoint is not None:
+        checkpoint.flush()
+    if stats is not None:
+        stats.finish("VNS")
+
+    return best.total_distance, best.cluster_orders(), best.vehicle_tours()
+
+
+
+#Method that stores the read-only instance data in a worker process of the parallel Multi-Start
+def init_worker(worker_k: int, worker_Q: int, distances: list[list], clusters: list[list], demands: list, first: bool = False, near: dict = None, budget: Budget = None, profile: bool = False, adaptive: bool = False, construction: str = "random"):
+    worker_data["k"] = worker_k
+    worker_data["Q"] = worker_Q
+    worker_data["distances"] = distances
+    worker_data["clusters"] = clusters
+    worker_data["demands"] = demands
+    worker_data["first"] = first
+    worker_data["near"] = near
+    worker_data["budget"] = budget
+    worker_data["profile"] = profile
+    worker_data["construction"] = construction
+    #Every worker learns the order of the moves from its own restarts
+    worker_data["scheduler"] = MoveScheduler(MOVE_ORDER) if adaptive else None
+
+#Method that runs one restart of the Multi-Start in a worker process, the solution is only sent back if it beats the threshold
+#(as a compact Solution), and the counters of the moves are sent back when the search is profiled
+def parallel_restart(restart_seed: int, threshold: int):
+    rng = random.Random(restart_seed)
+    clusters = worker_data["clusters"]
+    stats = MoveStats() if worker_data["profile"] else None
+    cluster_orders, vehicle_tours = generate_solution(worker_data["k"], worker_data["Q"], clusters, worker_data["demands"], rng, worker_data["construction"], worker_data["distances"])
+    total_distance_traveled = local_search(worker_data["Q"], worker_data["demands"], worker_data["distances"], clusters, cluster_orders, vehicle_tours, worker_data["first"], worker_data["near"], worker_data["budget"], stats, worker_data["scheduler"])
+    counts = None if stats is None else stats.counts
+    if total_distance_traveled < threshold:
+        return total_distance_traveled, Solution.weak(total_distance_traveled, cluster_orders, vehicle_tours), counts
+
+    return total_distance_traveled, None, counts
+
+#Method that applies the Multi-Start Variable Neigbourhood Search with the restarts spread over a pool of worker processes
+def parallel_VNS(n_iter: int, k: int, Q: int, distances: list[list], clusters: list[list], demands: list, workers: int, seed: int = None, strategy: str = "best", near: dict = None, budget: Budget = None, checkpoint: Checkpoint = None, rng: random.Random = random, stats: MoveStats = None, scheduler: MoveScheduler = None, construction: str = "random", events = None):
+    first = search_strategy(strategy)
+    m = max(n_iter // 10, 1)
+    progress = Progress("VNS", events, m)
+    seeds = random.Random(seed)
+    #Restarts already in flight can not be taken back, so no more of them are submitted than the budget allows
+    if budget is not None and budget.remaining_iterations() is not None:
+        n_iter = min(n_iter, budget.remaining_iterations())
+
+    cluster_orders, vehicle_tours = generate_solution(k, Q, clusters, demands, rng, construction, distances)
+    best = Solution.weak(total_distance(distances, vehicle_tours), cluster_orders, vehicle_tours)
+    submitted = 0
+    i = 0
+
+    #The workers map one shared copy of a large distance matrix instead of each getting their own
+    with SharedDistances(distances) as shared, ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(k, Q, shared, clusters, demands, first, near, budget, stats is not None, scheduler is not None, construction)) as executor:
+        #Two restarts per worker are kept in flight so that no worker waits for the coordinator
+        pending = set()
+        while submitted < n_iter and len(pending) < 2*workers and not (budget is not None and budget.exhausted()):
+            pending.add(executor.submit(parallel_restart, seeds.getrandbits(64), best.total_distance))
+            submitted += 1
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                total_distance_traveled, solution, counts = future.result()
+                if counts is not None:
+                    stats.merge(counts)
+                #The solution sent back is already a compact copy and is kept as it is
+                if solution is not None and total_distance_traveled < best.total_distance:
+                    best = solution
+                    progress.improvement(i+1, best.total_distance)
+
+                progress.restart(i+1, total_distance_traveled, best.total_distance)
+
+                if budget is not None:
+                    budget.spend()
+                if checkpoint is not None:
+                    checkpoint.update(best)
+                if stats is not None:
+                    stats.tick("VNS")
+                i += 1
+
+            if budget is not None and budget.exhausted():
+                progress.budget(i, best.total_distance)
+                for future in pending:
+                    future.cancel()
+                break
+
+            while submitted < n_iter and len(pending) < 2*workers and not (budget is not None and budget.exhausted()):
+                pending.add(executor.submit(parallel_restart, seeds.getrandbits(64), best.total_distance))
+                submitted += 1
+
+    progress.finished(best.total_distance)
+    if checkpoint is not None:
+        checkpoint.flush()
+    if stats is not None:
+        stats.finish("VNS")
+
+    return best.total_distance, best.cluster_orders(), best.vehicle_tours()
 
 
 
 if __name__ == "__main__":
 
-
-    #Update the name of the file to switch to a different instance
-    filename = "A.gvrp"
-    #Read the input from the file
-    n, k, r, Q, points, clusters, demands = read_input(filename)
-    distances = distance_matrix(n, points)
-
-    #Printing the input(for potential verification purposes)   
-    #print_input(n, k, r, Q, points, clusters, demands)
-
-    #The number of iterations can be updated here
-    nr_iterations = 100
-
-    start_time = perf_counter()
-    best_total_distance, best_cluster_orders, best_vehicle_tours = VNS(nr_iterations, Q, distances, clusters, demands)
-    end_time = perf_counter()
-    time = end_time - start_time
-
-    #Print the best solution 
-    printSolution(filename, time, nr_iterations, best_total_distance,  best_cluster_orders, best_vehicle_tours, demands)
-
-    #Update the file containing the best distances found so far
-    update_best_solution(filename, best_total_distance)
-
-    #Update the solution written down into a file if it is better
-    write_solution(filename, best_total_distance, best_cluster_orders, best_vehicle_tours)
+    #The instance, the time limit, the seed and the other settings are given on the command line,
+    #e.g. python CluVRPWeak.py D.gvrp --time-limit 60 --seed 1 (see CluVRPSolve.py for all the options)
+    from CluVRPSolve import main
+    main(variant="weak")